@@ -0,0 +1,50 @@
+"""
+Micro-benchmark of attribute reads on captured classes.
+
+Compares the per-access cost of reading an attribute on a plain class, on a `@capture_all`
+class, and on a `@capture_all(fast_read=True)` class.
+
+Usage:
+    python -m benchmarks.bench_capture_read [--number N]
+"""
+import argparse
+from timeit import timeit
+
+from tiny_prob import SetConfig, capture_all
+
+SetConfig()
+
+
+class Plain:
+    a: int = 10
+
+
+@capture_all
+class Captured:
+    a: int = 10
+
+
+@capture_all(fast_read=True)
+class CapturedFastRead:
+    a: int = 10
+
+
+def bench(obj, number: int) -> float:
+    """Return the mean time of a single attribute read, in nanoseconds."""
+    return timeit("obj.a", globals={"obj": obj}, number=number) / number * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    baseline = bench(Plain(), args.number)
+    print(f"{'plain':<24}{baseline:>10.1f} ns")
+    for label, obj in (("capture_all", Captured()), ("capture_all(fast_read)", CapturedFastRead())):
+        elapsed = bench(obj, args.number)
+        print(f"{label:<24}{elapsed:>10.1f} ns  (+{elapsed - baseline:.1f} ns)")
+
+
+if __name__ == "__main__":
+    main()
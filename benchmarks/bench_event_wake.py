@@ -0,0 +1,71 @@
+"""
+Latency benchmark of EventProb wake-ups.
+
+Measures the time from sending the POST to `/pin_value` that triggers an event pin until the
+thread blocked in `EventProb.wait_once` resumes.
+
+Usage:
+    python -m benchmarks.bench_event_wake [--rounds N] [--port PORT]
+"""
+import argparse
+import http.client
+import json
+from statistics import mean, quantiles
+from threading import Event, Thread
+from time import perf_counter, sleep
+
+from tiny_prob.tiny_prob import TinyProb
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--port", type=int, default=8190)
+    args = parser.parse_args()
+
+    tp = TinyProb(quiet=True, port=args.port)
+    prob = tp.add_debug_prob("bench_event")
+    tp.start()
+    sleep(0.5)
+
+    resumed_at: list[float] = []
+    ready = Event()
+
+    def waiter() -> None:
+        for _ in range(args.rounds):
+            ready.set()
+            prob.wait_once(timeout=10)
+            resumed_at.append(perf_counter())
+
+    thread = Thread(target=waiter)
+    thread.start()
+    connection = http.client.HTTPConnection("127.0.0.1", args.port)
+    body = json.dumps({"write_pins": {"bench_event": "true"}})
+    latencies = []
+    try:
+        for i in range(args.rounds):
+            ready.wait()
+            ready.clear()
+            sleep(0.001)  # Let the waiter block
+            sent_at = perf_counter()
+            connection.request(
+                "POST", "/pin_value", body=body, headers={"Content-Type": "application/json"}
+            )
+            connection.getresponse().read()
+            connection.close()
+            while len(resumed_at) <= i:
+                sleep(0)
+            latencies.append(resumed_at[i] - sent_at)
+    finally:
+        thread.join(timeout=10)
+        tp.stop_server(timeout=5)
+
+    percentiles = quantiles(latencies, n=100)
+    print(f"rounds: {len(latencies)}")
+    print(f"mean:   {mean(latencies) * 1e3:.3f} ms")
+    print(f"p50:    {percentiles[49] * 1e3:.3f} ms")
+    print(f"p99:    {percentiles[98] * 1e3:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
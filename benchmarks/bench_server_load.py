@@ -0,0 +1,108 @@
+"""
+Load benchmark of the server backends.
+
+Starts a TinyProb server for each backend and hits `/all_pins` and `/pin_value` with N concurrent
+clients (one persistent connection each), reporting requests/sec and latency percentiles.
+
+Usage:
+    python -m benchmarks.bench_server_load [--clients N] [--requests N] [--pins N]
+        [--backends simple,threaded,threadpool,asyncio] [--json]
+"""
+import argparse
+import http.client
+import json
+from statistics import quantiles
+from threading import Barrier, Thread
+from time import perf_counter, sleep
+
+from tiny_prob.servers import SERVER_BACKENDS
+from tiny_prob.tiny_prob import TinyProb
+
+BASE_PORT = 8180
+
+
+def client(
+    port: int, method: str, path: str, body: bytes | None, requests: int, barrier: Barrier,
+    latencies: list[float],
+) -> None:
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    barrier.wait()
+    for _ in range(requests):
+        start = perf_counter()
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        if response.will_close:
+            connection.close()
+        latencies.append(perf_counter() - start)
+    connection.close()
+
+
+def load(port: int, method: str, path: str, body: bytes | None, clients: int, requests: int) -> dict:
+    latencies: list[list[float]] = [[] for _ in range(clients)]
+    barrier = Barrier(clients + 1)
+    threads = [
+        Thread(target=client, args=(port, method, path, body, requests, barrier, latencies[i]))
+        for i in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = perf_counter() - start
+
+    merged = sorted(latency for client_latencies in latencies for latency in client_latencies)
+    percentiles = quantiles(merged, n=100)
+    return {
+        "requests_per_sec": len(merged) / elapsed,
+        "p50_ms": percentiles[49] * 1e3,
+        "p99_ms": percentiles[98] * 1e3,
+    }
+
+
+def bench_backend(backend: str, port: int, args: argparse.Namespace) -> dict:
+    tp = TinyProb(quiet=True, port=port, server=backend)
+    for i in range(args.pins):
+        tp.add_pin(f"pin_{i}", i)
+    tp.start()
+    sleep(0.5)
+    try:
+        read_body = json.dumps({"read_pins": [f"pin_{i}" for i in range(args.pins)]}).encode()
+        return {
+            "/all_pins": load(port, "GET", "/all_pins", None, args.clients, args.requests),
+            "/pin_value": load(port, "POST", "/pin_value", read_body, args.clients, args.requests),
+        }
+    finally:
+        tp.stop_server(timeout=5)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per client")
+    parser.add_argument("--pins", type=int, default=100)
+    parser.add_argument("--backends", default=",".join(SERVER_BACKENDS))
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    for i, backend in enumerate(args.backends.split(",")):
+        results[backend] = bench_backend(backend, BASE_PORT + i, args)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'backend':<12}{'endpoint':<12}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for backend, endpoints in results.items():
+        for endpoint, stats in endpoints.items():
+            print(
+                f"{backend:<12}{endpoint:<12}{stats['requests_per_sec']:>10.0f}"
+                f"{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
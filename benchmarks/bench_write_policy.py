@@ -0,0 +1,48 @@
+"""
+Micro-benchmark of attribute assignments on captured classes, under each write policy.
+
+Compares the per-assignment cost of a tight loop storing into a plain class attribute and into
+`@capture_all` attributes with the "every", "latest-every-N-ms" and "every-Nth" write policies.
+
+Usage:
+    python -m benchmarks.bench_write_policy [--number N] [--period-ms N] [--nth N]
+"""
+import argparse
+from timeit import timeit
+
+from tiny_prob import SetConfig, capture_all
+
+SetConfig()
+
+
+class Plain:
+    a: int = 10
+
+
+def captured_class(write_policy: str) -> type:
+    # Every policy needs its own class, hence its own pin.
+    cls = type(f"Captured_{write_policy.replace('-', '_')}", (), {"a": 10})
+    return capture_all(cls, write_policy=write_policy)
+
+
+def bench(obj, number: int) -> float:
+    """Return the mean time of a single attribute assignment, in nanoseconds."""
+    return timeit("obj.a = 1", globals={"obj": obj}, number=number) / number * 1e9
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--number", type=int, default=1_000_000)
+    parser.add_argument("--period-ms", type=float, default=50)
+    parser.add_argument("--nth", type=int, default=100)
+    args = parser.parse_args()
+
+    baseline = bench(Plain(), args.number)
+    print(f"{'plain':<24}{baseline:>10.1f} ns")
+    for policy in ("every", f"latest-every-{args.period_ms:g}ms", f"every-{args.nth}th"):
+        elapsed = bench(captured_class(policy)(), args.number)
+        print(f"{policy:<24}{elapsed:>10.1f} ns  (+{elapsed - baseline:.1f} ns)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Benchmark suite of the instrumentation overhead and of the server throughput.
+
+Runs every benchmark in this process and writes the results as JSON, so that runs of different
+releases can be compared:
+    capture_get_*, capture_set_*  attribute access on plain and `@capture_all` classes (ns/op)
+    pin4type_*                    `Pin4Type` construction (ns/op)
+    all_pins_<N>                  `/all_pins` serialization with N pins (ms/op)
+    pin_value_*                   `/pin_value` reads and writes over HTTP (req/s)
+    log_*                         log ingest through `append_log` and the logging handler (logs/s)
+    event_wake_*                  `EventProb` wake latency after a trigger (us)
+
+Usage:
+    python -m benchmarks.suite [--quick] [--only PREFIX,...] [--output results.json]
+        [--compare baseline.json] [--threshold 0.1]
+
+With `--compare`, the results are printed next to the baseline, and the exit code is 1 if any
+benchmark regressed by more than `--threshold` (a fraction).
+"""
+import argparse
+import json
+import logging
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+from statistics import median, quantiles
+from threading import Event, Thread
+from time import perf_counter, sleep
+from timeit import Timer
+from typing import Callable
+
+from tiny_prob import TINY_PROB_VERSION, SetConfig, capture_all
+from tiny_prob.pins import Pin4Type
+from tiny_prob.tiny_prob import TinyProb
+
+from benchmarks.bench_server_load import load
+
+SetConfig()
+
+PORT = 8200
+
+# {name: (value, unit, whether higher is better)}
+Results = dict[str, tuple[float, str, bool]]
+
+
+class Plain:
+    a: int = 10
+
+
+@capture_all
+class Captured:
+    a: int = 10
+
+
+@capture_all(fast_read=True)
+class CapturedFastRead:
+    a: int = 10
+
+
+def per_op(stmt: str, number: int, repeat: int = 5, **globals) -> float:
+    """Return the best mean time of `stmt` over `repeat` runs, in nanoseconds."""
+    timer = Timer(stmt, globals=globals)
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e9
+
+
+def bench_capture(quick: bool) -> Results:
+    number = 100_000 if quick else 1_000_000
+    results = {}
+    for label, obj in (
+        ("plain", Plain()),
+        ("capture_all", Captured()),
+        ("capture_all_fast_read", CapturedFastRead()),
+    ):
+        results[f"capture_get_{label}"] = (per_op("obj.a", number, obj=obj), "ns/op", False)
+        results[f"capture_set_{label}"] = (per_op("obj.a = 1", number, obj=obj), "ns/op", False)
+    return results
+
+
+def bench_pin4type(quick: bool) -> Results:
+    number = 10_000 if quick else 100_000
+    return {
+        f"pin4type_{label}": (
+            per_op("Pin4Type('pin', 'ns', value)", number, Pin4Type=Pin4Type, value=value),
+            "ns/op",
+            False,
+        )
+        for label, value in (("int", 1), ("bool", True), ("str", "text"))
+    }
+
+
+def bench_all_pins(quick: bool) -> Results:
+    results = {}
+    for size in (10, 1_000) if quick else (10, 1_000, 100_000):
+        tp = TinyProb(quiet=True)
+        for i in range(size):
+            tp.add_pin(f"pin_{i}", i, namespace=f"group_{i // 100}")
+        number = max(1, 10_000 // size)
+        elapsed = per_op("all_pins()", number, repeat=3, all_pins=tp._TinyProb__all_pins)
+        results[f"all_pins_{size}"] = (elapsed / 1e6, "ms/op", False)
+    return results
+
+
+def bench_pin_value(quick: bool) -> Results:
+    pins = 100
+    tp = TinyProb(quiet=True, port=PORT)
+    for i in range(pins):
+        tp.add_pin(f"pin_{i}", i)
+    tp.start()
+    sleep(0.5)
+    clients, requests = (4, 100) if quick else (8, 500)
+    read_body = json.dumps({"read_pins": [f"pin_{i}" for i in range(pins)]}).encode()
+    write_body = json.dumps({"write_pins": {"pin_0": 1}}).encode()
+    try:
+        read = load(PORT, "POST", "/pin_value", read_body, clients, requests)
+        write = load(PORT, "POST", "/pin_value", write_body, clients, requests)
+    finally:
+        tp.stop_server(timeout=5)
+    return {
+        "pin_value_read_rps": (read["requests_per_sec"], "req/s", True),
+        "pin_value_read_p99": (read["p99_ms"], "ms", False),
+        "pin_value_write_rps": (write["requests_per_sec"], "req/s", True),
+        "pin_value_write_p99": (write["p99_ms"], "ms", False),
+    }
+
+
+def bench_logs(quick: bool) -> Results:
+    number = 20_000 if quick else 200_000
+    tp = TinyProb(quiet=True, log_capacity=number)
+
+    start = perf_counter()
+    for i in range(number):
+        tp.append_log("message")
+    append_rate = number / (perf_counter() - start)
+
+    handler = tp.get_log_handler(queue_size=number)
+    logger = logging.getLogger("tiny_prob.benchmark")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    try:
+        start = perf_counter()
+        for i in range(number):
+            logger.info("message %d", i)
+        emit_elapsed = perf_counter() - start
+        handler.flush()
+        ingest_elapsed = perf_counter() - start
+    finally:
+        logger.removeHandler(handler)
+        handler.close()
+    return {
+        "log_append_rate": (append_rate, "logs/s", True),
+        "log_handler_emit": (emit_elapsed / number * 1e9, "ns/op", False),
+        "log_handler_ingest_rate": (number / ingest_elapsed, "logs/s", True),
+    }
+
+
+def bench_event_wake(quick: bool) -> Results:
+    rounds = 200 if quick else 2_000
+    tp = TinyProb(quiet=True)
+    prob = tp.add_debug_prob("bench_event")
+    trigger = tp._TinyProb__pins["bench_event"].write_value
+    ready = Event()
+    resumed = Event()
+    resumed_at: list[float] = []
+
+    def waiter() -> None:
+        for _ in range(rounds):
+            ready.set()
+            prob.wait_once(timeout=10)
+            resumed_at.append(perf_counter())
+            resumed.set()
+
+    thread = Thread(target=waiter)
+    thread.start()
+    latencies = []
+    for _ in range(rounds):
+        ready.wait()
+        ready.clear()
+        resumed.clear()
+        sleep(0.0005)  # Let the waiter block
+        sent_at = perf_counter()
+        trigger(True)
+        resumed.wait(10)
+        latencies.append(resumed_at[-1] - sent_at)
+    thread.join(timeout=10)
+
+    percentiles = quantiles(latencies, n=100)
+    return {
+        "event_wake_p50": (median(latencies) * 1e6, "us", False),
+        "event_wake_p99": (percentiles[98] * 1e6, "us", False),
+    }
+
+
+BENCHMARKS: dict[str, Callable[[bool], Results]] = {
+    "capture": bench_capture,
+    "pin4type": bench_pin4type,
+    "all_pins": bench_all_pins,
+    "pin_value": bench_pin_value,
+    "logs": bench_logs,
+    "event_wake": bench_event_wake,
+}
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> bool:
+    """Print the results next to the baseline and return whether any benchmark regressed."""
+    regressed = False
+    print(f"{'benchmark':<32}{'baseline':>14}{'current':>14}{'change':>10}")
+    for name, current in results["results"].items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            print(f"{name:<32}{'-':>14}{current['value']:>14.3f}")
+            continue
+        change = current["value"] / previous["value"] - 1 if previous["value"] else 0.0
+        worse = -change if current["higher_is_better"] else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        regressed |= bool(flag)
+        print(
+            f"{name:<32}{previous['value']:>14.3f}{current['value']:>14.3f}"
+            f"{change:>+10.1%}{flag}"
+        )
+    return regressed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--quick", action="store_true", help="fewer iterations, no 100k pins")
+    parser.add_argument("--only", default=None, help="comma-separated benchmark groups")
+    parser.add_argument("--output", default=None, help="write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="baseline JSON file of a previous run")
+    parser.add_argument("--threshold", type=float, default=0.1)
+    args = parser.parse_args()
+
+    groups = args.only.split(",") if args.only else list(BENCHMARKS)
+    unknown = set(groups) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks {sorted(unknown)}, expected some of {list(BENCHMARKS)}")
+
+    measured: Results = {}
+    for group in groups:
+        print(f"running {group}...", file=sys.stderr)
+        measured.update(BENCHMARKS[group](args.quick))
+
+    results = {
+        "meta": {
+            "tiny_prob": TINY_PROB_VERSION,
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "quick": args.quick,
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": {
+            name: {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+            for name, (value, unit, higher_is_better) in measured.items()
+        },
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        sys.exit(1 if compare(results, baseline, args.threshold) else 0)
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+import gzip
+
+from tiny_prob.assets import AssetStore, accepted_encodings, make_asset, negotiate
+
+
+def test_make_asset_precompresses_text():
+    data = b"body { color: red; }\n" * 100
+    asset = make_asset(data, "text/css; charset=utf-8")
+    assert gzip.decompress(asset.encodings["gzip"]) == data
+    assert asset.etag == f'"{asset.version}"'
+    assert make_asset(data, "text/css").version == asset.version
+
+    image = make_asset(b"\x89PNG" + bytes(100), "image/png")
+    assert set(image.encodings) == {"identity"}
+
+
+def test_negotiate():
+    asset = make_asset(b"x" * 1000, "application/javascript")
+    assert negotiate(asset, "gzip, deflate") == "gzip"
+    assert negotiate(asset, "gzip;q=0, deflate") == "identity"
+    assert negotiate(asset, "") == "identity"
+    assert accepted_encodings("br;q=0.5, gzip ; q=0") == {"br"}
+
+
+def test_asset_store_fingerprints(tmp_path):
+    (tmp_path / "app.js").write_text("console.log(1);")
+    store = AssetStore(str(tmp_path))
+    asset = store.get("app.js")
+    assert asset.content_type.startswith("application/javascript") or asset.content_type.startswith(
+        "text/javascript"
+    )
+    assert store.url("app.js") == f"/static/app.js?v={asset.version}"
+    assert store.url("missing.js") == "/static/missing.js"
@@ -0,0 +1,100 @@
+from time import sleep
+
+import pytest
+
+from tiny_prob.tiny_prob import TinyProb
+
+
+@pytest.fixture
+def nodes():
+    nodes = [TinyProb(quiet=True, port=port) for port in (8085, 8086)]
+    for node in nodes:
+        node.start()
+    sleep(0.3)
+    yield nodes
+    for node in nodes:
+        node.stop_server(timeout=1)
+
+
+def test_gateway_merges_and_forwards(nodes):
+    gateway = TinyProb(quiet=True, gateway_poll_interval=60)
+    _, set_speed = nodes[0].add_pin("speed", 1)
+    get_gain, _ = nodes[1].add_pin("gain", 0.5)
+    gateway.add_node("robot-1", "http://127.0.0.1:8085")
+    gateway.add_node("robot-2", "http://127.0.0.1:8086")
+
+    gateway.poll_nodes()
+    values = gateway.snapshot().values
+    assert values["robot-1/speed"] == 1 and values["robot-2/gain"] == 0.5
+
+    # Incremental: only the changed pin comes back.
+    set_speed(value=2)
+    gateway.poll_nodes()
+    assert gateway.snapshot().values["robot-1/speed"] == 2
+
+    # Writes fan out to the owning node.
+    gateway._TinyProb__pins["robot-2/gain"].write_value(0.8)
+    assert get_gain() == 0.8
+    generation = gateway.write_many({"robot-1/speed": 3, "robot-2/gain": 0.9})
+    assert get_gain() == 0.9 and nodes[0].snapshot().values["speed"] == 3
+    assert gateway.snapshot().generation == generation
+    assert gateway.snapshot().values["robot-1/speed"] == 3
+
+    nodes[0].remove_pin("speed")
+    gateway.poll_nodes()
+    assert "robot-1/speed" not in gateway.snapshot().values
+
+    gateway.remove_node("robot-2")
+    assert "robot-2/gain" not in gateway.snapshot().values
+
+
+def test_gateway_proxies_images_and_arrays(nodes):
+    import json
+    from urllib.request import urlopen
+
+    import numpy as np
+
+    nodes[0].add_pin("frame", np.zeros((4, 6), dtype=np.uint8))
+    nodes[0].add_array("samples", np.arange(100.0))
+    gateway = TinyProb(quiet=True, port=8087, gateway_poll_interval=60)
+    gateway.add_node("robot-1", "http://127.0.0.1:8085")
+    gateway.poll_nodes()
+    gateway.start()
+    sleep(0.3)
+    try:
+        pins = {
+            pin.address: pin.to_dict()["value"] for pin in gateway.query_pins("robot-1")[1]
+        }
+        with urlopen(gateway.url + pins["robot-1/frame"]["url"].lstrip("/")) as response:
+            assert response.headers["Content-Type"] == "image/png"
+            assert response.read().startswith(b"\x89PNG")
+        with urlopen(gateway.url + pins["robot-1/samples"]["url"].lstrip("/")) as response:
+            array = json.loads(response.read())
+        assert array["size"] == 100 and array["stats"]["max"] == 99.0
+    finally:
+        gateway.stop_server(timeout=1)
+
+
+def test_gateway_resyncs_restarted_node():
+    node = TinyProb(quiet=True, port=8088)
+    node.add_pin("old", 1)
+    node.start()
+    sleep(0.3)
+    gateway = TinyProb(quiet=True, gateway_poll_interval=60)
+    gateway.add_node("robot", "http://127.0.0.1:8088")
+    gateway.poll_nodes()
+    assert "robot/old" in gateway.snapshot().values
+    node.stop_server(timeout=1)
+
+    # The restarted node is already past the cursor of the gateway.
+    restarted = TinyProb(quiet=True, port=8088)
+    restarted.add_pin("new", 2)
+    restarted.start()
+    sleep(0.3)
+    try:
+        gateway.poll_nodes()
+        values = gateway.snapshot().values
+        assert "robot/old" not in values and values["robot/new"] == 2
+    finally:
+        gateway.remove_node("robot")
+        restarted.stop_server(timeout=1)
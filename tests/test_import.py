@@ -0,0 +1,40 @@
+import subprocess
+import sys
+
+# Modules that only the web server (or optional features) should pull in.
+SERVER_MODULES = ("bottle", "wsgiref", "asyncio", "http.client", "multiprocessing.shared_memory")
+IMPORT_TIME_BUDGET = 0.5  # seconds, cumulative import time of the package
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code], capture_output=True, text=True, check=True
+    )
+
+
+def test_capture_does_not_import_the_server():
+    result = run_python(
+        "import sys\n"
+        "from tiny_prob import SetConfig, TinyProb, capture_all\n"
+        "SetConfig(quiet=True)\n"
+        "@capture_all\n"
+        "class App:\n"
+        "    a = 1\n"
+        "App().a = 2\n"
+        f"print([name for name in {SERVER_MODULES!r} if name in sys.modules])\n"
+        "TinyProb().app\n"
+        "print('bottle' in sys.modules)\n"
+    )
+    loaded, bottle_after_app = result.stdout.splitlines()
+    assert loaded == "[]"
+    assert bottle_after_app == "True"
+
+
+def test_import_time():
+    result = run_python("import tiny_prob", "-X", "importtime")
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        _, _, us, name = [part.strip() for part in line.replace(":", "|", 1).split("|")]
+        if us.isdigit():
+            cumulative[name] = int(us)
+    assert cumulative["tiny_prob"] / 1e6 < IMPORT_TIME_BUDGET
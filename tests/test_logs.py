@@ -0,0 +1,85 @@
+from tiny_prob.logs import BatchingLogHandler, LogBuffer
+
+
+def test_log_buffer_capacity():
+    logs = LogBuffer(capacity=3)
+    for i in range(5):
+        logs.append(f"message {i}", timestamp=i)
+    assert len(logs) == 3
+    assert [entry.message for entry in logs.after(0)] == ["message 2", "message 3", "message 4"]
+    assert logs.last_seq == 5
+
+
+def test_log_buffer_max_bytes():
+    logs = LogBuffer(capacity=100, max_bytes=10)
+    logs.append("12345", timestamp=0)
+    logs.append("67890", timestamp=1)
+    logs.append("abc", timestamp=2)
+    assert [entry.message for entry in logs.after(0)] == ["67890", "abc"]
+    assert logs.size_bytes == 8
+
+
+def test_log_buffer_cursor_and_timestamp():
+    logs = LogBuffer(capacity=4)
+    for i in range(6):
+        logs.append(f"message {i}", timestamp=10 + i)
+    assert [entry.seq for entry in logs.after(4, limit=1)] == [5]
+    assert [entry.seq for entry in logs.since(13.5)] == [5, 6]
+    assert [entry.seq for entry in logs.since(0, limit=2)] == [3, 4]
+
+
+def test_batching_log_handler():
+    import logging
+
+    logs = LogBuffer()
+    handler = BatchingLogHandler(logs, flush_interval=10)
+    logger = logging.getLogger("test_batching_log_handler")
+    logger.addHandler(handler)
+    logger.warning("Hello %s", "world")
+    assert len(logs) == 0  # Only enqueued
+    handler.flush()
+    assert logs[-1].message == "Hello world"
+    logger.removeHandler(handler)
+    handler.close()
+
+
+def test_batching_log_handler_overflow():
+    import logging
+
+    logs = LogBuffer()
+    handler = BatchingLogHandler(logs, queue_size=2, flush_interval=10)
+    for i in range(5):
+        handler.handle(logging.makeLogRecord({"msg": f"message {i}"}))
+    handler.flush()
+    assert [entry.message for entry in logs.after(0)] == ["message 0", "message 1"]
+    assert handler.stats()["dropped"] == 3
+
+    logs = LogBuffer()
+    handler = BatchingLogHandler(
+        logs, queue_size=2, flush_interval=10, overflow=BatchingLogHandler.OverflowPolicy.DropOldest
+    )
+    for i in range(5):
+        handler.handle(logging.makeLogRecord({"msg": f"message {i}"}))
+    handler.flush()
+    assert [entry.message for entry in logs.after(0)] == ["message 3", "message 4"]
+    handler.close()
+
+
+def test_batching_log_handler_counts_from_many_threads():
+    import logging
+    from threading import Thread
+
+    handler = BatchingLogHandler(LogBuffer(), queue_size=100, flush_interval=10)
+
+    def log():
+        for i in range(5000):
+            handler.handle(logging.makeLogRecord({"msg": f"message {i}"}))
+
+    threads = [Thread(target=log) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = handler.stats()
+    assert stats["enqueued"] + stats["dropped"] == 20000
+    handler.close()
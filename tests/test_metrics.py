@@ -0,0 +1,76 @@
+from threading import Thread
+
+from tiny_prob.metrics import (
+    COUNTERS,
+    PIN_LOCK_CONTENDED,
+    Sample,
+    ThreadCounters,
+    family,
+    render_prometheus,
+    to_flat_dict,
+)
+from tiny_prob.pins import NumericPin
+from tiny_prob.tiny_prob import TinyProb
+
+
+def test_thread_counters_are_summed():
+    counters = ThreadCounters(2)
+
+    def count() -> None:
+        for _ in range(1000):
+            counters.cell()[1] += 1
+
+    threads = [Thread(target=count) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    counters.cell()[0] += 1
+    assert counters.totals() == [1, 4000]
+    assert len(counters) == 1  # The cells of the exited threads were merged
+
+
+def test_pin_lock_contention_is_counted():
+    pin = NumericPin("contended", "test_ns", 0)
+    before = COUNTERS.totals()
+    pin._thread_lock.acquire()
+    writer = Thread(target=pin.write_value, args=(1,))
+    writer.start()
+    writer.join(timeout=0.1)
+    pin._thread_lock.release()
+    writer.join()
+    after = COUNTERS.totals()
+    assert pin._writes == 1
+    pin.read_value()
+    assert pin._reads == 1
+    assert after[PIN_LOCK_CONTENDED] - before[PIN_LOCK_CONTENDED] == 1
+
+
+def test_batch_writes_are_counted():
+    tp = TinyProb(quiet=True)
+    tp.add_pin("first", 0)
+    tp.add_pin("second", 0)
+
+    def writes() -> int:
+        return to_flat_dict(tp.metrics())["tiny_prob_pin_writes_total"]
+
+    before = writes()
+    tp.write_many({"first": 1, "second": 2})
+    with tp.write_many() as batch:
+        batch["first"] = 3
+    assert writes() - before == 3
+
+
+def test_render_prometheus():
+    latency = family("latency_seconds", "summary", "Latency.")
+    latency.samples.append(Sample("latency_seconds_sum", {"pin": 'a"b'}, 0.5))
+    families = [family("pins", "gauge", "Number of pins.", 3), latency]
+    assert render_prometheus(families) == (
+        "# HELP pins Number of pins.\n"
+        "# TYPE pins gauge\n"
+        "pins 3\n"
+        "# HELP latency_seconds Latency.\n"
+        "# TYPE latency_seconds summary\n"
+        'latency_seconds_sum{pin="a\\"b"} 0.5\n'
+    )
+    assert to_flat_dict(families) == {"pins": 3, 'latency_seconds_sum{pin="a\\"b"}': 0.5}
@@ -1,5 +1,5 @@
 import pytest
-from tiny_prob.pins import NumericPin, BooleanPin, StringPin, EventPin
+from tiny_prob.pins import NumericPin, BooleanPin, StringPin, EventPin, TimerPin, pin_types
 
 
 @pytest.fixture
@@ -40,3 +40,304 @@ def test_event_pin():
     assert pin.type == "event"
     assert not pin._readable
     assert not pin._writable
+
+
+def test_pin_html_templates(numeric_pin):
+    assert "html_template" not in numeric_pin.to_dict()
+    assert numeric_pin.compile_html()["editable_html"] == NumericPin.EDITABLE_TEMPLATE
+    assert set(pin_types()) >= {"numeric", "boolean", "string", "event", "image"}
+
+    custom = NumericPin("custom", "", 1, html="<b class='value' id='value'>{value}</b>")
+    template = custom.to_dict()["html_template"]
+    assert template["value"] == "<b class='value' id='value'>{value}</b>"
+    assert template["topic"] == NumericPin.TOPIC_TEMPLATE
+    assert "html_template" not in custom.to_dict(with_template=False)
+
+
+def test_numeric_pin_fast_read_coerces_on_write():
+    pin = NumericPin(name="test_fast", namespace="test_ns", value=1, _fast_read=True)
+    pin.write_value("42")
+    assert pin.value == 42
+    pin.write_value("1.5")
+    assert pin.value == 1.5
+    assert pin.read_value() == 1.5
+
+
+def test_boolean_pin_fast_read_coerces_on_write():
+    pin = BooleanPin(name="test_fast", namespace="test_ns", value=True, _fast_read=True)
+    pin.write_value("false")
+    assert pin.value is False
+
+
+def test_event_prob_wakes_waiter():
+    from threading import Thread
+    from time import monotonic, sleep
+    from tiny_prob.pins import EventProb
+
+    prob = EventProb(EventPin(name="test_event", namespace="test_ns"))
+    resumed = []
+    waiter = Thread(target=lambda: (prob.wait_once(timeout=5), resumed.append(monotonic())))
+    waiter.start()
+    sleep(0.05)
+    triggered = monotonic()
+    prob.set("go")
+    waiter.join(timeout=5)
+    assert resumed and resumed[0] - triggered < 0.05
+    assert not prob.is_locked()
+
+
+def test_event_prob_timeout():
+    from tiny_prob.pins import EventProb
+
+    prob = EventProb(EventPin(name="test_event", namespace="test_ns"))
+    with pytest.raises(TimeoutError):
+        prob.wait_value("never", timeout=0.01)
+
+
+def test_event_prob_async_wait():
+    import asyncio
+    from tiny_prob.pins import EventProb
+
+    prob = EventProb(EventPin(name="test_event", namespace="test_ns"))
+
+    async def main():
+        waiter = asyncio.create_task(prob.async_wait_value(42, timeout=5))
+        await asyncio.sleep(0.01)
+        await asyncio.get_running_loop().run_in_executor(None, prob.set, 42)
+        await waiter
+        with pytest.raises(TimeoutError):
+            await prob.async_wait_not_value(42, timeout=0.01)
+
+    asyncio.run(main())
+
+
+def test_event_pin_callback_arity():
+    calls = []
+
+    class Listener:
+        def on_event(self, value):
+            calls.append(("method", value))
+
+    pin = EventPin(name="test_event", namespace="test_ns")
+    pin += lambda: calls.append(("no_arg", None))
+    pin += lambda value: calls.append(("lambda", value))
+    pin += Listener().on_event
+    pin.write_value("x")
+    assert calls == [("no_arg", None), ("lambda", "x"), ("method", "x")]
+    assert pin.metrics.triggers == 1
+    assert pin.metrics.calls == 3
+
+
+def test_event_pin_thread_pool_executor():
+    from threading import Event
+    from tiny_prob.pins.executors import ThreadPoolCallbackExecutor
+
+    release = Event()
+    executor = ThreadPoolCallbackExecutor(workers=1, max_pending=1)
+    pin = EventPin(name="test_event", namespace="test_ns", _executor=executor)
+    pin += lambda: release.wait(5)
+    pin.write_value(None)  # Returns right away
+    pin.write_value(None)  # No slot left, dropped
+    assert pin.metrics.dropped == 1
+    release.set()
+    executor.shutdown()
+    assert pin.metrics.calls == 1
+    assert pin.metrics.queue_depth == 0
+
+
+def test_pin_history_ring_and_decimation():
+    from tiny_prob.pins.history import PinHistory
+
+    history = PinHistory(capacity=4)
+    for i in range(6):
+        history.append(i, timestamp=10 + i)
+    assert len(history) == 4
+    assert history.query() == {"t": [12, 13, 14, 15], "value": [2, 3, 4, 5], "decimated": False}
+    assert history.query(start=13, end=14)["value"] == [3, 4]
+    assert history.query(max_points=2) == {
+        "t": [12, 14], "value": [2.5, 4.5], "min": [2, 4], "max": [3, 5], "decimated": True,
+    }
+    assert history.append("not a number") is False
+
+
+def test_pin_history_opt_in(numeric_pin, boolean_pin):
+    numeric_pin.enable_history(capacity=10)
+    numeric_pin.write_value("12")
+    assert numeric_pin.to_dict()["history"] == 10
+    assert numeric_pin._history.query()["value"] == [10, 12]
+
+    boolean_pin.enable_history()
+    boolean_pin.write_value("false")
+    assert boolean_pin._history.query()["value"] == [1, 0]
+
+    with pytest.raises(TypeError):
+        StringPin(name="s", namespace="ns", value="a").enable_history()
+
+
+def test_write_policy_parse():
+    from tiny_prob.pins.policies import WritePolicy
+
+    assert WritePolicy.parse(None) == WritePolicy()
+    assert WritePolicy.parse("latest-every-50ms") == WritePolicy(WritePolicy.Kind.LatestEvery, 50)
+    assert WritePolicy.parse("every-10th") == WritePolicy(WritePolicy.Kind.EveryNth, 10)
+    with pytest.raises(ValueError):
+        WritePolicy.parse("every-0th")
+
+
+def test_write_policy_every_nth(numeric_pin):
+    committed = []
+    numeric_pin._observers.append(lambda pin: committed.append(pin.value))
+    numeric_pin.set_write_policy("every-3rd")
+    for i in range(1, 6):
+        numeric_pin._write(i)
+    # The 1st and 4th assignments are committed, the others only stored.
+    assert numeric_pin.value == 5
+    assert committed == [1, 4]
+
+
+def test_write_policy_latest_every(numeric_pin):
+    observed = []
+    numeric_pin._observers.append(lambda pin: observed.append(pin.value))
+    numeric_pin.set_write_policy("latest-every-10000ms")
+    for i in range(100):
+        numeric_pin._write(i)
+    assert observed == [0]
+    assert numeric_pin.read_value() == 99
+
+
+def test_image_pin_encodes_on_demand():
+    np = pytest.importorskip("numpy")
+    from tiny_prob.pins import ImagePin, Pin4Type
+
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    pin = Pin4Type("camera", "test_ns", frame)
+    assert isinstance(pin, ImagePin)
+    assert pin.read_value() is frame  # No copy
+    assert pin.to_dict()["value"]["shape"] == [480, 640, 3]
+
+    png = pin.frame(max_size=64)
+    assert png.data.startswith(b"\x89PNG")
+    assert pin.frame(max_size=64) is png  # Cached for this version
+    assert pin._frames.encodes == 1
+
+    assert pin.frame(max_size=65) is png  # Same stride
+    for max_size in range(1, 641):  # Client-supplied: the cache stays bounded
+        pin.frame(max_size=max_size)
+    assert len(pin._frames) == pin._frames.MAX_FRAMES
+
+    pin.write_value(np.ones((480, 640), dtype=np.float32))
+    assert pin.frame(max_size=64) is not png
+    assert len(pin._frames) == 1  # Frames of older versions are dropped
+    with pytest.raises(TypeError):
+        pin.write_value("not an image")
+
+
+def test_png_encoder_without_pillow():
+    np = pytest.importorskip("numpy")
+    from tiny_prob.pins.image import _encode_png
+
+    data = _encode_png(np.zeros((2, 3, 4), dtype=np.uint8))
+    assert data.startswith(b"\x89PNG") and data.endswith(b"IEND\xaeB`\x82")
+
+
+def test_timer_pin_merges_threads():
+    from threading import Thread
+    from tiny_prob.pins.timing import bucket_bounds, bucket_index
+
+    for value in (0, 31, 32, 1000, 10**9):
+        lower, upper = bucket_bounds(bucket_index(value))
+        assert lower <= value < upper
+
+    pin = TimerPin("timer", "test_ns")
+    pin.record(1000)
+    threads = [Thread(target=lambda: [pin.record(2000) for _ in range(100)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with pin.span():
+        pass
+
+    pin.refresh()
+    version = pin._version
+    summary = pin.read_value()
+    assert summary["count"] == 402
+    assert summary["max"] >= 2e-6
+    assert 1.9e-6 <= summary["percentiles"]["50"] <= 2.2e-6
+    assert sum(count for _, _, count in summary["histogram"]) == 402
+    pin.refresh()
+    assert pin._version == version  # Nothing recorded since
+    # The accumulators of the exited threads were merged, only the main thread's is live.
+    assert len(pin.timer._Timer__accumulators) == 1
+
+
+def test_array_pin_slices_and_reduces():
+    np = pytest.importorskip("numpy")
+    from tiny_prob.pins import ArrayPin, Pin4Type
+
+    buffer = np.arange(1_000_000, dtype=np.float64)
+    pin = Pin4Type("buffer", "test_ns", buffer)
+    assert isinstance(pin, ArrayPin)
+    assert pin.read_value() is buffer  # No copy
+    value = pin.to_dict()["value"]
+    assert value["shape"] == [1_000_000] and value["size"] == 1_000_000
+    assert value["url"].startswith("/pin_array?name=test_ns/buffer")
+
+    assert pin.read_slice("10:13") == [10.0, 11.0, 12.0]
+    assert pin.read_slice("-1") == 999_999.0
+    with pytest.raises(ValueError):
+        pin.read_slice(":")  # More than MAX_ELEMENTS
+    with pytest.raises(ValueError):
+        pin.read_slice("1:2,3")
+    with pytest.raises(IndexError):
+        pin.read_slice("1000000")
+
+    buffer[5] = np.nan
+    summary = pin.summary(bins=10, max_points=100)
+    stats = summary["stats"]
+    assert stats["count"] == 1_000_000 and stats["nonfinite"] == 1
+    assert stats["min"] == 0 and stats["max"] == 999_999
+    assert sum(stats["histogram"]["counts"]) == 999_999
+    plot = summary["plot"]
+    assert plot["decimated"] and len(plot["value"]) == 100
+    assert plot["min"][0] == 0 and plot["max"][-1] == 999_999
+
+    with pytest.raises(TypeError):
+        pin.write_value([1, 2, 3])
+
+
+def test_array_pin_python_array():
+    from array import array
+    from tiny_prob.pins import ArrayPin, Pin4Type
+    from tiny_prob.pins.arrays import _python_downsample, _python_stats
+
+    samples = array("d", [1.0, 2.0, 3.0, 4.0])
+    pin = Pin4Type("samples", "test_ns", samples)
+    assert isinstance(pin, ArrayPin)
+    assert pin.to_dict()["value"]["dtype"] == "d"
+    assert pin.read_slice("1:3") == [2.0, 3.0]
+    assert pin.read_slice("-1") == [4.0]
+    for index in ("4", "-5"):
+        with pytest.raises(IndexError):
+            pin.read_slice(index)
+
+    stats = _python_stats(memoryview(samples), bins=3)
+    assert (stats["min"], stats["max"], stats["mean"]) == (1.0, 4.0, 2.5)
+    assert stats["histogram"]["counts"] == [1, 1, 2]
+    assert _python_downsample(memoryview(samples), 2)["max"] == [2.0, 4.0]
+    assert pin.summary(bins=3)["stats"]["std"] == pytest.approx(stats["std"])
+
+
+@pytest.mark.parametrize("policy", ["latest-every-1ms", "every-10th"])
+def test_write_policy_trailing_commits_lose_no_assignment(policy):
+    from tiny_prob.pins.policies import WritePolicy
+
+    pin = NumericPin(name="counter", namespace="test", value=0)
+    delay, WritePolicy.TRAILING_COMMIT_DELAY = WritePolicy.TRAILING_COMMIT_DELAY, 0.001
+    try:
+        pin.set_write_policy(policy)
+        for _ in range(300_000):
+            pin._write(pin.read_value() + 1)
+    finally:
+        WritePolicy.TRAILING_COMMIT_DELAY = delay
+    assert pin.read_value() == 300_000
@@ -0,0 +1,81 @@
+from threading import Event, Thread
+
+import pytest
+
+from tiny_prob.profiler import ProfileRunning, SamplingProfiler, folded
+
+
+def spin(stop: Event) -> None:
+    while not stop.is_set():
+        sum(range(100))
+
+
+def test_profile_samples_other_threads():
+    stop = Event()
+    worker = Thread(target=spin, args=(stop,), name="spinner")
+    worker.start()
+    try:
+        profile = SamplingProfiler().profile(seconds=0.3, hz=200)
+    finally:
+        stop.set()
+        worker.join()
+
+    assert profile["samples"] > 0
+    assert 0 < profile["overhead"] < 1
+    spinner = {stack: count for stack, count in profile["stacks"].items() if "spinner" in stack}
+    assert any(stack.startswith("spinner;") and "spin (" in stack for stack in spinner)
+    # The thread that asked for the profile is not sampled.
+    assert not any("test_profile_samples_other_threads" in stack for stack in profile["stacks"])
+
+    lines = folded(profile["stacks"]).splitlines()
+    stack, count = lines[0].rsplit(" ", 1)
+    assert int(count) == max(profile["stacks"].values())
+
+
+def test_profile_caps():
+    profiler = SamplingProfiler(max_seconds=0.1, max_hz=20, max_depth=2)
+    stop = Event()
+    worker = Thread(target=spin, args=(stop,))
+    worker.start()
+    try:
+        profile = profiler.profile(seconds=10, hz=10000)
+    finally:
+        stop.set()
+        worker.join()
+    assert profile["duration"] < 1
+    assert profile["samples"] <= 3
+    assert all(stack.count(";") <= 2 for stack in profile["stacks"])
+
+
+def test_one_profile_at_a_time():
+    profiler = SamplingProfiler()
+    started = Thread(target=profiler.profile, kwargs={"seconds": 0.3})
+    started.start()
+    try:
+        with pytest.raises(ProfileRunning):
+            while True:
+                profiler.profile(seconds=0)
+    finally:
+        started.join()
+
+
+def test_profile_does_not_keep_sampled_code_alive():
+    import gc
+    import weakref
+
+    namespace: dict = {}
+    exec("def generated(stop):\n    while not stop.is_set():\n        sum(range(100))", namespace)
+    code = weakref.ref(namespace["generated"].__code__)
+    stop = Event()
+    worker = Thread(target=namespace.pop("generated"), args=(stop,), name="generated")
+    worker.start()
+    profiler = SamplingProfiler()
+    try:
+        profile = profiler.profile(seconds=0.1, hz=200)
+    finally:
+        stop.set()
+        worker.join()
+    assert any("generated (" in stack for stack in profile["stacks"])
+    del worker
+    gc.collect()
+    assert code() is None
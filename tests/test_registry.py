@@ -0,0 +1,60 @@
+import pytest
+
+from tiny_prob.pins import NumericPin, StringPin
+from tiny_prob.registry import PinCollisionError, PinRegistry
+
+
+def test_same_name_in_different_namespaces():
+    registry = PinRegistry()
+    registry.add(NumericPin("a", "App1", 1))
+    registry.add(NumericPin("a", "App2", 2))
+    assert registry["App1/a"].value == 1
+    assert registry["App2/a"].value == 2
+
+    replaced = registry.add(NumericPin("a", "App1", 3))
+    assert replaced.value == 1 and len(registry) == 2
+
+    with pytest.raises(PinCollisionError):
+        registry.add(NumericPin("1/a", "App", 0))
+        registry.add(NumericPin("a", "App/1", 0))
+
+
+def test_query_subtree():
+    registry = PinRegistry()
+    registry.add(NumericPin("speed", "Robot", 1))
+    registry.add(StringPin("state", "Robot", "idle"))
+    registry.add(NumericPin("speed", "Robot/0", 2))
+    registry.add(NumericPin("speed", "Robotic", 3))
+    registry.add(NumericPin("x", "", 0))
+
+    total, pins = registry.query("Robot")
+    assert total == 3
+    assert registry.query("Robot", type="numeric")[0] == 2
+    assert [pin.address for pin in registry.query(pattern="*/speed")[1]] == [
+        "Robot/speed", "Robot/0/speed", "Robotic/speed",
+    ]
+    assert [pin.address for pin in registry.query("Robot", offset=1, limit=1)[1]] == ["Robot/state"]
+    assert registry.namespaces("Robot") == {"Robot": 2, "Robot/0": 1}
+
+    registry.remove("Robot/0/speed")
+    assert "Robot/0" not in registry.namespaces()
+
+
+def test_concurrent_add_and_remove():
+    from threading import Thread
+
+    registry = PinRegistry()
+
+    def churn(name):
+        for _ in range(2000):
+            registry.add(NumericPin(name, "App", 0))
+            registry.remove(f"App/{name}")
+        registry.add(NumericPin(name, "App", 0))
+
+    threads = [Thread(target=churn, args=(f"pin_{i}",)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registry.query("App")[0] == len(registry) == 4
+    assert registry.namespaces() == {"App": 4}
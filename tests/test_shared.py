@@ -0,0 +1,109 @@
+import multiprocessing
+import os
+
+import pytest
+
+from tiny_prob.shared import SharedPinMirror, SharedPinTable
+
+pytestmark = pytest.mark.skipif(os.name != "posix", reason="shared pin tables are POSIX only")
+
+
+@pytest.fixture
+def table():
+    table = SharedPinTable(f"tiny_prob_test_{os.getpid()}", capacity=8, create=True)
+    yield table
+    table.close()
+
+
+def test_slots(table):
+    worker = SharedPinTable(table.name)
+    counter = worker.slot("worker/counter", 0)
+    ratio = worker.slot("worker/ratio", 0.5)
+    ready = worker.slot("worker/ready", False)
+    counter.set(3)
+    ready.set(True)
+    assert worker.slot("worker/counter").get() == 3  # Same slot when attached again
+    assert [name for _, name, _ in table.scan()] == ["worker/counter", "worker/ratio", "worker/ready"]
+    assert table.read(1, ratio.kind)[1] == 0.5
+    assert table.read(2, ready.kind)[1] is True
+    with pytest.raises(ValueError):
+        worker.slot("x" * 41)
+    worker.close()
+
+
+def _worker(name: str) -> None:
+    slot = SharedPinTable(name).slot("child/steps", 0)
+    for i in range(1, 1001):
+        slot.set(i)
+
+
+def test_mirror_from_another_process(table):
+    added, changed = {}, {}
+    mirror = SharedPinMirror(
+        table,
+        on_add=lambda name, kind, value: added.__setitem__(name, value),
+        on_change=lambda name, value: changed.__setitem__(name, value),
+    )
+    process = multiprocessing.get_context("fork").Process(target=_worker, args=(table.name,))
+    process.start()
+    process.join(timeout=10)
+    mirror.poll()
+    assert added == {"child/steps": 1000}
+    mirror.poll()
+    assert changed == {}
+
+
+def test_torn_slots_are_not_published(table):
+    from tiny_prob.shared import LINE_SIZE, _SEQ
+
+    changed = {}
+    mirror = SharedPinMirror(
+        table, on_add=lambda *args: None, on_change=changed.__setitem__
+    )
+    slot = SharedPinTable(table.name).slot("worker/steps", 1)
+    mirror.poll()
+    _SEQ.pack_into(table._SharedPinTable__shm.buf, LINE_SIZE, 3)  # A write that never ends
+    assert table.read(0, slot.kind) is None
+    mirror.poll()
+    assert changed == {}
+    _SEQ.pack_into(table._SharedPinTable__shm.buf, LINE_SIZE, 4)
+    mirror.poll()
+    assert changed == {"worker/steps": 1}
+
+
+def test_slot_of_a_crashed_writer(table):
+    from tiny_prob.shared import LINE_SIZE, _SEQ
+
+    SharedPinTable(table.name).slot("worker/steps", 1)
+    _SEQ.pack_into(table._SharedPinTable__shm.buf, LINE_SIZE, 5)  # Died during a write
+    restarted = SharedPinTable(table.name).slot("worker/steps")
+    restarted.set(2)
+    assert table.read(0, restarted.kind) == (8, 2)
+
+
+def test_mirror_survives_callback_errors(table):
+    from time import sleep
+
+    changed = {}
+
+    def on_change(name, value):
+        changed[name] = value
+        if value == 2:
+            raise KeyError(name)  # e.g. the pin was removed
+
+    mirror = SharedPinMirror(
+        SharedPinTable(table.name),
+        on_add=lambda *args: None,
+        on_change=on_change,
+        poll_interval=0.01,
+    )
+    slot = SharedPinTable(table.name).slot("worker/steps", 1)
+    mirror.start()
+    try:
+        slot.set(2)
+        sleep(0.1)
+        slot.set(3)
+        sleep(0.1)
+    finally:
+        mirror.close()
+    assert changed == {"worker/steps": 3}
@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from tiny_prob.pins import NumericPin
+from tiny_prob.stream import PinBroadcaster
+
+
+def test_broadcaster_coalesces_writes():
+    broadcaster = PinBroadcaster(max_rate=1000)
+    pin = NumericPin(name="test_stream", namespace="test_ns", value=0)
+    pin._observers.append(broadcaster.notify)
+    queue = broadcaster.subscribe()
+
+    for i in range(100):
+        pin.write_value(i)
+    message = json.loads(queue.get(timeout=1))
+    assert [p["name"] for p in message["pins"]] == ["test_ns/test_stream"]
+    broadcaster.close()
+
+
+def test_broadcaster_stream_ends_on_close():
+    broadcaster = PinBroadcaster()
+    stream = broadcaster.stream(broadcaster.subscribe())
+    assert next(stream).startswith("retry:")
+    broadcaster.close()
+    assert list(stream) == []
+
+
+def test_broadcaster_refreshes_timers():
+    from tiny_prob.pins import TimerPin
+
+    timer = TimerPin("test_timer", "test_ns")
+    broadcaster = PinBroadcaster(refresh=timer.refresh, refresh_interval=0.01)
+    timer._observers.append(broadcaster.notify)
+    queue = broadcaster.subscribe()
+
+    timer.record(1000)
+    message = json.loads(queue.get(timeout=1))
+    assert message["pins"][0]["value"]["count"] == 1
+    broadcaster.close()
+
+
+def test_broadcaster_rejects_non_positive_rates():
+    with pytest.raises(ValueError):
+        PinBroadcaster(max_rate=0)
+    broadcaster = PinBroadcaster()
+    for rate in (0, -1, float("nan")):
+        with pytest.raises(ValueError):
+            broadcaster.set_max_rate("pin", rate)
+    broadcaster.set_max_rate("pin", None)
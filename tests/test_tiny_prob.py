@@ -1,7 +1,40 @@
 import pytest
+from contextlib import contextmanager
+from bottle import request
 from tiny_prob import TinyProb, SetConfig
 
 
+@contextmanager
+def patch_query(**params):
+    from urllib.parse import urlencode
+
+    request.bind({"QUERY_STRING": urlencode(params)})
+    try:
+        yield
+    finally:
+        request.bind({})
+
+
+@contextmanager
+def patch_body(**payload):
+    import io
+    import json
+
+    body = json.dumps(payload).encode()
+    request.bind(
+        {
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(body)),
+            "REQUEST_METHOD": "POST",
+            "wsgi.input": io.BytesIO(body),
+        }
+    )
+    try:
+        yield
+    finally:
+        request.bind({})
+
+
 def test_singleton_instance():
     instance1 = TinyProb()
     instance2 = TinyProb()
@@ -50,3 +83,410 @@ def test_append_log(tiny_prob):
 def test_get_log_handler(tiny_prob):
     handler = tiny_prob.get_log_handler()
     assert handler is not None
+
+
+def test_add_pin_fast_read(tiny_prob):
+    getter, setter = tiny_prob.add_pin("fast_pin", 1, fast_read=True)
+    setter(value="7")
+    assert getter() == 7
+
+
+def test_add_instance_pin(tiny_prob):
+    import gc
+
+    getter, setter = tiny_prob.add_instance_pin("count", 0, "Worker")
+
+    class Worker:
+        count = property(getter, setter)
+
+    first, second = Worker(), Worker()
+    first.count = 5
+    assert first.count == 5
+    assert second.count == 0
+    assert tiny_prob.instance_pins("Worker/0")["count"].read_value() == 5
+    assert "Worker/1/count" in tiny_prob._TinyProb__all_pins()
+
+    del first
+    gc.collect()
+    assert tiny_prob.instance_pins("Worker/0") == {}
+    assert "Worker/0/count" not in tiny_prob._TinyProb__all_pins()
+
+
+def test_pins_since(tiny_prob):
+    import json
+
+    _, setter = tiny_prob.add_pin("delta_pin", 1)
+    tiny_prob.add_pin("other_pin", 2)
+    full = json.loads(tiny_prob._TinyProb__pins_since())
+    assert full["reset"] is True
+    created = {pin["name"]: pin["created"] for pin in full["pins"]}
+    assert created["delta_pin"] < created["other_pin"]
+
+    setter(value=3)
+    tiny_prob.remove_pin("other_pin")
+    with patch_query(version=full["version"]):
+        delta = json.loads(tiny_prob._TinyProb__pins_since())
+    assert delta["reset"] is False
+    assert [pin["name"] for pin in delta["pins"]] == ["delta_pin"]
+    assert delta["pins"][0]["created"] == created["delta_pin"]
+    assert delta["removed"] == ["other_pin"]
+
+    # A cursor ahead of the server, e.g. from before a restart, gets a full resync.
+    with patch_query(version=delta["version"] + 10**9):
+        ahead = json.loads(tiny_prob._TinyProb__pins_since())
+    assert ahead["reset"] is True and "delta_pin" in [pin["name"] for pin in ahead["pins"]]
+
+    # So does a cursor of another epoch (run) of the server.
+    with patch_query(version=delta["version"], epoch=delta["epoch"]):
+        assert json.loads(tiny_prob._TinyProb__pins_since())["reset"] is False
+    with patch_query(version=delta["version"], epoch="restarted"):
+        assert json.loads(tiny_prob._TinyProb__pins_since())["reset"] is True
+
+
+def test_pin_types(tiny_prob):
+    import json
+
+    tiny_prob.add_pin("typed_pin", 1)
+    types = json.loads(tiny_prob._TinyProb__pin_types())
+    assert "type='number'" in types["numeric"]["editable_html"]
+    assert "{name}" in types["event"]["value"]
+    pins = json.loads(tiny_prob._TinyProb__all_pins())
+    assert all("html_template" not in pin for pin in pins)
+
+
+def test_read_logs_after(tiny_prob):
+    import json
+
+    tiny_prob.append_log("first")
+    tiny_prob.append_log("second")
+    seq = tiny_prob._TinyProb__logs.last_seq
+    with patch_query(after=seq - 1, limit=10):
+        logs = json.loads(tiny_prob._TinyProb__read_logs())
+    assert [log["message"] for log in logs] == ["second"]
+    assert logs[0]["seq"] == seq
+
+
+def test_write_many(tiny_prob):
+    tiny_prob.add_pin("kp", 1.0)
+    tiny_prob.add_pin("ki", 0.0)
+    before = tiny_prob.snapshot()
+
+    generation = tiny_prob.write_many({"kp": 2.0, "ki": "0.5"})
+    snapshot = tiny_prob.snapshot()
+    assert snapshot.generation == generation
+    assert (snapshot.values["kp"], snapshot.values["ki"]) == (2.0, 0.5)
+    assert (before.values["kp"], before.values["ki"]) == (1.0, 0.0)
+
+    with tiny_prob.write_many() as batch:
+        batch["kp"] = 3.0
+        assert tiny_prob.snapshot().values["kp"] == 2.0
+    assert tiny_prob.snapshot().values["kp"] == 3.0
+    assert tiny_prob.snapshot().generation == batch.generation
+
+    with pytest.raises(KeyError):
+        tiny_prob.write_many({"kp": 4.0, "missing_pin": 1})
+    assert tiny_prob.snapshot().values["kp"] == 3.0
+
+    # A commit waits for the pin locks, so it never interleaves with a pin write.
+    from threading import Thread
+
+    pin = tiny_prob.query_pins(pattern="kp")[1][0]
+    pin._thread_lock.acquire()
+    committer = Thread(target=tiny_prob.write_many, args=({"kp": 5.0, "ki": 1.0},))
+    committer.start()
+    committer.join(timeout=0.1)
+    assert committer.is_alive() and pin.value == 3.0
+    pin._thread_lock.release()
+    committer.join()
+    assert tiny_prob.snapshot().values["kp"] == 5.0
+
+
+def test_pin_history(tiny_prob):
+    import json
+
+    _, setter = tiny_prob.add_pin("history_pin", 0, history=100)
+    for i in range(1, 10):
+        setter(value=i)
+    with patch_query(name="history_pin", max_points=5):
+        history = json.loads(tiny_prob._TinyProb__pin_history())
+    assert history["decimated"] is True
+    assert len(history["t"]) == 5
+    assert history["min"][0] == 0 and history["max"][-1] == 9
+
+    from bottle import HTTPError
+
+    tiny_prob.add_pin("no_history_pin", 0)
+    for params in (
+        {"max_points": 0},
+        {"max_points": "many"},
+        {"from": "yesterday"},
+        {"name": "no_history_pin"},
+    ):
+        with patch_query(**{"name": "history_pin", **params}), pytest.raises(HTTPError) as error:
+            tiny_prob._TinyProb__pin_history()
+        assert error.value.status_code == 400
+
+
+def test_binary_response(tiny_prob):
+    from tiny_prob import wire
+
+    tiny_prob.add_pin("wire_pin", [1.5, 2.5])
+    request.bind({"HTTP_ACCEPT": wire.CONTENT_TYPE})
+    try:
+        pins = wire.decode(tiny_prob._TinyProb__all_pins())
+    finally:
+        request.bind({})
+    assert [pin["value"] for pin in pins if pin["name"] == "wire_pin"] == [[1.5, 2.5]]
+
+
+def test_share_pins(tiny_prob):
+    import os
+    import time
+    from tiny_prob.shared import SharedPinTable
+
+    name = f"tiny_prob_share_{os.getpid()}"
+    tiny_prob.share_pins(name, capacity=4, poll_interval=0.01)
+    tiny_prob.add_timer("poll", namespace=name)  # Not from the table
+    try:
+        slot = SharedPinTable(name).slot("worker-0/requests", 0)
+        slot.set(42)
+        deadline = time.monotonic() + 2
+        while time.monotonic() < deadline:
+            if tiny_prob.snapshot().values.get(f"{name}/worker-0/requests") == 42:
+                break
+            time.sleep(0.01)
+        assert tiny_prob.snapshot().values[f"{name}/worker-0/requests"] == 42
+    finally:
+        tiny_prob.unshare_pins(name)
+    assert f"{name}/worker-0/requests" not in tiny_prob.snapshot().values
+    assert f"{name}/poll" in tiny_prob.snapshot().values
+
+
+def test_instance_pins_of_cyclic_instances(tiny_prob):
+    import gc
+    from threading import Thread
+
+    getter, setter = tiny_prob.add_instance_pin("count", 0, "Cyclic")
+
+    class Cyclic:
+        count = property(getter, setter)
+
+        def __init__(self):
+            self.me = self  # Only freed by the cyclic GC, which can run during a registration
+            self.count = 1
+
+    def churn():
+        for _ in range(2000):
+            Cyclic()
+
+    threshold = gc.get_threshold()
+    gc.set_threshold(1)
+    try:
+        worker = Thread(target=churn, daemon=True)
+        worker.start()
+        worker.join(timeout=10)
+    finally:
+        gc.set_threshold(*threshold)
+    assert not worker.is_alive()
+    gc.collect()
+    assert not [name for name in tiny_prob._TinyProb__all_pins() if "Cyclic/" in name]
+
+
+def test_pins_are_namespaced(tiny_prob):
+    import json
+
+    get_first, _ = tiny_prob.add_pin("a", 1, "First")
+    get_second, _ = tiny_prob.add_pin("a", 2, "Second")
+    assert (get_first(), get_second()) == (1, 2)
+    with patch_query(namespace="Second", limit=10):
+        page = json.loads(tiny_prob._TinyProb__query_pins())
+    assert page["total"] == 1
+    assert [pin["name"] for pin in page["pins"]] == ["Second/a"]
+
+
+def test_timers(tiny_prob):
+    import json
+    from tiny_prob import timed
+
+    @timed(namespace="test_ns")
+    def work():
+        return 42
+
+    assert work() == 42
+    with tiny_prob.span("block", namespace="test_ns"):
+        pass
+    with tiny_prob.span("block", namespace="test_ns"):
+        pass
+
+    pins = {pin["name"]: pin for pin in json.loads(tiny_prob._TinyProb__all_pins())}
+    assert pins["test_ns/test_timers.<locals>.work"]["value"]["count"] == 1
+    assert pins["test_ns/block"]["type"] == "timer"
+    assert pins["test_ns/block"]["value"]["count"] == 2
+
+    with patch_query(version=pins["test_ns/block"]["version"]):
+        delta = json.loads(tiny_prob._TinyProb__pins_since())
+    assert "test_ns/block" not in [pin["name"] for pin in delta["pins"]]
+    with tiny_prob.span("block", namespace="test_ns"):
+        pass
+    with patch_query(version=delta["version"]):
+        delta = json.loads(tiny_prob._TinyProb__pins_since())
+    assert [pin["value"]["count"] for pin in delta["pins"]] == [3]
+
+
+def test_timer_created_by_concurrent_spans(tiny_prob):
+    import json
+    import sys
+    from threading import Barrier, Thread
+
+    names = [f"race_timer_{i}" for i in range(50)]
+    barrier = Barrier(8)
+
+    def time_sections():
+        for name in names:
+            barrier.wait()
+            with tiny_prob.span(name, namespace="test_ns"):
+                pass
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [Thread(target=time_sections) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    pins = {pin["name"]: pin for pin in json.loads(tiny_prob._TinyProb__all_pins())}
+    assert [pins[f"test_ns/{name}"]["value"]["count"] for name in names] == [8] * len(names)
+
+
+def test_profile_endpoint(tiny_prob):
+    import json
+    import time
+
+    with patch_query(seconds=0.1, hz=50, format="json"):
+        profile = json.loads(tiny_prob._TinyProb__profile())
+    assert profile["duration"] >= 0.1
+    assert set(profile) == {"stacks", "samples", "duration", "hz", "overhead"}
+
+    from bottle import HTTPError
+
+    for params in ({"seconds": "nan"}, {"hz": "nan"}, {"seconds": "inf"}, {"seconds": "soon"}):
+        with patch_query(**params), pytest.raises(HTTPError) as error:
+            tiny_prob._TinyProb__profile()
+        assert error.value.status_code == 400
+
+    from threading import Thread
+
+    running = Thread(target=tiny_prob._TinyProb__profiler.profile, args=(0.5,))
+    running.start()
+    try:
+        time.sleep(0.1)
+        with patch_query(seconds=0.1), pytest.raises(HTTPError) as error:
+            tiny_prob._TinyProb__profile()
+        assert error.value.status_code == 409
+    finally:
+        running.join()
+
+
+def test_metrics_endpoint(tiny_prob):
+    import json
+
+    tiny_prob.add_pin("metered_pin", 1)
+    tiny_prob._TinyProb__all_pins()
+    text = tiny_prob._TinyProb__metrics()
+    assert "# TYPE tiny_prob_pin_writes_total counter" in text
+    assert 'tiny_prob_serialization_seconds_count{endpoint="/all_pins"}' in text
+
+    with patch_query(format="json"):
+        metrics = json.loads(tiny_prob._TinyProb__metrics())
+    assert metrics["tiny_prob_pins"] == len(tiny_prob.query_pins()[1])
+    assert metrics['tiny_prob_serialization_seconds_count{endpoint="/all_pins"}'] >= 1
+
+
+def test_pin_array(tiny_prob):
+    import json
+
+    np = pytest.importorskip("numpy")
+    tiny_prob.add_array("array_pin", np.linspace(0, 1, 10_000).reshape(100, 100))
+    with patch_query(name="array_pin", slice="0:10", bins=4, max_points=50):
+        summary = json.loads(tiny_prob._TinyProb__pin_array())
+    assert summary["shape"] == [100, 100]
+    assert summary["stats"]["count"] == 1000
+    assert len(summary["stats"]["histogram"]["counts"]) == 4
+    assert len(summary["plot"]["value"]) == 50
+
+    from bottle import HTTPError
+
+    with patch_query(name="array_pin", bins=10**9, max_points=10**9):
+        summary = json.loads(tiny_prob._TinyProb__pin_array())
+    assert len(summary["stats"]["histogram"]["counts"]) == 1000
+    for params in ({"bins": 0}, {"max_points": -1}, {"slice": "1:2:3:4"}):
+        with patch_query(name="array_pin", **params), pytest.raises(HTTPError) as error:
+            tiny_prob._TinyProb__pin_array()
+        assert error.value.status_code == 400
+
+
+def test_pin_value_slices():
+    import json
+
+    np = pytest.importorskip("numpy")
+    from bottle import HTTPError
+    from tiny_prob.tiny_prob import TinyProb as TinyProbClass
+
+    tp = TinyProbClass(quiet=True)  # The singleton's /pin_value is shadowed by another test
+    tp.add_array("slice_pin", np.arange(10.0))
+    getter, _ = tp.add_pin("written_pin", 0)
+    with patch_body(slice={"slice_pin": "2:4"}):
+        response = json.loads(tp._TinyProb__pin_value())
+    assert response["read_pins"]["slice_pin"] == [2.0, 3.0]
+    for expression in ("1:2:3:4", "10", "0,1"):
+        with patch_body(write_pins={"written_pin": 1}, slice={"slice_pin": expression}):
+            with pytest.raises(HTTPError) as error:
+                tp._TinyProb__pin_value()
+        assert error.value.status_code == 400
+    assert getter() == 0  # The writes of the refused requests were not applied
+
+
+def test_write_policy_trailing_commit(tiny_prob):
+    import json
+    import time
+
+    getter, setter = tiny_prob.add_pin("burst_pin", 0, write_policy="latest-every-50ms")
+    with patch_query(version=0):
+        version = json.loads(tiny_prob._TinyProb__pins_since())["version"]
+    for i in range(1, 1001):
+        setter(value=i)
+    assert getter() == 1000
+    time.sleep(0.2)
+    with patch_query(version=version):
+        pins = json.loads(tiny_prob._TinyProb__pins_since())["pins"]
+    assert [pin["value"] for pin in pins if pin["name"] == "burst_pin"] == [1000]
+
+
+def test_pins_since_misses_no_concurrent_write(tiny_prob):
+    import json
+    from threading import Thread
+
+    setters = [tiny_prob.add_pin(f"race_pin_{i}", 0)[1] for i in range(4)]
+    seen = {}
+    with patch_query(version=0):
+        version = json.loads(tiny_prob._TinyProb__pins_since())["version"]
+
+    def write(setter):
+        for value in range(1, 2001):
+            setter(value=value)
+
+    writers = [Thread(target=write, args=(setter,)) for setter in setters]
+    for writer in writers:
+        writer.start()
+    while any(writer.is_alive() for writer in writers):
+        with patch_query(version=version):
+            delta = json.loads(tiny_prob._TinyProb__pins_since())
+        version = delta["version"]
+        seen.update((pin["name"], pin["value"]) for pin in delta["pins"])
+    with patch_query(version=version):
+        delta = json.loads(tiny_prob._TinyProb__pins_since())
+    seen.update((pin["name"], pin["value"]) for pin in delta["pins"])
+    assert all(seen[f"race_pin_{i}"] == 2000 for i in range(4))
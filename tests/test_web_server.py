@@ -1,3 +1,4 @@
+import gzip
 import time
 import pytest
 from threading import Thread
@@ -41,3 +42,69 @@ def test_start_stop_server(webserver):
     time.sleep(1)
     webserver.stop_server()
     assert webserver._WebServer__app_thread is None
+
+
+def test_unknown_server_backend():
+    with pytest.raises(ValueError):
+        WebServer(server="unknown")
+
+
+@pytest.mark.parametrize("backend", ["simple", "threaded", "threadpool", "asyncio"])
+def test_server_backends(backend):
+    from urllib.request import urlopen
+
+    server = WebServer(port=8082, server=backend, quiet=True)
+    server.start(blocking=False)
+    time.sleep(0.5)
+    try:
+        response = urlopen("http://127.0.0.1:8082/", timeout=5)
+        assert response.status == 200
+        assert b"<title>TinyProb</title>" in response.read()
+    finally:
+        server.stop_server(timeout=5)
+
+
+def test_server_backend_names():
+    from tiny_prob.servers import SERVER_BACKENDS
+    from tiny_prob.webserver import SERVER_BACKEND_NAMES
+
+    assert set(SERVER_BACKEND_NAMES) == set(SERVER_BACKENDS)
+
+
+def test_static_caching(webserver):
+    from bottle import request
+
+    request.bind({"QUERY_STRING": "", "HTTP_ACCEPT_ENCODING": "gzip"})
+    try:
+        index = webserver.index()
+        assert isinstance(index, bytes)  # gzipped
+        assert "/static/scanner.js?v=" in gzip.decompress(index).decode()
+
+        response = webserver.static("scanner.js")
+        assert response.get_header("Cache-Control") == "no-cache"
+        assert response.get_header("Content-Encoding") == "gzip"
+        etag = response.get_header("ETag")
+
+        version = etag.strip('"')
+        request.bind({"QUERY_STRING": f"v={version}", "HTTP_IF_NONE_MATCH": etag})
+        response = webserver.static("scanner.js")
+        assert response.status_code == 304
+        assert "immutable" in response.get_header("Cache-Control")
+    finally:
+        request.bind({})
+
+
+def test_large_responses_are_gzipped(webserver):
+    from bottle import request, response
+
+    request.bind({"HTTP_ACCEPT_ENCODING": "gzip"})
+    try:
+        assert webserver._encode_response([1]) == "[1]"
+        assert response.get_header("Vary") == "Accept, Accept-Encoding"  # Even when not gzipped
+        assert webserver._compress_response("small") == "small"
+        assert response.get_header("Vary") == "Accept-Encoding"
+        body = webserver._encode_response(list(range(1000)))
+        assert response.get_header("Content-Encoding") == "gzip"
+        assert gzip.decompress(body) == str(list(range(1000))).encode()
+    finally:
+        request.bind({})
@@ -0,0 +1,30 @@
+from tiny_prob import wire
+
+
+def test_round_trip():
+    payload = {
+        "none": None,
+        "flags": [True, False],
+        "int": -5,
+        "float": 1.5,
+        "text": "héllo",
+        "ints": [1, 2, 3],
+        "floats": [1.5, 2],
+        "big_ints": [2**40, 2**53 + 1],
+        "huge_ints": [2**70, 1],
+        "bools": [1, True, 0.5],
+        "mixed": [1, "a", {"nested": []}],
+        "blob": b"\x00\x01",
+    }
+    decoded = wire.decode(wire.encode(payload))
+    assert decoded == {**payload, "floats": [1.5, 2.0], "huge_ints": [2.0**70, 1]}
+    assert [type(item) for item in decoded["bools"]] == [int, bool, float]
+    assert [type(item) for item in decoded["big_ints"]] == [int, int]
+
+
+def test_numeric_lists_are_packed():
+    encoded = wire.encode(list(range(1000)))
+    assert encoded[:1] == b"J"
+    assert len(encoded) == 1 + 4 + 4 * 1000
+    assert wire.encode([0.5] * 10)[:1] == b"D"
+    assert wire.encode([2**40] * 10)[:1] == b"Q"
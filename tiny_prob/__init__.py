@@ -1,5 +1,13 @@
 from tiny_prob.pins import EventProb
+from tiny_prob.pins.executors import (
+    AsyncioCallbackExecutor,
+    CallbackExecutor,
+    ThreadPoolCallbackExecutor,
+)
+from tiny_prob.pins.policies import WritePolicy
 from .tiny_prob import TinyProb as TinyProbClass
+from functools import wraps
+from time import perf_counter_ns
 from typing import Any, TypeVar
 
 T = TypeVar("T")
@@ -59,6 +67,25 @@ def SetConfig(**kwargs) -> None:
         "debug": True,
         "reloader": False,
         "quiet": True,
+        host="127.0.0.1"
+        port=8080
+        server="threaded": The HTTP server backend, one of "simple" (one request at a time),
+            "threaded" (a thread per request), "threadpool" (bounded thread pool) and "asyncio"
+            (asyncio with keep-alive).
+        server_options: Extra arguments of the server backend, e.g. {"workers": 32} for
+            "threadpool" and "asyncio".
+        stream_max_rate=20.0: Max updates per second of each pin on `/pin_stream`.
+        log_capacity=10000: Max number of logs kept in memory.
+        log_max_bytes=4MB: Max total size of the logs kept in memory.
+        event_workers=0: If set, event callbacks (e.g. `@listener`) run on a pool of this many
+            threads instead of the server thread.
+        event_max_pending=1000: Max number of queued event callbacks; further triggers are dropped.
+        write_policy="every": Default write policy of the captured attributes, one of "every",
+            "latest-every-<N>ms" (at most one commit every N ms) and "every-<N>th" (one
+            assignment out of N). Skipped assignments only store the value.
+        profile_max_seconds=60, profile_max_hz=1000: Caps of the `/profile` sampling profiler.
+        profile_max_overhead=0.05: Max fraction of the time `/profile` spends sampling; the
+            sampling rate is lowered past it.
 
     Example:
     ```python
@@ -89,18 +116,43 @@ def TinyProb() -> TinyProbClass:
     return __TinyProbSingleton.get_instance()  # type: ignore
 
 
-def __capture_variable(cls: T, name: str, value: Any) -> None:
-    getter, setter = TinyProb().add_pin(name, value, cls.__name__)
+def __capture_variable(
+    cls: T,
+    name: str,
+    value: Any,
+    fast_read: bool = False,
+    per_instance: bool = False,
+    write_policy: str | None = None,
+) -> None:
+    add_pin = TinyProb().add_instance_pin if per_instance else TinyProb().add_pin
+    getter, setter = add_pin(
+        name, value, cls.__name__, fast_read=fast_read, write_policy=write_policy
+    )
     setattr(cls, name, property(getter, setter))
 
 
-def capture_all(cls: T) -> T:
+def capture_all(
+    cls: T | None = None,
+    *,
+    fast_read: bool = False,
+    per_instance: bool = False,
+    write_policy: str | None = None,
+) -> T:
     """
     Capture all the variables of a class.
     How? All variables are replaced with a Pin, and then getter/setter functions are added to the 
     class to access the value of the variable. Any variable not supported by the Pin system will be
     ignored.
 
+    Args:
+        fast_read (bool): Read the captured attributes without locking or coercion. Values are
+            coerced once when written instead. Useful for attributes read in hot loops.
+        per_instance (bool): Give every instance of the class its own pins, addressed as
+            `ClassName/instance_id/attr`, instead of one pin shared by all instances.
+        write_policy (str): How often assignments are committed: "every", "latest-every-<N>ms"
+            or "every-<N>th". Defaults to the `write_policy` of `SetConfig`. Useful for
+            attributes assigned in tight loops.
+
     Example:
     ```python
     @capture_all
@@ -109,26 +161,53 @@ def capture_all(cls: T) -> T:
         b: str = "Hello"
         c: dict = {"a": 1, "b": 2, "c": 3}
         d: SomeClass = SomeClass()  # will be ignored
+
+    @capture_all(fast_read=True)
+    class ControlLoop:
+        gain: float = 0.5
+
+    @capture_all(per_instance=True)
+    class Worker:
+        processed: int = 0
+
+    @capture_all(write_policy="latest-every-50ms")
+    class Simulation:
+        step: int = 0
     ```
     """
-    attributes = list(vars(cls).items())
-    for name, value in attributes:
-        if name.startswith("__") or callable(value):
-            continue
-        try:
-            __capture_variable(cls, name, value)
-        except NotImplementedError:
-            print(
-                f"[Warning] Variable '{name}' of type '{type(value)}' is not supported for probing."
-            )  # FIXME: change this to a log
-            continue
-    return cls
+    def decorator(cls: T) -> T:
+        attributes = list(vars(cls).items())
+        for name, value in attributes:
+            if name.startswith("__") or callable(value):
+                continue
+            try:
+                __capture_variable(
+                    cls,
+                    name,
+                    value,
+                    fast_read=fast_read,
+                    per_instance=per_instance,
+                    write_policy=write_policy,
+                )
+            except NotImplementedError:
+                print(
+                    f"[Warning] Variable '{name}' of type '{type(value)}' is not supported for probing."
+                )  # FIXME: change this to a log
+                continue
+        return cls
 
+    if cls is None:
+        return decorator
+    return decorator(cls)
 
-def capture(*args):
+
+def capture(
+    *args, fast_read: bool = False, per_instance: bool = False, write_policy: str | None = None
+):
     """
     Capture only the variables passed as arguments, and replace them with Pins. Getter/setter will be
     added to the class to access the value of the variable.
+    Takes the same keyword arguments as `capture_all`.
 
     Example:
     ```python
@@ -141,7 +220,14 @@ def capture(*args):
     """
     def decorator(cls: T) -> T:
         for name in args:
-            __capture_variable(cls, name, getattr(cls, name))
+            __capture_variable(
+                cls,
+                name,
+                getattr(cls, name),
+                fast_read=fast_read,
+                per_instance=per_instance,
+                write_policy=write_policy,
+            )
         return cls
 
     return decorator
@@ -171,12 +257,63 @@ def capture_primitive(cls: T) -> T:
             pass
     return cls
 
-def listener(func):
+def listener(func=None, *, executor: CallbackExecutor | None = None):
     """
     Add a listener to the function. The function will be called whenever the event is triggered.
+    The function can take the event value as its only argument, or no argument at all.
+
+    Args:
+        executor: Run the function on this executor (e.g. `ThreadPoolCallbackExecutor` or
+            `AsyncioCallbackExecutor`) instead of the default one.
     """
     # FIXME: this is currently only working for static functions
-    ev = TinyProb().add_event_pin(name=func.__name__, namespace=func.__module__ if func.__module__ != "__main__" else None)
-    ev += func
-    return ev
-    
\ No newline at end of file
+    def decorator(func):
+        ev = TinyProb().add_event_pin(
+            name=func.__name__,
+            namespace=func.__module__ if func.__module__ != "__main__" else None,
+            executor=executor,
+        )
+        ev += func
+        return ev
+
+    if func is None:
+        return decorator
+    return decorator(func)
+    
+
+def timed(func=None, *, name: str | None = None, namespace: str | None = None):
+    """
+    Time every call of the function into a timer pin (call count, total / mean / max time,
+    percentiles and latency histogram), named after the function unless `name` is given.
+    See `TinyProb.span` to time a block of code instead.
+
+    Example:
+    ```python
+    @timed
+    def step():
+        ...
+
+    @timed(name="inference")
+    def run_model(batch):
+        ...
+    ```
+    """
+    def decorator(func):
+        timer = TinyProb().add_timer(
+            name=name or func.__qualname__,
+            namespace=namespace or (func.__module__ if func.__module__ != "__main__" else None),
+        ).timer
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            started_at = perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timer.record(perf_counter_ns() - started_at)
+
+        return wrapper
+
+    if func is None:
+        return decorator
+    return decorator(func)
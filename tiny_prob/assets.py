@@ -0,0 +1,116 @@
+"""
+Static assets of the web UI, served from memory.
+
+Assets are read and compressed once (gzip, and brotli if the `brotli` package is installed),
+and identified by a content hash used both as ETag and as fingerprint: pages link to
+`/static/<file>?v=<hash>`, which can be cached forever since any change of the file changes the
+URL. Requests without the fingerprint are revalidated with the ETag.
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+from typing import NamedTuple
+
+CACHE_FOREVER = "public, max-age=31536000, immutable"
+CACHE_REVALIDATE = "no-cache"
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+
+
+class Asset(NamedTuple):
+    content_type: str
+    version: str  # Content hash
+    encodings: dict[str, bytes]  # {"identity": data, "gzip": ..., "br": ...}
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.version}"'
+
+
+def make_asset(data: bytes, content_type: str) -> Asset:
+    """
+    Hash and precompress an asset. Compressed encodings are only kept if they are smaller.
+    """
+    encodings = {"identity": data}
+    if content_type.startswith(COMPRESSIBLE_TYPES):
+        for encoding, compressed in (("gzip", _gzip(data, 9)), ("br", _brotli(data))):
+            if compressed is not None and len(compressed) < len(data):
+                encodings[encoding] = compressed
+    return Asset(content_type, hashlib.sha256(data).hexdigest()[:16], encodings)
+
+
+def negotiate(asset: Asset, accept_encoding: str) -> str:
+    """
+    The best encoding of the asset accepted by the client (brotli, then gzip, then none).
+    """
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ("br", "gzip"):
+        if encoding in asset.encodings and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
+
+
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """
+    The encodings of an Accept-Encoding header, without those refused with q=0.
+    """
+    accepted = set()
+    for token in accept_encoding.split(","):
+        name, _, params = token.partition(";")
+        name, params = name.strip().lower(), params.replace(" ", "")
+        try:
+            quality = float(params[2:]) if params.startswith("q=") else 1.0
+        except ValueError:
+            quality = 1.0
+        if name and quality > 0:
+            accepted.add(name)
+    return accepted
+
+
+def compress_gzip(data: bytes) -> bytes:
+    """
+    Fast gzip compression, for API responses compressed on the fly.
+    """
+    return _gzip(data, 1)
+
+
+class AssetStore:
+    """
+    The files of a static directory (not recursive), loaded and compressed once.
+    """
+
+    def __init__(self, root: str) -> None:
+        self.root = root
+        self.__assets: dict[str, Asset] = {}
+        for entry in os.scandir(root):
+            if entry.is_file():
+                with open(entry.path, "rb") as file:
+                    data = file.read()
+                content_type = mimetypes.guess_type(entry.name)[0] or "application/octet-stream"
+                if content_type.startswith("text/") or content_type == "application/javascript":
+                    content_type += "; charset=utf-8"
+                self.__assets[entry.name] = make_asset(data, content_type)
+
+    def get(self, filename: str) -> Asset | None:
+        return self.__assets.get(filename)
+
+    def url(self, filename: str) -> str:
+        """
+        The fingerprinted URL of an asset.
+        """
+        asset = self.__assets.get(filename)
+        if asset is None:
+            return f"/static/{filename}"
+        return f"/static/{filename}?v={asset.version}"
+
+
+def _gzip(data: bytes, level: int) -> bytes:
+    return gzip.compress(data, compresslevel=level, mtime=0)
+
+
+def _brotli(data: bytes) -> bytes | None:
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data)
@@ -0,0 +1,309 @@
+"""
+Aggregation of many TinyProb instances (nodes) behind one dashboard.
+
+The gateway polls every node incrementally (`/pins_since`, in the binary wire format) over a
+small pool of persistent connections, and mirrors the pins of a node as `node/pin_name`. Writes
+to a mirrored pin are forwarded to the node that owns it, and so are the requests for its frames
+and array statistics (`/pin_image`, `/pin_array`).
+
+Usage:
+    python -m tiny_prob.gateway --port 8000 --node robot-1=http://10.0.0.5:8080 \
+        --node robot-2=http://10.0.0.6:8080
+"""
+import gzip
+import http.client
+import json
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from queue import Empty, LifoQueue
+from threading import Event, Lock, Thread
+from typing import Any, Callable, ClassVar
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from tiny_prob import wire
+from tiny_prob.pins import PinBase
+
+
+class ConnectionPool:
+    """
+    Persistent HTTP connections to one host, reused across requests.
+    """
+
+    def __init__(self, host: str, port: int, size: int = 2, timeout: float = 5.0) -> None:
+        self.__host = host
+        self.__port = port
+        self.__timeout = timeout
+        self.__idle: LifoQueue[http.client.HTTPConnection] = LifoQueue(maxsize=size)
+
+    def request(
+        self, method: str, path: str, body: bytes | None = None, headers: dict | None = None
+    ) -> tuple[int, str, bytes]:
+        """
+        Send a request and return (status, content type, body). A stale keep-alive connection
+        is retried once on a fresh one. Gzipped responses are decompressed.
+        """
+        for attempt in range(2):
+            connection = self.__acquire()
+            try:
+                connection.request(method, path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (ConnectionError, http.client.HTTPException, OSError):
+                connection.close()
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                connection.close()
+            else:
+                self.__release(connection)
+            if response.getheader("Content-Encoding", "") == "gzip":
+                data = gzip.decompress(data)
+            return response.status, response.getheader("Content-Type", ""), data
+
+    def close(self) -> None:
+        while True:
+            try:
+                self.__idle.get_nowait().close()
+            except Empty:
+                return
+
+    def __acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self.__idle.get_nowait()
+        except Empty:
+            return http.client.HTTPConnection(self.__host, self.__port, timeout=self.__timeout)
+
+    def __release(self, connection: http.client.HTTPConnection) -> None:
+        try:
+            self.__idle.put_nowait(connection)
+        except Exception:
+            connection.close()
+
+
+class UpstreamNode:
+    """
+    One TinyProb instance seen by the gateway.
+    """
+
+    def __init__(self, name: str, url: str, pool_size: int = 2, timeout: float = 5.0) -> None:
+        parts = urlsplit(url)
+        self.name = name
+        self.url = url
+        self.version = 0  # Of the last /pins_since response
+        self.epoch = ""  # Of the last /pins_since response, changes when the node restarts
+        self.error: str | None = None  # Of the last failed fetch
+        self.lock = Lock()  # Held while a delta is fetched and applied, to keep them in order
+        self.__pool = ConnectionPool(
+            parts.hostname or "127.0.0.1", parts.port or 80, size=pool_size, timeout=timeout
+        )
+
+    def fetch(self) -> dict[str, Any]:
+        """
+        Get the changes since the last fetch (see `/pins_since`).
+        """
+        status, content_type, data = self.__pool.request(
+            "GET",
+            f"/pins_since?{urlencode({'version': self.version, 'epoch': self.epoch})}",
+            headers={
+                "Accept": f"{wire.CONTENT_TYPE}, application/json",
+                "Accept-Encoding": "gzip",
+            },
+        )
+        if status != 200:
+            raise ConnectionError(f"Node '{self.name}' answered {status}.")
+        if content_type.startswith(wire.CONTENT_TYPE):
+            delta = wire.decode(data)
+        else:
+            delta = json.loads(data)
+        self.version = delta["version"]
+        self.epoch = delta.get("epoch", "")
+        return delta
+
+    def get(
+        self, path: str, params: dict[str, str], headers: dict | None = None
+    ) -> tuple[int, str, bytes]:
+        """
+        Send a GET request to the node and return (status, content type, body).
+        """
+        return self.__pool.request("GET", f"{path}?{urlencode(params)}", headers=headers)
+
+    def write(self, values: dict[str, Any]) -> None:
+        self.__post("/pin_value", {"write_pins": values})
+
+    def write_many(self, values: dict[str, Any]) -> None:
+        """
+        Write a group of pins atomically on the node (see `/write_many`).
+        """
+        self.__post("/write_many", {"write_pins": values})
+
+    def __post(self, path: str, payload: dict[str, Any]) -> None:
+        status, _, _ = self.__pool.request(
+            "POST",
+            path,
+            body=json.dumps(payload).encode(),
+            headers={"Content-Type": "application/json"},
+        )
+        if status != 200:
+            raise ConnectionError(f"Node '{self.name}' answered {status}.")
+
+    def close(self) -> None:
+        self.__pool.close()
+
+
+@dataclass
+class RemotePin(PinBase):
+    """
+    Mirror of a pin of an upstream node. Its value and type are the ones sent by the node, as is
+    its HTML template if the node pin has its own; writing it forwards the value to the node.
+    The URLs in the value (frames of image pins, statistics of array pins) are addressed to the
+    mirror, and the gateway proxies their requests to the node (see `proxy`).
+    """
+
+    _remote: ClassVar[bool] = True
+
+    _node: UpstreamNode | None = field(default=None, repr=False, compare=False)
+    _remote_name: str = ""
+    _template: dict[str, str] | None = field(default=None, repr=False)
+
+    def has_custom_html(self) -> bool:
+        return self._template is not None or super().has_custom_html()
+
+    def compile_html(self) -> dict[str, str]:
+        if self._template is not None:
+            return self._template
+        return super().compile_html()
+
+    def to_web(self, value: Any) -> Any:
+        if isinstance(value, dict) and isinstance(value.get("url"), str):
+            path, _, query = value["url"].partition("?")
+            params = dict(parse_qsl(query))
+            params["name"] = self.address
+            return {**value, "url": f"{path}?{urlencode(params)}"}
+        return value
+
+    def proxy(
+        self, path: str, params: dict[str, str], headers: dict | None = None
+    ) -> tuple[int, str, bytes]:
+        """
+        Forward a read request about this pin (e.g. `/pin_image`) to the node, and return
+        (status, content type, body).
+        """
+        return self._node.get(path, {**params, "name": self._remote_name}, headers=headers)
+
+    def write_value(self, value: Any) -> None:
+        self._node.write({self._remote_name: value})
+        self.mirror(value)
+
+    def mirror(self, value: Any) -> None:
+        """
+        Store a value received from the node.
+        """
+        super().write_value(value)
+
+
+class GatewayPoller:
+    """
+    Poll all the nodes every `poll_interval` seconds, on a pool of `workers` threads, and hand
+    their deltas to `on_delta(node, delta)`.
+    """
+
+    DEFAULT_POLL_INTERVAL = 0.25  # seconds
+    DEFAULT_WORKERS = 8
+
+    def __init__(
+        self,
+        on_delta: Callable[[UpstreamNode, dict[str, Any]], None],
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        workers: int = DEFAULT_WORKERS,
+    ) -> None:
+        self.nodes: dict[str, UpstreamNode] = {}
+        self.__on_delta = on_delta
+        self.__poll_interval = poll_interval
+        self.__pool = ThreadPoolExecutor(workers, thread_name_prefix="tiny-prob-gateway")
+        self.__lock = Lock()
+        self.__stopped = Event()
+        self.__thread: Thread | None = None
+
+    def add(self, node: UpstreamNode) -> None:
+        with self.__lock:
+            self.nodes[node.name] = node
+            if self.__thread is None:
+                self.__thread = Thread(target=self.__run, name="tiny-prob-gateway", daemon=True)
+                self.__thread.start()
+
+    def remove(self, name: str) -> UpstreamNode | None:
+        with self.__lock:
+            node = self.nodes.pop(name, None)
+        if node is not None:
+            node.close()
+        return node
+
+    def poll(self) -> None:
+        """
+        Fetch every node once. Unreachable nodes keep their pins and are retried next time.
+        """
+        with self.__lock:
+            nodes = list(self.nodes.values())
+        wait([self.__pool.submit(self.__poll_node, node) for node in nodes])
+
+    def close(self) -> None:
+        self.__stopped.set()
+        if self.__thread is not None:
+            self.__thread.join(timeout=1)
+        self.__pool.shutdown(wait=False, cancel_futures=True)
+        for name in list(self.nodes):
+            self.remove(name)
+
+    def __poll_node(self, node: UpstreamNode) -> None:
+        with node.lock:
+            try:
+                delta = node.fetch()
+            except (ConnectionError, OSError, ValueError, KeyError) as error:
+                node.error = repr(error)
+                return
+            node.error = None
+            if node.name in self.nodes:
+                self.__on_delta(node, delta)
+
+    def __run(self) -> None:
+        while not self.__stopped.wait(self.__poll_interval):
+            self.poll()
+
+
+def main() -> None:
+    import argparse
+    from time import sleep
+
+    from tiny_prob.tiny_prob import TinyProb
+
+    parser = argparse.ArgumentParser(description="Serve the pins of many TinyProb nodes.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument(
+        "--node", action="append", default=[], metavar="NAME=URL", help="may be repeated"
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=GatewayPoller.DEFAULT_POLL_INTERVAL
+    )
+    args = parser.parse_args()
+
+    tp = TinyProb(
+        host=args.host, port=args.port, quiet=True, gateway_poll_interval=args.poll_interval
+    )
+    for node in args.node:
+        name, _, url = node.partition("=")
+        tp.add_node(name, url)
+    tp.start()
+    print(f"TinyProb gateway on {tp.url}")
+    try:
+        while True:
+            sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        tp.stop_server(timeout=1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+import logging
+from bisect import bisect_left
+from collections import deque
+from enum import Enum
+from threading import Event, Lock, Thread
+from typing import Iterable, NamedTuple
+
+from tiny_prob.metrics import ThreadCounters
+
+
+class LogEntry(NamedTuple):
+    timestamp: float
+    message: str
+    seq: int
+
+
+class LogBuffer:
+    """
+    Fixed-capacity ring buffer of log entries.
+    The oldest entries are dropped once either `capacity` entries or `max_bytes` bytes of messages
+    are exceeded. Every entry gets a sequence number (starting from 1, never reused), so clients
+    can page through the logs with a cursor. Timestamps are expected to be non-decreasing, which
+    makes them bisect-searchable.
+    """
+
+    DEFAULT_CAPACITY = 10000
+    DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, max_bytes: int = DEFAULT_MAX_BYTES):
+        assert capacity > 0, "capacity must be positive"
+        self.__capacity = capacity
+        self.__max_bytes = max_bytes
+        self.__entries: list[LogEntry | None] = [None] * capacity
+        self.__sizes: list[int] = [0] * capacity
+        self.__start = 0
+        self.__count = 0
+        self.__bytes = 0
+        self.__next_seq = 1
+        self.__lock = Lock()
+
+    def append(self, message: str, timestamp: float) -> int:
+        """
+        Append an entry and return its sequence number.
+        """
+        size = len(message.encode("utf-8", "replace"))
+        with self.__lock:
+            return self.__append(message, timestamp, size)
+
+    def extend(self, entries: Iterable[tuple[str, float]]) -> None:
+        """
+        Append a batch of (message, timestamp) entries, taking the lock once.
+        """
+        entries = [(m, t, len(m.encode("utf-8", "replace"))) for m, t in entries]
+        with self.__lock:
+            for message, timestamp, size in entries:
+                self.__append(message, timestamp, size)
+
+    def after(self, seq: int, limit: int | None = None) -> list[LogEntry]:
+        """
+        Entries with a sequence number greater than `seq`, oldest first.
+        """
+        with self.__lock:
+            first_seq = self.__next_seq - self.__count
+            offset = max(seq + 1 - first_seq, 0)
+            return self.__slice(offset, limit)
+
+    def since(self, timestamp: float, limit: int | None = None) -> list[LogEntry]:
+        """
+        Entries with a timestamp greater than or equal to `timestamp`, oldest first.
+        """
+        with self.__lock:
+            offset = bisect_left(_TimestampView(self), timestamp, 0, self.__count)
+            return self.__slice(offset, limit)
+
+    @property
+    def last_seq(self) -> int:
+        return self.__next_seq - 1
+
+    @property
+    def size_bytes(self) -> int:
+        return self.__bytes
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def __getitem__(self, index: int) -> LogEntry:
+        if index < 0:
+            index += self.__count
+        if not 0 <= index < self.__count:
+            raise IndexError("log index out of range")
+        return self._entry(index)
+
+    def _entry(self, offset: int) -> LogEntry:
+        return self.__entries[(self.__start + offset) % self.__capacity]
+
+    def __slice(self, offset: int, limit: int | None) -> list[LogEntry]:
+        end = self.__count if limit is None else min(self.__count, offset + limit)
+        return [self._entry(i) for i in range(offset, end)]
+
+    def __append(self, message: str, timestamp: float, size: int) -> int:
+        if self.__count == self.__capacity:
+            self.__drop_oldest()
+        while self.__count and self.__bytes + size > self.__max_bytes:
+            self.__drop_oldest()
+        index = (self.__start + self.__count) % self.__capacity
+        seq = self.__next_seq
+        self.__entries[index] = LogEntry(timestamp, message, seq)
+        self.__sizes[index] = size
+        self.__count += 1
+        self.__bytes += size
+        self.__next_seq += 1
+        return seq
+
+    def __drop_oldest(self) -> None:
+        self.__entries[self.__start] = None
+        self.__bytes -= self.__sizes[self.__start]
+        self.__start = (self.__start + 1) % self.__capacity
+        self.__count -= 1
+
+
+class BatchingLogHandler(logging.Handler):
+    """
+    Logging handler that never blocks the logging thread on TinyProb.
+    Records are only enqueued on the hot path; a background thread formats them and inserts them
+    into the LogBuffer in batches. When the queue is full, records are dropped according to the
+    overflow policy and counted. Enqueued and dropped records are counted per thread (see
+    `ThreadCounters`), so that no lock is taken on the hot path.
+    NOTE: Formatting is deferred, so a record whose arguments are mutated right after logging may
+    show the mutated values.
+    """
+
+    DEFAULT_QUEUE_SIZE = 10000
+    DEFAULT_BATCH_SIZE = 500
+    DEFAULT_FLUSH_INTERVAL = 0.1  # seconds
+
+    # Indexes of the per-thread counters
+    __ENQUEUED = 0
+    __DROPPED = 1
+
+    class OverflowPolicy(Enum):
+        DropNewest = "drop_newest"
+        DropOldest = "drop_oldest"
+
+    def __init__(
+        self,
+        buffer: LogBuffer,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        overflow: OverflowPolicy = OverflowPolicy.DropNewest,
+    ) -> None:
+        super().__init__()
+        self.__buffer = buffer
+        self.__queue_size = queue_size
+        self.__batch_size = batch_size
+        self.__flush_interval = flush_interval
+        self.__overflow = BatchingLogHandler.OverflowPolicy(overflow)
+        self.__queue: deque[logging.LogRecord] = deque(maxlen=queue_size)
+        self.__flush_lock = Lock()
+        self.__wakeup = Event()
+        self.__closed = False
+        self.__counters = ThreadCounters(2)
+        self.written = 0  # Only updated under the flush lock
+        self.__thread = Thread(target=self.__run, name="tiny-prob-logs", daemon=True)
+        self.__thread.start()
+
+    def handle(self, record: logging.LogRecord) -> bool:
+        # Unlike logging.Handler.handle, do not take the handler lock; the deque is thread-safe.
+        rv = self.filter(record)
+        if rv:
+            self.emit(record)
+        return rv
+
+    def emit(self, record: logging.LogRecord) -> None:
+        queue = self.__queue
+        counters = self.__counters.cell()
+        if len(queue) >= self.__queue_size:
+            counters[self.__DROPPED] += 1
+            if self.__overflow is BatchingLogHandler.OverflowPolicy.DropNewest:
+                return
+        queue.append(record)  # Drops the oldest record when full
+        counters[self.__ENQUEUED] += 1
+        if len(queue) >= self.__batch_size:
+            self.__wakeup.set()
+
+    def flush(self) -> None:
+        """
+        Write all the queued records to the LogBuffer.
+        """
+        with self.__flush_lock:
+            while self.__queue:
+                self.__write_batch()
+
+    def close(self) -> None:
+        self.__closed = True
+        self.__wakeup.set()
+        self.__thread.join(timeout=1)
+        self.flush()
+        super().close()
+
+    @property
+    def enqueued(self) -> int:
+        return self.__counters.totals()[self.__ENQUEUED]
+
+    @property
+    def dropped(self) -> int:
+        return self.__counters.totals()[self.__DROPPED]
+
+    def stats(self) -> dict[str, int]:
+        enqueued, dropped = self.__counters.totals()
+        return {
+            "enqueued": enqueued,
+            "dropped": dropped,
+            "written": self.written,
+            "queued": len(self.__queue),
+        }
+
+    def __run(self) -> None:
+        while not self.__closed:
+            self.__wakeup.wait(self.__flush_interval)
+            self.__wakeup.clear()
+            self.flush()
+
+    def __write_batch(self) -> None:
+        batch = []
+        queue = self.__queue
+        while queue and len(batch) < self.__batch_size:
+            try:
+                record = queue.popleft()
+            except IndexError:
+                break
+            try:
+                batch.append((self.format(record), record.created))
+            except Exception:
+                self.handleError(record)
+        self.__buffer.extend(batch)
+        self.written += len(batch)
+
+
+class _TimestampView:
+    """
+    Sequence of the timestamps of a LogBuffer, for bisecting without copying.
+    """
+
+    def __init__(self, buffer: LogBuffer) -> None:
+        self.__buffer = buffer
+
+    def __getitem__(self, offset: int) -> float:
+        return self.__buffer._entry(offset).timestamp
@@ -0,0 +1,108 @@
+"""
+Counters of TinyProb's own overhead, exposed at `/metrics`.
+
+Pin reads and writes are counted on the pins, under their lock. Lock contention is counted per
+thread without locks and summed when read, like the timers of `tiny_prob.pins.timing` (see
+`tiny_prob.per_thread`). The exposition follows the Prometheus text format (version 0.0.4).
+"""
+from typing import Iterable, NamedTuple
+
+from tiny_prob.per_thread import PerThread
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Indexes of the per-thread counters
+PIN_LOCK_CONTENDED = 0
+COUNTER_NAMES = ("pin_lock_contended",)
+
+
+class ThreadCounters:
+    """
+    Counters incremented by every thread in its own cell, and summed on read. Increments are
+    plain list updates: `COUNTERS.cell()[PIN_LOCK_CONTENDED] += 1`.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.__cells = PerThread(lambda: [0] * size, _add_cell)
+
+    def cell(self) -> list[int]:
+        return self.__cells.get()
+
+    def totals(self) -> list[int]:
+        return self.__cells.read(lambda cells: [sum(column) for column in zip(*cells)])
+
+    def __len__(self) -> int:
+        """
+        The number of threads with live cells.
+        """
+        return len(self.__cells)
+
+
+def _add_cell(total: list[int], cell: list[int]) -> None:
+    for index, value in enumerate(cell):
+        total[index] += value
+
+
+COUNTERS = ThreadCounters(len(COUNTER_NAMES))
+
+
+class Sample(NamedTuple):
+    name: str
+    labels: dict[str, str]
+    value: float
+
+
+class MetricFamily(NamedTuple):
+    name: str
+    type: str  # "counter", "gauge" or "summary"
+    help: str
+    samples: list[Sample]
+
+
+def family(
+    name: str, type: str, help: str, value: float | None = None, labels: dict | None = None
+) -> MetricFamily:
+    """
+    A metric family, with a single sample if `value` is given.
+    """
+    samples = [] if value is None else [Sample(name, labels or {}, value)]
+    return MetricFamily(name, type, help, samples)
+
+
+def render_prometheus(families: Iterable[MetricFamily]) -> str:
+    lines = []
+    for metric in families:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.type}")
+        for sample in metric.samples:
+            lines.append(f"{sample.name}{_labels(sample.labels)} {_number(sample.value)}")
+    return "\n".join(lines) + "\n"
+
+
+def to_flat_dict(families: Iterable[MetricFamily]) -> dict[str, float]:
+    """
+    The samples as {"name{labels}": value}, e.g. for the web UI.
+    """
+    return {
+        f"{sample.name}{_labels(sample.labels)}": sample.value
+        for metric in families
+        for sample in metric.samples
+    }
+
+
+def _labels(labels: dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    if isinstance(value, float) and value != value:
+        return "NaN"
+    if value in (float("inf"), float("-inf")):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value) if isinstance(value, float) else str(value)
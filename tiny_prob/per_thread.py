@@ -0,0 +1,88 @@
+"""
+Per-thread accumulators for the hot-path instrumentation (timers, overhead counters).
+
+Every thread updates its own state without locks; readers merge the states. When a thread exits,
+its state is merged into a shared base, so that short-lived threads (e.g. one per request with
+the `threaded` server backend) do not leave their state behind.
+"""
+import weakref
+from threading import Lock, local
+from typing import Callable, Generic, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class _Owner:
+    """
+    Only referenced by the thread-local storage of its thread: it is freed when the thread exits,
+    which retires the state of the thread.
+    """
+
+    __slots__ = ("__weakref__",)
+
+
+class PerThread(Generic[T]):
+    """
+    A state per thread, created by `factory` on first use in the thread, and merged into the
+    base state with `merge(base, state)` when the thread exits.
+    """
+
+    def __init__(self, factory: Callable[[], T], merge: Callable[[T, T], None]) -> None:
+        self.__factory = factory
+        self.__local = local()
+        self.__shared = _Shared(factory(), merge)
+
+    def get(self) -> T:
+        """
+        The state of the calling thread.
+        """
+        try:
+            return self.__local.state
+        except AttributeError:
+            return self.__register()
+
+    def read(self, reduce: Callable[[list[T]], R]) -> R:
+        """
+        Apply `reduce` to the base and the states of the live threads. No thread is retired while
+        `reduce` runs, so no state is missed or counted twice.
+        """
+        return self.__shared.read(reduce)
+
+    def __len__(self) -> int:
+        """
+        The number of live states.
+        """
+        return len(self.__shared.states)
+
+    def __register(self) -> T:
+        state = self.__factory()
+        owner = _Owner()
+        self.__shared.add(id(owner), state)
+        # The finalizer must not reference this object, or it would keep it alive with its threads.
+        weakref.finalize(owner, self.__shared.retire, id(owner))
+        self.__local.state = state
+        self.__local.owner = owner
+        return state
+
+
+class _Shared(Generic[T]):
+    def __init__(self, base: T, merge: Callable[[T, T], None]) -> None:
+        self.base = base
+        self.states: dict[int, T] = {}
+        self.__merge = merge
+        self.__lock = Lock()
+
+    def add(self, key: int, state: T) -> None:
+        with self.__lock:
+            self.states[key] = state
+
+    def retire(self, key: int) -> None:
+        with self.__lock:
+            state = self.states.pop(key, None)
+            if state is not None:
+                self.__merge(self.base, state)
+
+    def read(self, reduce: Callable[[list[T]], R]) -> R:
+        with self.__lock:
+            return reduce([self.base, *self.states.values()])
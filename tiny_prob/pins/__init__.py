@@ -1,10 +1,38 @@
 from abc import ABC
 from enum import Enum
-import json
+from urllib.parse import quote
 from dataclasses import dataclass, field, KW_ONLY
-from time import sleep, time
-from typing import Any, Callable
-from threading import Lock
+from itertools import count
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, Iterable
+from threading import Condition, Lock
+
+from tiny_prob.metrics import COUNTERS, PIN_LOCK_CONTENDED
+from tiny_prob.pins.executors import (
+    AsyncioCallbackExecutor,
+    CallbackExecutor,
+    EventMetrics,
+    ThreadPoolCallbackExecutor,
+    compile_callback,
+    run_callback,
+)
+from tiny_prob.pins.arrays import (
+    DEFAULT_BINS,
+    DEFAULT_MAX_POINTS,
+    array_info,
+    array_stats,
+    downsample,
+    is_array,
+    slice_array,
+    to_list,
+)
+from tiny_prob.pins.history import PinHistory
+from tiny_prob.pins.image import EncodedFrame, FrameCache, is_ndarray
+from tiny_prob.pins.policies import WritePolicy
+from tiny_prob.pins.timing import Span, Timer
+
+if TYPE_CHECKING:
+    import asyncio
 
 
 # type of pins:
@@ -15,10 +43,39 @@ from threading import Lock
 # - enum
 # ~~~~~ Hard Ones ~~~~~
 # - np_image
+# - array (NumPy ndarray / array.array)
 # - drawing canvas (one way from python to web)
 # - event (one way from web to python)
 
 
+__VERSION_COUNTER = count(1)
+__VERSION_LOCK = Lock()
+
+
+def next_version() -> int:
+    """
+    Get the next value of the global, monotonically increasing pin version.
+    Versions are handed out under the lock `stamp_version` holds while it stores them on the pins,
+    so every version lower than the returned one is already visible on its pin: the returned
+    version is a safe cursor for `/pins_since`.
+    """
+    with __VERSION_LOCK:
+        return next(__VERSION_COUNTER)
+
+
+def stamp_version(pins: "Iterable[PinBase]", created: bool = False) -> int:
+    """
+    Give the pins (and, with `created`, their creation version) the next version, and return it.
+    """
+    with __VERSION_LOCK:
+        version = next(__VERSION_COUNTER)
+        for pin in pins:
+            pin._version = version
+            if created:
+                pin._created_version = version
+    return version
+
+
 @dataclass
 class PinBase(ABC):
     name: str
@@ -31,82 +88,231 @@ class PinBase(ABC):
     type: str
     _readable: bool = True
     _writable: bool = True
+    _fast_read: bool = False
     _thread_lock: Lock = field(default_factory=Lock)
+    _observers: list[Callable[["PinBase"], None]] = field(default_factory=list)
+    _version: int = field(default=0, init=False)
+    _created_version: int = field(default=0, init=False)
+    _history: PinHistory | None = field(default=None, init=False, repr=False)
+    # Reads / writes under the pin lock, for `/metrics`
+    _reads: int = field(default=0, init=False, repr=False, compare=False)
+    _writes: int = field(default=0, init=False, repr=False, compare=False)
+    _supports_history: ClassVar[bool] = False
+    _remote: ClassVar[bool] = False  # Mirror of a pin of another process (see `RemotePin`)
+    _write: Callable[[Any], None] = field(init=False, repr=False, compare=False)
+
+    TOPIC_TEMPLATE: ClassVar[str] = '<span class="title">{name}</span>'
+    VALUE_TEMPLATE: ClassVar[str] = '<span class="value" id="value">{value}</span>'
+    EDITABLE_TEMPLATE: ClassVar[str] = (
+        '<input class="edit-input" id="edit-input" type="text" value="{value}">'
+    )
 
-    def compile_html(self) -> str:
-        value_html = self.html
-        if value_html is None:
-            value_html = f'<span class="value" id="value">{self.value}</span>'
-
-        topic_html = self.topic_html
-        if topic_html is None:
-            topic_html = f'<span class="title">{self.name}</span>'
+    def __post_init__(self):
+        if self._fast_read:
+            self.value = self.coerce(self.value)
+        stamp_version((self,), created=True)
+        self._write = self.write_value
+
+    @property
+    def address(self) -> str:
+        """
+        Unique name of the pin in the system (and on the web): `namespace/name`, or just `name`
+        for pins without a namespace.
+        """
+        return f"{self.namespace}/{self.name}" if self.namespace else self.name
+
+    @classmethod
+    def type_template(cls) -> dict[str, str]:
+        """
+        The HTML of every pin of this class, with "{name}" and "{value}" placeholders that the web
+        client fills in (see `/pin_types`).
+        """
+        return {
+            "topic": cls.TOPIC_TEMPLATE,
+            "value": cls.VALUE_TEMPLATE,
+            "editable_html": cls.EDITABLE_TEMPLATE,
+        }
 
-        editable_html = self.editable_html
-        if editable_html is None:
-            editable_html = f'<input class="edit-input" id="edit-input" type="text" value="{self.value}">'
+    def has_custom_html(self) -> bool:
+        return (self.html, self.topic_html, self.editable_html) != (None, None, None)
 
-        res = {"topic": topic_html, "value": value_html}
+    def compile_html(self) -> dict[str, str]:
+        """
+        The type template with the HTML overrides of this pin, if any.
+        """
+        res = {
+            "topic": self.topic_html or self.TOPIC_TEMPLATE,
+            "value": self.html or self.VALUE_TEMPLATE,
+        }
         if self._writable:
-            res["editable_html"] = editable_html
+            res["editable_html"] = self.editable_html or self.EDITABLE_TEMPLATE
         return res
 
-    def to_dict(self) -> str:
-        return {
-            "name": self.name,
-            "value": self.value,
+    def to_dict(self, with_template: bool = True) -> str:
+        """
+        The web payload of the pin. The HTML comes from the template of its type (`/pin_types`);
+        with `with_template`, pins with their own HTML also send it, as "html_template".
+        """
+        res = {
+            "name": self.address,
+            "value": self.to_web(self.value),
             "type": self.type,
-            "html_template": self.compile_html(),
+            "version": self._version,
+            "created": self._created_version,
             "readable": self._readable,
             "writable": self._writable,
         }
+        if self._history is not None:
+            res["history"] = self._history.capacity
+        if with_template and self.has_custom_html():
+            res["html_template"] = self.compile_html()
+        return res
+
+    def coerce(self, value: Any) -> Any:
+        """
+        Convert a raw value (e.g. a string coming from the web UI) to the type of the pin.
+        """
+        return value
+
+    def to_web(self, value: Any) -> Any:
+        """
+        Convert a value of the pin to what is sent to the web clients.
+        """
+        return value
 
     def write_value(self, value: Any) -> None:
-        with self._thread_lock:
+        if self._fast_read:
+            # Coerce once on write, so that the hot-path read is a plain attribute fetch.
+            value = self.coerce(value)
+        lock = self._thread_lock
+        if not lock.acquire(blocking=False):
+            COUNTERS.cell()[PIN_LOCK_CONTENDED] += 1
+            lock.acquire()
+        try:
             self.value = value
+            stamp_version((self,))
+            self._writes += 1
+        finally:
+            lock.release()
+        if self._history is not None:
+            self._history.append(value if self._fast_read else self.coerce(value))
+        for observer in self._observers:
+            observer(self)
+
+    def commit_value(self) -> None:
+        """
+        Commit the value the pin holds (version, history, observers) without storing one: the
+        trailing commits of the write policies run on another thread, so storing the value they
+        read could overwrite a newer assignment.
+        """
+        lock = self._thread_lock
+        if not lock.acquire(blocking=False):
+            COUNTERS.cell()[PIN_LOCK_CONTENDED] += 1
+            lock.acquire()
+        try:
+            value = self.value
+            stamp_version((self,))
+            self._writes += 1
+        finally:
+            lock.release()
+        if self._history is not None:
+            self._history.append(self.coerce(value))  # Skipped assignments are not coerced
+        for observer in self._observers:
+            observer(self)
 
     def read_value(self) -> Any:
-        with self._thread_lock:
+        """
+        Read the value under the pin lock. Reads are counted on the pin, under its lock, and only
+        contended reads pay for the thread counters (see `tiny_prob.metrics`); fast-read pins
+        are read without lock and not counted.
+        """
+        if self._fast_read:
+            return self.value
+        lock = self._thread_lock
+        if not lock.acquire(blocking=False):
+            COUNTERS.cell()[PIN_LOCK_CONTENDED] += 1
+            lock.acquire()
+        try:
+            self._reads += 1
             return self.value
+        finally:
+            lock.release()
+
+    def peek_value(self) -> Any:
+        """
+        Same as `read_value`, but without taking the lock (e.g. for copy-on-write snapshots).
+        """
+        return self.value if self._fast_read else self.coerce(self.value)
+
+    def set_write_policy(self, policy: "str | WritePolicy | None") -> None:
+        """
+        Set how often the assignments made through `_write` (i.e. captured attributes) are
+        committed. See `WritePolicy`.
+        """
+        self._write = WritePolicy.parse(policy).compile(self)
+
+    def enable_history(self, capacity: int = PinHistory.DEFAULT_CAPACITY) -> PinHistory:
+        """
+        Start recording the values written to the pin, keeping the last `capacity` samples.
+        Only numeric and boolean pins keep a history.
+        """
+        if not self._supports_history:
+            raise TypeError(f"Pin '{self.name}' of type {self.type} can not keep a history.")
+        if self._history is None or self._history.capacity != capacity:
+            history = PinHistory(capacity)
+            history.append(self.peek_value())
+            self._history = history
+        return self._history
 
 
 @dataclass
 class NumericPin(PinBase):
     type: str = "numeric"
+    _supports_history: ClassVar[bool] = True
     value: int | float | None = None
-    editable_html: str = "<input class='edit-input' id='edit-input' type='number' value='{self.value}'>"
 
-    def compile_html(self) -> str:
-        res = super().compile_html()
-        res["value"] = res["value"].replace('type="text"', 'type="number"')
-        return res
+    EDITABLE_TEMPLATE: ClassVar[str] = (
+        "<input class='edit-input' id='edit-input' type='number' value='{value}'>"
+    )
     
-    def read_value(self) -> Any:
-        value = super().read_value()
+    def coerce(self, value: Any) -> Any:
+        if isinstance(value, (int, float)):
+            return value
         try:
-            value = int(value)
-        except ValueError:
+            return int(value)
+        except (TypeError, ValueError):
             try:
-                value = float(value)
-            except ValueError:
-                pass
-        return value
+                return float(value)
+            except (TypeError, ValueError):
+                return value
+
+    def read_value(self) -> Any:
+        value = super().read_value()
+        if self._fast_read:
+            return value
+        return self.coerce(value)
 
 
 @dataclass
 class BooleanPin(PinBase):
     type: str = "boolean"
+    _supports_history: ClassVar[bool] = True
     value: bool | None = None
-    editable_html: str = "<input class='edit-input' id='edit-input' type='checkbox' value='{self.value}'>"
 
-    def compile_html(self) -> str:
-        res = super().compile_html()
-        res["value"] = res["value"].replace('type="text"', 'type="checkbox"')
-        return res
+    EDITABLE_TEMPLATE: ClassVar[str] = (
+        "<input class='edit-input' id='edit-input' type='checkbox' value='{value}'>"
+    )
     
+    def coerce(self, value: Any) -> Any:
+        if isinstance(value, str):
+            return value.strip().lower() in ("true", "1", "on", "yes")
+        return bool(value)
+
     def read_value(self) -> Any:
         value = super().read_value()
-        return bool(value)
+        if self._fast_read:
+            return value
+        return self.coerce(value)
 
 
 @dataclass
@@ -123,11 +329,6 @@ class ListPin(PinBase):
     value: list[str] | None = None
     html: str | None = None
 
-    def compile_html(self) -> str:
-        res = super().compile_html()
-        res["value"] = res["value"].replace('type="text"', 'type="list"')
-        return res
-
 
 @dataclass
 class EnumPin(PinBase):
@@ -135,64 +336,229 @@ class EnumPin(PinBase):
     value: str | None = None
     html: str | None = None
 
-    def compile_html(self) -> str:
-        res = super().compile_html()
-        res["value"] = res["value"].replace('type="text"', 'type="enum"')
-        return res
-
 
 @dataclass
 class ImagePin(PinBase):
+    """
+    NumPy image (HxW gray, HxWx3 RGB or HxWx4 RGBA).
+    Frames are kept by reference, so assigning one costs no copy; a producer that reuses its
+    buffers should assign a new array per frame. Frames are only encoded when a client requests
+    them (see `/pin_image`), and at most once per version and encoding.
+    Image pins can not be written from the web.
+    """
+
+    THUMBNAIL_SIZE: ClassVar[int] = 320
+    VALUE_TEMPLATE: ClassVar[str] = '<img class="value" id="value" alt="{name}" src="">'
+
     type: str = "image"
-    value: str | None = None
+    value: Any = None
     html: str | None = None
     _writable: bool = False
+    _frames: FrameCache = field(default_factory=FrameCache, init=False, repr=False, compare=False)
 
     def write_value(self, value: Any) -> None:
-        raise NotImplementedError("Image pins can not be written.")
+        if value is not None and not is_ndarray(value):
+            raise TypeError(f"Image pin '{self.name}' only takes NumPy arrays.")
+        super().write_value(value)
 
-    def compile_html(self) -> str:
-        res = super().compile_html()
-        res["value"] = res["value"].replace('type="text"', 'type="image"')
-        return res
+    def to_web(self, value: Any) -> Any:
+        if value is None:
+            return None
+        return {
+            "shape": list(value.shape),
+            "dtype": str(value.dtype),
+            "url": (
+                f"/pin_image?name={quote(self.address)}&max_size={self.THUMBNAIL_SIZE}"
+                f"&v={self._version}"
+            ),
+        }
+
+    def frame(
+        self, format: str = "png", max_size: int | None = None, quality: int = 80
+    ) -> EncodedFrame:
+        """
+        Get the current frame encoded as PNG or JPEG, downscaled so that its largest side is at
+        most `max_size` pixels. Encoded frames are cached until the next write.
+        """
+        with self._thread_lock:
+            image, version = self.value, self._version
+        if image is None:
+            raise ValueError(f"Image pin '{self.name}' has no frame.")
+        return self._frames.get(image, version, format=format, max_size=max_size, quality=quality)
+
+
+@dataclass
+class ArrayPin(PinBase):
+    """
+    Numeric array (NumPy ndarray or `array.array`), e.g. a sample buffer.
+    Arrays are kept by reference, like image frames. The web payload only describes the array
+    (shape, dtype, size); elements are read by slices (`/pin_value` with "slice"), and the
+    statistics and the downsampled plot are computed on request (see `/pin_array`), so that large
+    buffers are never sent whole. After changing an array in place, write it again so that the
+    clients see a new version. Array pins can not be written from the web.
+    """
+
+    MAX_ELEMENTS: ClassVar[int] = 100_000  # Largest slice `read_slice` returns, and plot size
+    MAX_BINS: ClassVar[int] = 1000
+    PLOT_POINTS: ClassVar[int] = 200
+    VALUE_TEMPLATE: ClassVar[str] = '<div class="value array" id="value"></div>'
+
+    type: str = "array"
+    value: Any = None
+    _writable: bool = False
+
+    def write_value(self, value: Any) -> None:
+        if value is not None and not is_array(value):
+            raise TypeError(
+                f"Array pin '{self.name}' only takes NumPy arrays and array.array."
+            )
+        super().write_value(value)
+
+    def to_web(self, value: Any) -> Any:
+        if value is None:
+            return None
+        return {
+            **array_info(value),
+            "url": (
+                f"/pin_array?name={quote(self.address)}&max_points={self.PLOT_POINTS}"
+                f"&v={self._version}"
+            ),
+        }
+
+    def read_slice(self, expression: str) -> Any:
+        """
+        The elements selected by a slice expression (e.g. "0:100", "::10" or "0:10,3"), as lists.
+        Slices of more than `MAX_ELEMENTS` elements are refused.
+        """
+        view = slice_array(self.__array(), expression)
+        size = getattr(view, "size", None)
+        if size is None:
+            size = len(view) if isinstance(view, memoryview) else 1
+        if size > self.MAX_ELEMENTS:
+            raise ValueError(
+                f"Slice '{expression}' of pin '{self.name}' has {size} elements, more than "
+                f"{self.MAX_ELEMENTS}."
+            )
+        return to_list(view)
+
+    def summary(
+        self,
+        expression: str | None = None,
+        bins: int = DEFAULT_BINS,
+        max_points: int = DEFAULT_MAX_POINTS,
+    ) -> dict[str, Any]:
+        """
+        The statistics (see `array_stats`) and the downsampled plot (see `downsample`) of the
+        array, or of a slice of it.
+        """
+        view = slice_array(self.__array(), expression)
+        return {
+            "stats": array_stats(view, bins=bins),
+            "plot": downsample(view, max_points=max_points),
+        }
+
+    def __array(self) -> Any:
+        value = self.read_value()
+        if value is None:
+            raise ValueError(f"Array pin '{self.name}' has no array.")
+        return value
+
+
+@dataclass
+class TimerPin(PinBase):
+    """
+    Timing of a code section (see `TinyProb.span` and `@timed`): call count, total / mean / max
+    time, percentiles and latency histogram. Recording only touches a per-thread accumulator;
+    the value of the pin is the merged summary, updated by `refresh` (the server refreshes the
+    timers when the pins are fetched). Timer pins can not be written from the web.
+    """
+
+    type: str = "timer"
+    value: dict[str, Any] | None = None
+    _writable: bool = False
+    timer: Timer = field(default_factory=Timer, repr=False, compare=False)
+    _refreshed_count: int = field(default=-1, init=False, repr=False, compare=False)
+
+    VALUE_TEMPLATE: ClassVar[str] = '<div class="value timer" id="value"></div>'
+
+    def span(self) -> Span:
+        return Span(self.timer)
+
+    def record(self, elapsed_ns: int) -> None:
+        self.timer.record(elapsed_ns)
+
+    def refresh(self) -> None:
+        """
+        Merge the accumulators into the value of the pin, if anything was recorded since the
+        last refresh.
+        """
+        count = self.timer.count
+        if count != self._refreshed_count:
+            self._refreshed_count = count
+            self.write_value(self.timer.summary())
 
 
 @dataclass
 class EventPin(PinBase):
     type: str = "event"
     callbacks: list[Callable] = field(default_factory=list)
-    html: str = "<Button class='value' id='value' type='button' onClick='triggerEvent({pin_name}, \"true\")' >Trigger</Button>"
+    html: str | None = None
+    metrics: EventMetrics = field(default_factory=EventMetrics)
     _readable: bool = False
     _writable: bool = False
+    _executor: CallbackExecutor | None = None
+    _dispatch: list[Callable[[Any], Any]] = field(default_factory=list, init=False)
 
-    def compile_html(self) -> str:
-        res = super().compile_html()
-        res["value"] = res["value"].replace("{pin_name}", f'"{self.name}"')
-        return res
-
+    VALUE_TEMPLATE: ClassVar[str] = (
+        "<Button class='value' id='value' type='button' "
+        "onClick='triggerEvent(\"{name}\", \"true\")' >Trigger</Button>"
+    )
 
     def __post_init__(self):
         assert self.value is None, "Event pins can not have a values."
+        super().__post_init__()
+        self._dispatch = [compile_callback(callback) for callback in self.callbacks]
+
+    def to_dict(self, with_template: bool = True) -> str:
+        res = super().to_dict(with_template=with_template)
+        res["metrics"] = self.metrics.to_dict()
+        return res
 
     def add_callback(self, callback: Callable) -> None:
         self.callbacks.append(callback)
+        self._dispatch.append(compile_callback(callback))
 
     def __iadd__(self, callback: Callable) -> "EventPin":
         self.add_callback(callback)
         return self
 
+    def set_executor(self, executor: CallbackExecutor | None) -> None:
+        """
+        Run the callbacks on an executor (see `ThreadPoolCallbackExecutor` and
+        `AsyncioCallbackExecutor`) instead of inline on the triggering thread.
+        """
+        self._executor = executor
+
     def write_value(self, value: Any) -> None:
-        for callback in self.callbacks:
-            if callback.__func__.__code__.co_argcount > 0:
-                callback(value)
+        self.metrics.triggered()
+        executor = self._executor
+        for callback in self._dispatch:
+            if executor is None:
+                run_callback(callback, value, self.metrics)
             else:
-                callback()
+                executor.submit(callback, value, self.metrics)
 
     def read_value(self) -> Any:
         raise NotImplementedError("Event pins can not be read.")
 
 
 class EventProb:
+    """
+    Block (or await) until an event pin is triggered.
+    `set` and `reset` wake the waiters immediately. Only `wait_condition` (whose condition may
+    depend on anything) also re-checks its condition every `wait_duty_cycle` seconds.
+    """
+
     DEFAULT_WAIT_DUTY_CYCLE = 0.1
 
     class WaitCondition(Enum):
@@ -209,32 +575,88 @@ class EventProb:
         self.__pin = pin
         self.__lock = initial_state
         self.__lock_value: Any = None
+        self.__condition = Condition()
+        self.__async_waiters: list[tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
         self.__pin += self.set
         self.__wait_duty_cycle = wait_duty_cycle
 
     def set(self, value: Any) -> None:
-        self.__lock = True
-        self.__lock_value = value
+        with self.__condition:
+            self.__lock = True
+            self.__lock_value = value
+            self.__notify()
 
     def reset(self) -> None:
-        self.__lock = False
+        with self.__condition:
+            self.__lock = False
+            self.__notify()
+
+    def __notify(self) -> None:
+        # Must be called with the condition held.
+        self.__condition.notify_all()
+        for loop, event in self.__async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The loop of the waiter is closed.
+        self.__async_waiters.clear()
 
     def __wait(
         self,
         condition: Callable[[], bool],
         timeout: float | None = None,
+        poll: bool = False,
     ) -> None:
-        start_time = time()
-        while not condition():
-            if timeout is not None and time() - start_time > timeout:
-                raise TimeoutError("Timeout while waiting for condition.")
-            sleep(self.__wait_duty_cycle)
-
-    def wait(
+        deadline = None if timeout is None else monotonic() + timeout
+        with self.__condition:
+            while not condition():
+                remaining = None if deadline is None else deadline - monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("Timeout while waiting for condition.")
+                if poll:
+                    remaining = (
+                        self.__wait_duty_cycle
+                        if remaining is None
+                        else min(remaining, self.__wait_duty_cycle)
+                    )
+                self.__condition.wait(remaining)
+
+    async def __async_wait(
         self,
-        condition: WaitCondition = WaitCondition.Lock,
+        condition: Callable[[], bool],
         timeout: float | None = None,
+        poll: bool = False,
     ) -> None:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+
+        async def wait_for_condition() -> None:
+            while True:
+                event = asyncio.Event()
+                with self.__condition:
+                    if condition():
+                        return
+                    self.__async_waiters.append((loop, event))
+                try:
+                    if poll:
+                        try:
+                            await asyncio.wait_for(event.wait(), self.__wait_duty_cycle)
+                        except asyncio.TimeoutError:
+                            pass
+                    else:
+                        await event.wait()
+                finally:
+                    with self.__condition:
+                        if (loop, event) in self.__async_waiters:
+                            self.__async_waiters.remove((loop, event))
+
+        try:
+            await asyncio.wait_for(wait_for_condition(), timeout)
+        except asyncio.TimeoutError:
+            raise TimeoutError("Timeout while waiting for condition.")
+
+    def __check_state(self, condition: WaitCondition) -> Callable[[], bool]:
         def __check_condition() -> bool:
             match condition:
                 case EventProb.WaitCondition.Lock:
@@ -246,7 +668,14 @@ class EventProb:
                 case _:
                     raise NotImplementedError(f"Condition {condition} not supported.")
 
-        self.__wait(__check_condition, timeout=timeout)
+        return __check_condition
+
+    def wait(
+        self,
+        condition: WaitCondition = WaitCondition.Lock,
+        timeout: float | None = None,
+    ) -> None:
+        self.__wait(self.__check_state(condition), timeout=timeout)
 
     def wait_once(
         self,
@@ -257,21 +686,41 @@ class EventProb:
         self.reset()
 
     def wait_value(self, value: Any, timeout: float | None = None) -> None:
-        def __check_condition() -> bool:
-            return self.__lock_value == value
-
-        self.__wait(__check_condition, timeout=timeout)
+        self.__wait(lambda: self.__lock_value == value, timeout=timeout)
 
     def wait_not_value(self, value: Any, timeout: float | None = None) -> None:
-        def __check_condition() -> bool:
-            return self.__lock_value != value
-
-        self.__wait(__check_condition, timeout=timeout)
+        self.__wait(lambda: self.__lock_value != value, timeout=timeout)
 
     def wait_condition(
         self, condition: Callable[[], bool], timeout: float | None = None
     ) -> None:
-        self.__wait(condition, timeout=timeout)
+        self.__wait(condition, timeout=timeout, poll=True)
+
+    async def async_wait(
+        self,
+        condition: WaitCondition = WaitCondition.Lock,
+        timeout: float | None = None,
+    ) -> None:
+        await self.__async_wait(self.__check_state(condition), timeout=timeout)
+
+    async def async_wait_once(
+        self,
+        condition: WaitCondition = WaitCondition.Lock,
+        timeout: float | None = None,
+    ) -> None:
+        await self.async_wait(condition=condition, timeout=timeout)
+        self.reset()
+
+    async def async_wait_value(self, value: Any, timeout: float | None = None) -> None:
+        await self.__async_wait(lambda: self.__lock_value == value, timeout=timeout)
+
+    async def async_wait_not_value(self, value: Any, timeout: float | None = None) -> None:
+        await self.__async_wait(lambda: self.__lock_value != value, timeout=timeout)
+
+    async def async_wait_condition(
+        self, condition: Callable[[], bool], timeout: float | None = None
+    ) -> None:
+        await self.__async_wait(condition, timeout=timeout, poll=True)
 
     def is_locked(self) -> bool:
         return self.__lock
@@ -280,13 +729,37 @@ class EventProb:
         return self.__lock_value
 
 
-def Pin4Type(name: str, namespace: str, variable: Any) -> PinBase:
+PIN_CLASSES = (
+    NumericPin, BooleanPin, StringPin, ListPin, EnumPin, ImagePin, ArrayPin, TimerPin, EventPin
+)
+
+
+def pin_types() -> dict[str, dict[str, str]]:
+    """
+    The HTML template of every pin type, by type.
+    """
+    return {pin_class.type: pin_class.type_template() for pin_class in PIN_CLASSES}
+
+
+def Pin4Type(name: str, namespace: str, variable: Any, fast_read: bool = False) -> PinBase:
+    """
+    Create the pin matching the type of the variable. NumPy arrays of 2 or 3 dimensions are
+    images; other NumPy arrays and `array.array` are array pins.
+
+    Args:
+        fast_read (bool): If set, the value is coerced once on write and reads are a plain
+            attribute fetch, without taking the pin lock.
+    """
     if isinstance(variable, (int, float)):
-        return NumericPin(name, namespace, variable)
+        return NumericPin(name, namespace, variable, _fast_read=fast_read)
     if isinstance(variable, bool):
-        return BooleanPin(name, namespace, variable)
+        return BooleanPin(name, namespace, variable, _fast_read=fast_read)
     if isinstance(variable, str):
-        return StringPin(name, namespace, variable)
+        return StringPin(name, namespace, variable, _fast_read=fast_read)
     if isinstance(variable, list):
-        return ListPin(name, namespace, variable)
+        return ListPin(name, namespace, variable, _fast_read=fast_read)
+    if is_ndarray(variable) and variable.ndim in (2, 3):
+        return ImagePin(name, namespace, variable, _fast_read=fast_read)
+    if is_array(variable):
+        return ArrayPin(name, namespace, variable, _fast_read=fast_read)
     raise NotImplementedError(f"Type {type(variable)} not supported.")
@@ -0,0 +1,227 @@
+"""
+Server-side views of numeric arrays (NumPy ndarrays and `array.array`): slicing, summary
+statistics and downsampling, computed on request so that large buffers never have to be sent to
+the web clients.
+Arrays are read in place: slices are views, and `array.array` buffers are wrapped without a copy.
+NumPy is only imported when an array is reduced; without it, `array.array` values fall back to
+pure Python.
+"""
+from array import array
+from math import isfinite, sqrt
+from typing import Any
+
+from tiny_prob.pins.image import is_ndarray
+
+DEFAULT_BINS = 20
+DEFAULT_MAX_POINTS = 500
+NUMERIC_KINDS = "biuf"  # NumPy dtype kinds that can be reduced
+
+
+def is_array(value: Any) -> bool:
+    """
+    Check whether the value is a NumPy array or an `array.array`, without importing NumPy.
+    """
+    return is_ndarray(value) or isinstance(value, array)
+
+
+def array_info(value: Any) -> dict[str, Any]:
+    """
+    The shape, dtype and size of an array.
+    """
+    if isinstance(value, array):
+        return {"shape": [len(value)], "dtype": value.typecode, "size": len(value)}
+    return {"shape": list(value.shape), "dtype": str(value.dtype), "size": int(value.size)}
+
+
+def parse_slice(expression: str) -> tuple[slice | int, ...]:
+    """
+    Parse a NumPy-like slice expression, one item per dimension: "10:20", "::4", "-100:",
+    "0:10,3".
+    """
+    items = []
+    for part in expression.split(","):
+        bounds = part.split(":")
+        try:
+            if len(bounds) == 1:
+                items.append(int(bounds[0]))
+            elif len(bounds) <= 3:
+                items.append(slice(*(int(bound) if bound.strip() else None for bound in bounds)))
+            else:
+                raise ValueError
+        except ValueError:
+            raise ValueError(f"Invalid slice '{expression}', expected e.g. '10:20' or '0:10,3'.")
+    return tuple(items)
+
+
+def slice_array(value: Any, expression: str | None) -> Any:
+    """
+    A view of the array selected by a slice expression (see `parse_slice`). Indices out of the
+    array raise IndexError, like NumPy.
+    """
+    if not expression:
+        return value
+    items = parse_slice(expression)
+    if isinstance(value, array):
+        if len(items) != 1:
+            raise ValueError(f"Slice '{expression}' has too many dimensions for a 1-D array.")
+        index = items[0]
+        if isinstance(index, int):  # Keep a view rather than a Python scalar
+            if not -len(value) <= index < len(value):
+                raise IndexError(
+                    f"index {index} is out of bounds for axis 0 with size {len(value)}"
+                )
+            index = slice(index, index + 1 or None)
+        return memoryview(value)[index]
+    if len(items) > value.ndim:
+        raise ValueError(
+            f"Slice '{expression}' has too many dimensions for a {value.ndim}-D array."
+        )
+    return value[items]
+
+
+def to_list(value: Any) -> Any:
+    """
+    The elements of an array (or of a view of one) as nested lists, or a scalar.
+    """
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return value
+
+
+def array_stats(value: Any, bins: int = DEFAULT_BINS) -> dict[str, Any]:
+    """
+    Summary statistics of all the elements of an array:
+    {"count", "nonfinite", "min", "max", "mean", "std", "histogram": {"edges", "counts"}}
+    NaNs and infinities are only counted (in "nonfinite"); the statistics are over the finite
+    elements, and are None if there are none.
+    """
+    assert bins > 0, "bins must be positive"
+    numpy_value = _as_numpy(value)
+    if numpy_value is None:
+        return _python_stats(_python_values(value), bins)
+    import numpy as np
+
+    flat = numpy_value.ravel()
+    if flat.dtype.kind == "f":
+        finite = flat[np.isfinite(flat)]
+    else:
+        finite = flat
+    res: dict[str, Any] = {"count": int(flat.size), "nonfinite": int(flat.size - finite.size)}
+    if not finite.size:
+        return {**res, **_empty_stats()}
+    counts, edges = np.histogram(finite, bins=bins)
+    return {
+        **res,
+        "min": finite.min().item(),
+        "max": finite.max().item(),
+        "mean": float(finite.mean(dtype=np.float64)),
+        "std": float(finite.std(dtype=np.float64)),
+        "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+    }
+
+
+def downsample(value: Any, max_points: int = DEFAULT_MAX_POINTS) -> dict[str, Any]:
+    """
+    The elements of an array (flattened), decimated for plotting like `PinHistory.query`:
+    {"index": [...], "value": [...], "decimated": false}
+    With more than `max_points` elements, they are split in `max_points` buckets of consecutive
+    elements; "index" is then the first index of every bucket, "value" its mean, and "min"/"max"
+    its extremes, so that spikes stay visible. NaNs and infinities are sent as None.
+    """
+    assert max_points > 0, "max_points must be positive"
+    numpy_value = _as_numpy(value)
+    if numpy_value is None:
+        return _python_downsample(_python_values(value), max_points)
+    import numpy as np
+
+    flat = numpy_value.ravel()
+    count = flat.size
+    if count <= max_points:
+        return {"index": list(range(count)), "value": _finite(flat.tolist()), "decimated": False}
+    starts = np.arange(max_points) * count // max_points
+    sizes = np.diff(np.append(starts, count))
+    return {
+        "index": starts.tolist(),
+        "value": _finite((np.add.reduceat(flat, starts, dtype=np.float64) / sizes).tolist()),
+        "min": _finite(np.fmin.reduceat(flat, starts).tolist()),
+        "max": _finite(np.fmax.reduceat(flat, starts).tolist()),
+        "decimated": True,
+    }
+
+
+def _as_numpy(value: Any) -> Any:
+    """
+    The array as a numeric NumPy array, sharing its memory, or None if NumPy is not installed.
+    """
+    if isinstance(value, (array, memoryview)):
+        _check_format(value)
+        try:
+            import numpy as np
+        except ImportError:
+            return None
+        value = np.asarray(value)
+    if value.dtype.kind not in NUMERIC_KINDS:
+        raise ValueError(f"Arrays of dtype {value.dtype} can not be reduced.")
+    if value.dtype.kind == "b":
+        return value.view("u1")
+    return value
+
+
+def _check_format(value: array | memoryview) -> None:
+    typecode = value.typecode if isinstance(value, array) else value.format
+    if typecode in ("u", "w"):
+        raise ValueError("Arrays of characters can not be reduced.")
+
+
+def _python_values(value: array | memoryview) -> memoryview:
+    return value if isinstance(value, memoryview) else memoryview(value)
+
+
+def _finite(values: list) -> list:
+    return [value if isfinite(value) else None for value in values]
+
+
+def _empty_stats() -> dict[str, Any]:
+    return {"min": None, "max": None, "mean": None, "std": None, "histogram": None}
+
+
+def _python_stats(values: Any, bins: int) -> dict[str, Any]:
+    finite = [value for value in values if isfinite(value)]
+    res: dict[str, Any] = {"count": len(values), "nonfinite": len(values) - len(finite)}
+    if not finite:
+        return {**res, **_empty_stats()}
+    low, high = min(finite), max(finite)
+    mean = sum(finite) / len(finite)
+    std = sqrt(sum((value - mean) ** 2 for value in finite) / len(finite))
+    if low == high:  # Same convention as numpy.histogram
+        low, high = low - 0.5, high + 0.5
+    width = (high - low) / bins
+    counts = [0] * bins
+    for value in finite:
+        counts[min(int((value - low) / width), bins - 1)] += 1
+    return {
+        **res,
+        "min": min(finite),
+        "max": max(finite),
+        "mean": mean,
+        "std": std,
+        "histogram": {"edges": [low + width * i for i in range(bins + 1)], "counts": counts},
+    }
+
+
+def _python_downsample(values: Any, max_points: int) -> dict[str, Any]:
+    count = len(values)
+    if count <= max_points:
+        return {"index": list(range(count)), "value": _finite(values.tolist()), "decimated": False}
+    res: dict[str, Any] = {"index": [], "value": [], "min": [], "max": [], "decimated": True}
+    for bucket in range(max_points):
+        first = bucket * count // max_points
+        last = (bucket + 1) * count // max_points
+        samples = values[first:last]
+        res["index"].append(first)
+        res["value"].append(sum(samples) / len(samples))
+        res["min"].append(min(samples))
+        res["max"].append(max(samples))
+    for key in ("value", "min", "max"):
+        res[key] = _finite(res[key])
+    return res
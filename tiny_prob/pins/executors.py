@@ -0,0 +1,201 @@
+"""
+Executors of event callbacks.
+asyncio, inspect and concurrent.futures are only imported when they are used.
+"""
+import traceback
+from dataclasses import dataclass, field
+from threading import BoundedSemaphore, Lock
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    import asyncio
+
+
+@dataclass
+class EventMetrics:
+    """
+    Counters of an event pin. Latencies are measured from the trigger to the end of the callback,
+    so they include the time spent queued.
+    """
+
+    triggers: int = 0
+    calls: int = 0
+    dropped: int = 0
+    errors: int = 0
+    queue_depth: int = 0
+    total_latency: float = 0.0  # seconds
+    max_latency: float = 0.0  # seconds
+    _lock: Lock = field(default_factory=Lock, repr=False, compare=False)
+
+    def triggered(self) -> None:
+        with self._lock:
+            self.triggers += 1
+
+    def drop(self) -> None:
+        with self._lock:
+            self.dropped += 1
+
+    def queued(self) -> None:
+        with self._lock:
+            self.queue_depth += 1
+
+    def done(self, started_at: float, error: bool = False, queued: bool = False) -> None:
+        latency = perf_counter() - started_at
+        with self._lock:
+            self.calls += 1
+            self.errors += error
+            self.total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            if queued:
+                self.queue_depth -= 1
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "triggers": self.triggers,
+            "calls": self.calls,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "queue_depth": self.queue_depth,
+            "mean_latency": self.total_latency / self.calls if self.calls else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+
+def compile_callback(callback: Callable) -> Callable[[Any], Any]:
+    """
+    Resolve once whether the callback takes the event value, and return a callable that always
+    takes it. Works with functions, lambdas, bound methods and static methods.
+    """
+    import inspect
+
+    try:
+        parameters = inspect.signature(callback).parameters.values()
+    except (TypeError, ValueError):
+        return callback  # Builtins without a signature; assume they take the value.
+    positional = (
+        inspect.Parameter.POSITIONAL_ONLY,
+        inspect.Parameter.POSITIONAL_OR_KEYWORD,
+        inspect.Parameter.VAR_POSITIONAL,
+    )
+    if any(parameter.kind in positional for parameter in parameters):
+        return callback
+    return lambda _: callback()
+
+
+def run_callback(callback: Callable[[Any], Any], value: Any, metrics: EventMetrics) -> None:
+    """
+    Run a compiled callback inline and record its latency.
+    """
+    started_at = perf_counter()
+    try:
+        callback(value)
+    except Exception:
+        metrics.done(started_at, error=True)
+        raise
+    metrics.done(started_at)
+
+
+class ThreadPoolCallbackExecutor:
+    """
+    Run event callbacks on a bounded pool of threads, so that slow listeners do not block the web
+    server. At most `max_pending` callbacks can be queued or running; past that, triggers wait up
+    to `block_timeout` seconds for a slot (0 drops right away, None waits forever) and are counted
+    as dropped otherwise.
+    """
+
+    DEFAULT_WORKERS = 4
+    DEFAULT_MAX_PENDING = 1000
+
+    def __init__(
+        self,
+        workers: int = DEFAULT_WORKERS,
+        max_pending: int = DEFAULT_MAX_PENDING,
+        block_timeout: float | None = 0,
+    ) -> None:
+        from concurrent.futures import ThreadPoolExecutor
+
+        self.__pool = ThreadPoolExecutor(workers, thread_name_prefix="tiny-prob-events")
+        self.__slots = BoundedSemaphore(max_pending)
+        self.__block_timeout = block_timeout
+
+    def submit(self, callback: Callable[[Any], Any], value: Any, metrics: EventMetrics) -> bool:
+        if self.__block_timeout == 0:
+            acquired = self.__slots.acquire(blocking=False)
+        else:
+            acquired = self.__slots.acquire(timeout=self.__block_timeout)
+        if not acquired:
+            metrics.drop()
+            return False
+        metrics.queued()
+        self.__pool.submit(self.__run, callback, value, metrics, perf_counter())
+        return True
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.__pool.shutdown(wait=wait)
+
+    def __run(
+        self, callback: Callable[[Any], Any], value: Any, metrics: EventMetrics, started_at: float
+    ) -> None:
+        error = False
+        try:
+            callback(value)
+        except Exception:
+            error = True
+            traceback.print_exc()
+        finally:
+            self.__slots.release()
+            metrics.done(started_at, error=error, queued=True)
+
+
+class AsyncioCallbackExecutor:
+    """
+    Run event callbacks on an asyncio loop (running in another thread). Coroutine callbacks are
+    awaited; plain ones are called on the loop. At most `max_pending` callbacks can be queued or
+    running; past that, triggers are dropped and counted.
+    """
+
+    DEFAULT_MAX_PENDING = 1000
+
+    def __init__(
+        self, loop: "asyncio.AbstractEventLoop", max_pending: int = DEFAULT_MAX_PENDING
+    ) -> None:
+        self.__loop = loop
+        self.__max_pending = max_pending
+        self.__pending = 0
+        self.__lock = Lock()
+
+    def submit(self, callback: Callable[[Any], Any], value: Any, metrics: EventMetrics) -> bool:
+        with self.__lock:
+            if self.__pending >= self.__max_pending:
+                metrics.drop()
+                return False
+            self.__pending += 1
+        metrics.queued()
+        import asyncio
+
+        asyncio.run_coroutine_threadsafe(
+            self.__run(callback, value, metrics, perf_counter()), self.__loop
+        )
+        return True
+
+    async def __run(
+        self, callback: Callable[[Any], Any], value: Any, metrics: EventMetrics, started_at: float
+    ) -> None:
+        from inspect import isawaitable
+
+        error = False
+        try:
+            result = callback(value)
+            if isawaitable(result):
+                await result
+        except Exception:
+            error = True
+            traceback.print_exc()
+        finally:
+            with self.__lock:
+                self.__pending -= 1
+            metrics.done(started_at, error=error, queued=True)
+
+
+CallbackExecutor = ThreadPoolCallbackExecutor | AsyncioCallbackExecutor
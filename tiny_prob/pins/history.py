@@ -0,0 +1,100 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from threading import Lock
+from time import time
+from typing import Any
+
+
+class PinHistory:
+    """
+    Fixed-size ring of (timestamp, value) samples of a numeric pin.
+    Samples are stored as doubles in two preallocated arrays, so the memory is 16 bytes per sample
+    of capacity whatever the update rate; the oldest samples are overwritten once it is full.
+    Timestamps are expected to be non-decreasing, which makes them bisect-searchable.
+    """
+
+    DEFAULT_CAPACITY = 10000
+    DEFAULT_MAX_POINTS = 1000
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        assert capacity > 0, "capacity must be positive"
+        self.__capacity = capacity
+        self.__times = array("d", bytes(8 * capacity))
+        self.__values = array("d", bytes(8 * capacity))
+        self.__start = 0
+        self.__count = 0
+        self.__lock = Lock()
+
+    @property
+    def capacity(self) -> int:
+        return self.__capacity
+
+    def __len__(self) -> int:
+        return self.__count
+
+    def append(self, value: Any, timestamp: float | None = None) -> bool:
+        """
+        Record a sample. Return False (and record nothing) if the value is not a number.
+        """
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return False
+        if timestamp is None:
+            timestamp = time()
+        with self.__lock:
+            if self.__count == self.__capacity:
+                index = self.__start
+                self.__start = (self.__start + 1) % self.__capacity
+            else:
+                index = (self.__start + self.__count) % self.__capacity
+                self.__count += 1
+            self.__times[index] = timestamp
+            self.__values[index] = value
+        return True
+
+    def query(
+        self,
+        start: float | None = None,
+        end: float | None = None,
+        max_points: int = DEFAULT_MAX_POINTS,
+    ) -> dict[str, Any]:
+        """
+        Samples with `start <= timestamp <= end`, oldest first, as columns:
+        {"t": [...], "value": [...]}
+        When there are more than `max_points` samples, they are decimated into `max_points`
+        buckets of consecutive samples; "t" is then the first timestamp of every bucket, "value"
+        its mean, and "min"/"max" its extremes.
+        """
+        assert max_points > 0, "max_points must be positive"
+        with self.__lock:
+            times, values = self.__ordered()
+        low = 0 if start is None else bisect_left(times, start)
+        high = len(times) if end is None else bisect_right(times, end)
+        times, values = times[low:high], values[low:high]
+
+        count = len(times)
+        if count <= max_points:
+            return {"t": times.tolist(), "value": values.tolist(), "decimated": False}
+
+        res: dict[str, Any] = {"t": [], "value": [], "min": [], "max": [], "decimated": True}
+        for bucket in range(max_points):
+            first = bucket * count // max_points
+            last = (bucket + 1) * count // max_points
+            samples = values[first:last]
+            res["t"].append(times[first])
+            res["value"].append(sum(samples) / len(samples))
+            res["min"].append(min(samples))
+            res["max"].append(max(samples))
+        return res
+
+    def __ordered(self) -> tuple[array, array]:
+        # Must be called with the lock held.
+        end = self.__start + self.__count
+        if end <= self.__capacity:
+            return self.__times[self.__start:end], self.__values[self.__start:end]
+        end -= self.__capacity
+        return (
+            self.__times[self.__start:] + self.__times[:end],
+            self.__values[self.__start:] + self.__values[:end],
+        )
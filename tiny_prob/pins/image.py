@@ -0,0 +1,173 @@
+"""
+On-demand encoding of NumPy image frames.
+NumPy is only imported when a frame is encoded, and Pillow is optional: without it, frames can
+only be encoded as PNG.
+"""
+import struct
+import zlib
+from threading import Lock
+from typing import Any, NamedTuple
+
+IMAGE_FORMATS = {"png": "image/png", "jpeg": "image/jpeg"}
+
+
+def is_ndarray(value: Any) -> bool:
+    """
+    Check whether the value is a NumPy array, without importing NumPy.
+    """
+    return type(value).__module__ == "numpy" and type(value).__name__ == "ndarray"
+
+
+class EncodedFrame(NamedTuple):
+    version: int
+    content_type: str
+    data: bytes
+
+
+class FrameCache:
+    """
+    Encoded frames of an image pin, keyed by encoding parameters and valid for one pin version.
+    Concurrent requests for the same frame wait for a single encode.
+    The parameters come from the clients, so they are normalized before keying the cache:
+    `max_size` by the stride it downscales with (see `downscale`), and the JPEG quality is
+    clamped and rounded to a multiple of `QUALITY_STEP`. At most `MAX_FRAMES` encodings are kept,
+    the oldest being evicted first.
+    """
+
+    MAX_FRAMES = 8
+    QUALITY_STEP = 5
+
+    def __init__(self) -> None:
+        self.__frames: dict[tuple, EncodedFrame] = {}
+        self.__lock = Lock()
+        self.encodes = 0
+
+    def get(
+        self,
+        image: Any,
+        version: int,
+        format: str = "png",
+        max_size: int | None = None,
+        quality: int = 80,
+    ) -> EncodedFrame:
+        if format not in IMAGE_FORMATS:
+            raise ValueError(
+                f"Unknown image format '{format}', expected one of {list(IMAGE_FORMATS)}."
+            )
+        step = stride(image, max_size)
+        if format == "jpeg":
+            quality = min(max(round(quality / self.QUALITY_STEP), 1) * self.QUALITY_STEP, 95)
+        key = (format, step, quality if format == "jpeg" else None)
+        frame = self.__frames.get(key)
+        if frame is not None and frame.version >= version:
+            return frame
+        with self.__lock:
+            frame = self.__frames.get(key)
+            if frame is not None and frame.version >= version:
+                return frame
+            # Frames of older versions will never be served again.
+            frames = {k: f for k, f in self.__frames.items() if f.version >= version}
+            while len(frames) >= self.MAX_FRAMES:
+                del frames[next(iter(frames))]
+            data = encode_image(image, format=format, max_size=max_size, quality=quality)
+            frame = EncodedFrame(version, IMAGE_FORMATS[format], data)
+            frames[key] = frame
+            self.__frames = frames
+            self.encodes += 1
+            return frame
+
+    def __len__(self) -> int:
+        return len(self.__frames)
+
+
+def encode_image(
+    image: Any, format: str = "png", max_size: int | None = None, quality: int = 80
+) -> bytes:
+    """
+    Encode an image array (HxW gray, HxWx3 RGB or HxWx4 RGBA) as PNG or JPEG, after downscaling
+    it so that its largest side is at most `max_size` pixels.
+    """
+    image = to_uint8(downscale(image, max_size))
+    if image.ndim == 3 and image.shape[2] == 1:
+        image = image[:, :, 0]
+    try:
+        from PIL import Image
+    except ImportError:
+        if format != "png":
+            raise RuntimeError("Encoding images as JPEG requires Pillow.") from None
+        return _encode_png(image)
+
+    if format == "jpeg" and image.ndim == 3 and image.shape[2] == 4:
+        image = image[:, :, :3]  # JPEG has no alpha channel
+    from io import BytesIO
+
+    buffer = BytesIO()
+    pil_image = Image.fromarray(image)
+    if format == "jpeg":
+        pil_image.save(buffer, format="JPEG", quality=quality)
+    else:
+        pil_image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def downscale(image: Any, max_size: int | None) -> Any:
+    """
+    Downscale by an integer stride so that the largest side is at most `max_size` pixels.
+    The result is a view of the image; nothing is copied.
+    """
+    step = stride(image, max_size)
+    if step == 1:
+        return image
+    return image[::step, ::step]
+
+
+def stride(image: Any, max_size: int | None) -> int:
+    """
+    The stride `downscale` uses for `max_size`: 1 (no downscaling) or more.
+    """
+    if not max_size or max_size < 0:
+        return 1
+    return max(-(-max(image.shape[:2]) // max_size), 1)  # ceil division
+
+
+def to_uint8(image: Any) -> Any:
+    """
+    Convert an image to uint8. Floats are expected in [0, 1], booleans are black and white.
+    """
+    import numpy as np
+
+    if image.dtype == np.uint8:
+        return image
+    if image.dtype == np.bool_:
+        return image.astype(np.uint8) * 255
+    if np.issubdtype(image.dtype, np.floating):
+        return (np.clip(image, 0, 1) * 255).astype(np.uint8)
+    return np.clip(image, 0, 255).astype(np.uint8)
+
+
+def _encode_png(image: Any) -> bytes:
+    """
+    Minimal PNG encoder (no filtering), used when Pillow is not installed.
+    """
+    import numpy as np
+
+    color_type = {2: 0, 3: {3: 2, 4: 6}.get(image.shape[-1])}[image.ndim]
+    if color_type is None:
+        raise ValueError(f"Unsupported image shape {image.shape}.")
+    height, width = image.shape[:2]
+    rows = np.ascontiguousarray(image).reshape(height, -1)
+    raw = np.hstack([np.zeros((height, 1), dtype=np.uint8), rows]).tobytes()
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return (
+            struct.pack(">I", len(data)) + tag + data
+            + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+        )
+
+    header = struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw, 1))
+        + chunk(b"IEND", b"")
+    )
@@ -0,0 +1,168 @@
+import heapq
+import re
+import traceback
+from dataclasses import dataclass
+from enum import Enum
+from itertools import count
+from threading import Condition, Lock, Thread
+from time import monotonic
+from typing import TYPE_CHECKING, Any, Callable
+
+if TYPE_CHECKING:
+    from tiny_prob.pins import PinBase
+
+
+@dataclass(frozen=True)
+class WritePolicy:
+    """
+    How often the assignments to a pin are committed (locked, versioned, pushed to observers).
+    - "every": every assignment (the default).
+    - "latest-every-N-ms": at most one commit every N milliseconds.
+    - "every-Nth": one assignment out of N.
+    Skipped assignments only store the value on the pin, so getters and full reads still see the
+    latest value; they are not coerced, recorded in the history, or pushed to `/pin_stream`.
+    The last skipped assignment of a burst is committed later (trailing edge): at the end of the
+    period for "latest-every", after `TRAILING_COMMIT_DELAY` seconds for "every-Nth".
+    """
+
+    TRAILING_COMMIT_DELAY = 0.1  # seconds
+
+    class Kind(Enum):
+        Every = "every"
+        LatestEvery = "latest-every"
+        EveryNth = "every-nth"
+
+    kind: Kind = Kind.Every
+    n: float = 1
+
+    __LATEST_EVERY = re.compile(r"latest-every-(\d+(?:\.\d+)?)ms")
+    __EVERY_NTH = re.compile(r"every-(\d+)(?:st|nd|rd|th)?")
+
+    @classmethod
+    def parse(cls, policy: "str | WritePolicy | None") -> "WritePolicy":
+        """
+        Parse a policy like "every", "latest-every-50ms" or "every-10th". None means "every".
+        """
+        if policy is None or isinstance(policy, WritePolicy):
+            return policy or cls()
+        policy = policy.strip().lower()
+        if policy == "every":
+            return cls()
+        match = cls.__LATEST_EVERY.fullmatch(policy)
+        if match:
+            return cls(cls.Kind.LatestEvery, float(match.group(1)))
+        match = cls.__EVERY_NTH.fullmatch(policy)
+        if match and int(match.group(1)) > 0:
+            return cls(cls.Kind.EveryNth, int(match.group(1)))
+        raise ValueError(
+            f"Unknown write policy '{policy}', expected 'every', 'latest-every-<N>ms' or "
+            "'every-<N>th'."
+        )
+
+    def compile(self, pin: "PinBase") -> Callable[[Any], None]:
+        """
+        Build the write function of a pin for this policy.
+        The trailing commits only commit the value the pin holds (see `PinBase.commit_value`), so
+        they never overwrite a newer assignment; the state shared with them is updated under
+        `lock`, while the skipped assignments only read it.
+        """
+        write_value = pin.write_value
+        if self.kind is WritePolicy.Kind.Every:
+            return write_value
+
+        lock = Lock()
+        pending = False  # Whether a skipped assignment waits for its trailing commit
+
+        def commit_pending() -> None:
+            nonlocal pending
+            with lock:
+                if not pending:
+                    return
+                pending = False
+            pin.commit_value()
+
+        if self.kind is WritePolicy.Kind.LatestEvery:
+            period = self.n / 1000
+            next_commit = 0.0
+
+            def flush() -> None:
+                nonlocal next_commit
+                with lock:
+                    next_commit = monotonic() + period
+                commit_pending()
+
+            def write(value: Any) -> None:
+                nonlocal next_commit, pending
+                now = monotonic()
+                if now < next_commit:
+                    pin.value = value
+                    if not pending:
+                        with lock:
+                            if not pending:
+                                pending = True
+                                _TRAILING_COMMITS.schedule(next_commit, flush)
+                    return
+                with lock:
+                    next_commit = now + period
+                    pending = False
+                write_value(value)
+
+            return write
+
+        every = int(self.n)
+        remaining = 1  # Commit the first assignment
+        delay = self.TRAILING_COMMIT_DELAY
+
+        def write(value: Any) -> None:
+            nonlocal remaining, pending
+            remaining -= 1
+            if remaining:
+                pin.value = value
+                if not pending:
+                    with lock:
+                        if not pending:
+                            pending = True
+                            _TRAILING_COMMITS.schedule(monotonic() + delay, commit_pending)
+                return
+            remaining = every
+            with lock:
+                pending = False
+            write_value(value)
+
+        return write
+
+
+class _TrailingCommits:
+    """
+    Single background thread running the trailing commits of all the pins at their deadline.
+    The thread is started on first use.
+    """
+
+    def __init__(self) -> None:
+        self.__queue: list[tuple[float, int, Callable[[], None]]] = []
+        self.__order = count()
+        self.__condition = Condition()
+        self.__thread: Thread | None = None
+
+    def schedule(self, deadline: float, callback: Callable[[], None]) -> None:
+        with self.__condition:
+            heapq.heappush(self.__queue, (deadline, next(self.__order), callback))
+            if self.__thread is None:
+                self.__thread = Thread(target=self.__run, name="tiny-prob-commits", daemon=True)
+                self.__thread.start()
+            self.__condition.notify()
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                while not self.__queue or self.__queue[0][0] > monotonic():
+                    timeout = self.__queue[0][0] - monotonic() if self.__queue else None
+                    self.__condition.wait(timeout)
+                _, _, callback = heapq.heappop(self.__queue)
+            try:
+                callback()
+            except Exception:
+                traceback.print_exc()
+
+
+_TRAILING_COMMITS = _TrailingCommits()
@@ -0,0 +1,147 @@
+"""
+Low-overhead timing of code sections (see `TimerPin`).
+
+Every thread records into its own accumulator, so recording takes no lock; accumulators are
+merged when the timer is read, and when their thread exits (see `tiny_prob.per_thread`).
+Durations are binned in a log-linear (HDR-style) histogram of nanoseconds: values below 32 ns
+have exact buckets, and every power of two above is split in 16 buckets, so a bucket is at most
+1/16 (~6%) wider than its lower bound.
+"""
+from time import perf_counter_ns
+from typing import Any
+
+from tiny_prob.per_thread import PerThread
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_SHIFT = 36  # Buckets up to 2**41 ns (~36 min); longer durations go in the last bucket
+BUCKETS = (MAX_SHIFT + 1) * SUB_BUCKETS + SUB_BUCKETS
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def bucket_index(value: int) -> int:
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    if shift <= 0:
+        return value if value > 0 else 0
+    if shift > MAX_SHIFT:
+        return BUCKETS - 1
+    return (shift << SUB_BUCKET_BITS) + (value >> shift)
+
+
+def bucket_bounds(index: int) -> tuple[int, int]:
+    """
+    The [lower, upper) range of a bucket, in nanoseconds.
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index, index + 1
+    shift = (index >> SUB_BUCKET_BITS) - 1
+    lower = (index - (shift << SUB_BUCKET_BITS)) << shift
+    return lower, lower + (1 << shift)
+
+
+class _Accumulator:
+    __slots__ = ("count", "total", "max", "buckets")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0  # ns
+        self.max = 0  # ns
+        self.buckets = [0] * BUCKETS
+
+    def merge(self, other: "_Accumulator") -> None:
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        for index, value in enumerate(other.buckets):
+            if value:
+                self.buckets[index] += value
+
+
+class Timer:
+    """
+    Call count, total / max time and latency histogram of a code section.
+    """
+
+    def __init__(self) -> None:
+        self.__accumulators = PerThread(_Accumulator, _Accumulator.merge)
+
+    def record(self, elapsed_ns: int) -> None:
+        accumulator = self.__accumulators.get()
+        accumulator.count += 1
+        accumulator.total += elapsed_ns
+        if elapsed_ns > accumulator.max:
+            accumulator.max = elapsed_ns
+        accumulator.buckets[bucket_index(elapsed_ns)] += 1
+
+    def span(self) -> "Span":
+        return Span(self)
+
+    @property
+    def count(self) -> int:
+        return self.__accumulators.read(
+            lambda accumulators: sum(accumulator.count for accumulator in accumulators)
+        )
+
+    def summary(self) -> dict[str, Any]:
+        """
+        Merge the threads' accumulators. Times are in seconds, and the histogram only lists the
+        non-empty buckets, as [lower, upper, count].
+        """
+        merged = _Accumulator()
+
+        def merge(accumulators: list[_Accumulator]) -> None:
+            for accumulator in accumulators:
+                merged.merge(accumulator)
+
+        self.__accumulators.read(merge)
+        count, total, maximum, buckets = merged.count, merged.total, merged.max, merged.buckets
+        histogram = [
+            [*(bound / 1e9 for bound in bucket_bounds(index)), value]
+            for index, value in enumerate(buckets)
+            if value
+        ]
+        return {
+            "count": count,
+            "total": total / 1e9,
+            "mean": total / count / 1e9 if count else 0.0,
+            "max": maximum / 1e9,
+            "percentiles": {
+                str(percentile): min(_percentile(buckets, count, percentile), maximum) / 1e9
+                for percentile in PERCENTILES
+            },
+            "histogram": histogram,
+        }
+
+
+class Span:
+    """
+    Context manager timing its block into a Timer.
+    """
+
+    __slots__ = ("timer", "started_at")
+
+    def __init__(self, timer: Timer) -> None:
+        self.timer = timer
+        self.started_at = 0
+
+    def __enter__(self) -> "Span":
+        self.started_at = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.timer.record(perf_counter_ns() - self.started_at)
+
+
+def _percentile(buckets: list[int], count: int, percentile: float) -> int:
+    """
+    Upper bound of the bucket holding the given percentile, in nanoseconds.
+    """
+    if not count:
+        return 0
+    rank = count * percentile / 100
+    seen = 0
+    for index, value in enumerate(buckets):
+        seen += value
+        if value and seen >= rank:
+            return bucket_bounds(index)[1]
+    return 0
@@ -0,0 +1,153 @@
+"""
+Sampling stack profiler of all the threads of the process (see `/profile`).
+
+A background thread samples `sys._current_frames()` at a fixed rate and counts the folded stacks
+("thread;outer_function;...;inner_function"), the input format of flamegraph.pl, speedscope and
+most flame graph viewers. Nothing is instrumented, so the profiled code only pays for the GIL
+the sampler takes. The sampler backs off when sampling takes more than `max_overhead` of the
+wall time (e.g. with many threads or deep stacks). The sampler needs the GIL to wake up, so
+against CPU-bound threads the achieved rate is bounded by `sys.getswitchinterval()` (5 ms by
+default); the response reports the achieved rate.
+"""
+import sys
+from math import isfinite
+from collections import Counter
+from threading import Event, Lock, Thread, current_thread, enumerate as enumerate_threads
+from time import perf_counter, sleep
+from types import CodeType, FrameType
+from typing import Any
+
+
+class ProfileRunning(RuntimeError):
+    """
+    Raised when a profile is requested while another one is running.
+    """
+
+
+class SamplingProfiler:
+    """
+    On-demand sampling profiler. One profile runs at a time; `seconds` and `hz` are capped by
+    `max_seconds` and `max_hz`, and stacks deeper than `max_depth` keep their innermost frames.
+    """
+
+    DEFAULT_MAX_SECONDS = 60.0
+    DEFAULT_MAX_HZ = 1000.0
+    DEFAULT_MAX_DEPTH = 128
+    DEFAULT_MAX_OVERHEAD = 0.05  # Fraction of the wall time spent sampling
+
+    def __init__(
+        self,
+        max_seconds: float = DEFAULT_MAX_SECONDS,
+        max_hz: float = DEFAULT_MAX_HZ,
+        max_depth: int = DEFAULT_MAX_DEPTH,
+        max_overhead: float = DEFAULT_MAX_OVERHEAD,
+    ) -> None:
+        self.max_seconds = max_seconds
+        self.max_hz = max_hz
+        self.max_depth = max_depth
+        self.max_overhead = max_overhead
+        self.__running = Lock()
+
+    def profile(self, seconds: float = 5.0, hz: float = 100.0) -> dict[str, Any]:
+        """
+        Sample all the threads (but the calling one) for `seconds` at `hz` samples per second,
+        and return {"stacks": {folded_stack: count}, "samples", "duration", "hz", "overhead"}
+        where `hz` is the achieved rate and `overhead` the fraction of the time spent sampling.
+        Raise ValueError if `seconds` or `hz` is not finite, and ProfileRunning if another
+        profile is running.
+        """
+        if not (isfinite(seconds) and isfinite(hz)):
+            raise ValueError(f"seconds and hz must be finite, got {seconds} and {hz}.")
+        if not self.__running.acquire(blocking=False):
+            raise ProfileRunning("A profile is already running.")
+        try:
+            seconds = min(max(seconds, 0.0), self.max_seconds)
+            hz = min(max(hz, 1.0), self.max_hz)
+            result: dict[str, Any] = {}
+            done = Event()
+            excluded = {current_thread().ident}
+            sampler = Thread(
+                target=self.__sample,
+                args=(seconds, hz, excluded, result, done),
+                name="tiny-prob-profiler",
+                daemon=True,
+            )
+            sampler.start()
+            done.wait()
+            return result
+        finally:
+            self.__running.release()
+
+    def __sample(
+        self,
+        seconds: float,
+        hz: float,
+        excluded: set[int],
+        result: dict[str, Any],
+        done: Event,
+    ) -> None:
+        excluded = excluded | {current_thread().ident}
+        stacks: Counter[str] = Counter()
+        # Per profile, so that the sampled code (e.g. created dynamically) is not kept alive.
+        labels: dict[CodeType, str] = {}
+        interval = 1.0 / hz
+        samples = 0
+        busy = 0.0
+        started_at = perf_counter()
+        deadline = started_at + seconds
+        try:
+            while True:
+                sample_started_at = perf_counter()
+                if sample_started_at >= deadline:
+                    break
+                names = {thread.ident: thread.name for thread in enumerate_threads()}
+                frames = sys._current_frames()
+                for ident, frame in frames.items():
+                    if ident not in excluded:
+                        stacks[self.__fold(names.get(ident, str(ident)), frame, labels)] += 1
+                frames = frame = None  # Do not keep the sampled frames alive while waiting
+                samples += 1
+                now = perf_counter()
+                busy += now - sample_started_at
+                # Back off when sampling exceeds its share of the wall time.
+                period = max(interval, busy / self.max_overhead / samples)
+                sleep(max(0.0, min(sample_started_at + period, deadline) - now))
+        finally:
+            duration = perf_counter() - started_at
+            result.update(
+                stacks=dict(stacks),
+                samples=samples,
+                duration=duration,
+                hz=samples / duration if duration else 0.0,
+                overhead=busy / duration if duration else 0.0,
+            )
+            done.set()
+
+    def __fold(
+        self, thread_name: str, frame: FrameType | None, cache: dict[CodeType, str]
+    ) -> str:
+        labels = []
+        while frame is not None and len(labels) < self.max_depth:
+            labels.append(_label(frame.f_code, cache))
+            frame = frame.f_back
+        labels.append(thread_name.replace(";", ":"))
+        return ";".join(reversed(labels))
+
+
+def _label(code: CodeType, cache: dict[CodeType, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        name = getattr(code, "co_qualname", code.co_name)  # co_qualname: Python >= 3.11
+        label = f"{name} ({code.co_filename}:{code.co_firstlineno})".replace(";", ":")
+        cache[code] = label
+    return label
+
+
+def folded(stacks: dict[str, int]) -> str:
+    """
+    The folded stacks as text, one "stack count" line per stack, most frequent first.
+    """
+    return "".join(
+        f"{stack} {count}\n"
+        for stack, count in sorted(stacks.items(), key=lambda item: item[1], reverse=True)
+    )
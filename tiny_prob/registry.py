@@ -0,0 +1,125 @@
+from fnmatch import fnmatchcase
+from threading import Lock
+from typing import ItemsView, Iterator, KeysView, Mapping, ValuesView
+
+from tiny_prob.pins import PinBase
+
+
+class PinCollisionError(ValueError):
+    """
+    Two different (namespace, name) pairs map to the same address, e.g. ("a/b", "c") and
+    ("a", "b/c").
+    """
+
+
+class PinRegistry(Mapping[str, PinBase]):
+    """
+    Pins keyed by (namespace, name), addressed as `namespace/name` (see `PinBase.address`).
+    Lookups by address are a dict access, and a namespace index lets queries walk only the pins
+    of a subtree (a namespace and the namespaces below it) instead of all the pins.
+    Pins are added and removed from any thread (finalizers of captured instances, gateway and
+    shared-memory mirrors), so mutations take a lock; reads copy what they iterate instead.
+    """
+
+    def __init__(self) -> None:
+        self.__pins: dict[str, PinBase] = {}  # {address: pin}
+        self.__namespaces: dict[str, dict[str, PinBase]] = {}  # {namespace: {address: pin}}
+        self.__lock = Lock()
+
+    def add(self, pin: PinBase) -> PinBase | None:
+        """
+        Register a pin and return the pin it replaced, if any. A pin with the same namespace and
+        name is replaced; a different pin with the same address raises PinCollisionError.
+        """
+        address = pin.address
+        with self.__lock:
+            previous = self.__pins.get(address)
+            if previous is not None and (previous.namespace or "", previous.name) != (
+                pin.namespace or "",
+                pin.name,
+            ):
+                raise PinCollisionError(
+                    f"Pin '{pin.name}' of namespace '{pin.namespace}' collides with pin "
+                    f"'{previous.name}' of namespace '{previous.namespace}' at '{address}'."
+                )
+            self.__pins[address] = pin
+            self.__namespaces.setdefault(pin.namespace or "", {})[address] = pin
+        return previous
+
+    def remove(self, address: str) -> PinBase | None:
+        with self.__lock:
+            pin = self.__pins.pop(address, None)
+            if pin is not None:
+                namespace = self.__namespaces.get(pin.namespace or "")
+                if namespace is not None:
+                    namespace.pop(address, None)
+                    if not namespace:
+                        del self.__namespaces[pin.namespace or ""]
+        return pin
+
+    def namespaces(self, prefix: str = "") -> dict[str, int]:
+        """
+        The namespaces of the subtree, with their number of pins.
+        """
+        return {
+            namespace: len(pins)
+            for namespace, pins in list(self.__namespaces.items())
+            if _in_subtree(namespace, prefix)
+        }
+
+    def query(
+        self,
+        namespace: str = "",
+        pattern: str | None = None,
+        type: str | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> tuple[int, list[PinBase]]:
+        """
+        Pins of the subtree of `namespace` ("" is everything), optionally filtered by a glob
+        `pattern` on their address and by type. Return the total number of matches and the
+        `limit` matches starting at `offset`.
+        """
+        if namespace:
+            groups = [
+                pins
+                for name, pins in list(self.__namespaces.items())
+                if _in_subtree(name, namespace)
+            ]
+            pins = [pin for group in groups for pin in list(group.values())]
+        else:
+            pins = list(self.__pins.values())
+        if type is not None:
+            pins = [pin for pin in pins if pin.type == type]
+        if pattern is not None:
+            pins = [pin for pin in pins if fnmatchcase(pin.address, pattern)]
+        end = None if limit is None else offset + limit
+        return len(pins), pins[offset:end]
+
+    def __getitem__(self, address: str) -> PinBase:
+        return self.__pins[address]
+
+    def __contains__(self, address: object) -> bool:
+        return address in self.__pins
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.__pins)
+
+    def __len__(self) -> int:
+        return len(self.__pins)
+
+    def get(self, address: str, default: PinBase | None = None) -> PinBase | None:
+        return self.__pins.get(address, default)
+
+    def keys(self) -> KeysView[str]:
+        return self.__pins.keys()
+
+    def values(self) -> ValuesView[PinBase]:
+        return self.__pins.values()
+
+    def items(self) -> ItemsView[str, PinBase]:
+        return self.__pins.items()
+
+
+def _in_subtree(namespace: str, prefix: str) -> bool:
+    return not prefix or namespace == prefix or namespace.startswith(prefix + "/")
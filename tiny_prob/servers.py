@@ -0,0 +1,307 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from socketserver import ThreadingMixIn
+from threading import Lock
+from typing import Any, Callable
+from urllib.parse import unquote
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from bottle import ServerAdapter
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(*args, **kw):
+        pass
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class ThreadPoolWSGIServer(WSGIServer):
+    """
+    WSGIServer handling the requests on a bounded pool of threads.
+    """
+
+    workers = 16
+
+    def server_activate(self) -> None:
+        super().server_activate()
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="tiny-prob-http")
+
+    def process_request(self, request, client_address) -> None:
+        self.executor.submit(self.__process_request, request, client_address)
+
+    def __process_request(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class TinyServer(ServerAdapter):
+    """
+    wsgiref server, one thread per request. Long-lived connections (e.g. `/pin_stream`) do not
+    block the other clients.
+    """
+
+    server = None
+    server_class = ThreadingWSGIServer
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080, **options):
+        super().__init__(host=host, port=port, **options)
+        self.stop_requested = False
+        self.lock = Lock()
+
+    def run(self, handler):
+        if self.quiet:
+            self.options["handler_class"] = QuietHandler
+        self.options.setdefault("server_class", self.server_class)
+        server = make_server(self.host, self.port, handler, **self.options)
+        with self.lock:
+            if self.stop_requested:
+                server.server_close()
+                return
+            self.server = server
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+
+    def stop(self):
+        with self.lock:
+            if self.stop_requested:
+                return
+            self.stop_requested = True
+            server = self.server
+        if server is None:
+            return
+        # self.server.server_close() <--- alternative but causes bad fd exception
+        server.shutdown()
+
+
+class SimpleServer(TinyServer):
+    """
+    Plain wsgiref server, handling one request at a time.
+    """
+
+    server_class = WSGIServer
+
+
+class ThreadPoolServer(TinyServer):
+    """
+    wsgiref server with a bounded pool of `workers` threads. Note that every open `/pin_stream`
+    holds a worker.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080, workers: int = 16, **options):
+        super().__init__(host=host, port=port, **options)
+        self.server_class = type(
+            "ThreadPoolWSGIServer", (ThreadPoolWSGIServer,), {"workers": workers}
+        )
+
+
+class AsyncioServer(ServerAdapter):
+    """
+    HTTP/1.1 server on asyncio, with keep-alive and chunked responses.
+    Connections are handled on the event loop; the WSGI application (and the iteration of its
+    response) runs on a pool of `workers` threads.
+    """
+
+    KEEPALIVE_TIMEOUT = 5.0  # seconds
+    MAX_HEADER_COUNT = 100
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080, workers: int = 16, **options):
+        super().__init__(host=host, port=port, **options)
+        self.workers = workers
+        self.loop: asyncio.AbstractEventLoop | None = None
+        self.stopped: asyncio.Event | None = None
+        self.stop_requested = False
+        self.lock = Lock()
+
+    def run(self, handler):
+        loop = asyncio.new_event_loop()
+        stopped = asyncio.Event()
+        with self.lock:
+            if self.stop_requested:
+                loop.close()
+                return
+            self.loop, self.stopped = loop, stopped
+        executor = ThreadPoolExecutor(self.workers, thread_name_prefix="tiny-prob-http")
+
+        async def serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+            try:
+                await self.__serve_connection(handler, executor, reader, writer)
+            except asyncio.CancelledError:
+                pass  # The server is stopping.
+
+        async def serve_until_stopped() -> None:
+            server = await asyncio.start_server(serve, self.host, self.port)
+            async with server:
+                await stopped.wait()
+
+        try:
+            loop.run_until_complete(serve_until_stopped())
+        finally:
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            if tasks:
+                loop.run_until_complete(asyncio.wait(tasks, timeout=1))
+            loop.close()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stop(self):
+        with self.lock:
+            self.stop_requested = True
+            loop, stopped = self.loop, self.stopped
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(stopped.set)
+        except RuntimeError:
+            pass  # The loop is already closed.
+
+    async def __serve_connection(
+        self,
+        app: Callable,
+        executor: ThreadPoolExecutor,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+    ) -> None:
+        try:
+            keep_alive = True
+            while keep_alive:
+                try:
+                    request_line = await asyncio.wait_for(
+                        reader.readline(), self.KEEPALIVE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+                headers = await self.__read_headers(reader)
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                connection = headers.get("connection", "").lower()
+                if version == "HTTP/1.1":
+                    keep_alive = connection != "close"
+                else:
+                    keep_alive = connection == "keep-alive"
+                environ = self.__environ(method, target, version, headers, body, writer)
+                keep_alive = await self.__respond(app, executor, environ, writer, keep_alive)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def __read_headers(self, reader: asyncio.StreamReader) -> dict[str, str]:
+        headers = {}
+        for _ in range(self.MAX_HEADER_COUNT):
+            line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+            if not line:
+                return headers
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+        raise ValueError("Too many headers.")
+
+    def __environ(
+        self,
+        method: str,
+        target: str,
+        version: str,
+        headers: dict[str, str],
+        body: bytes,
+        writer: asyncio.StreamWriter,
+    ) -> dict[str, Any]:
+        path, _, query = target.partition("?")
+        peer = writer.get_extra_info("peername") or ("", 0)
+        environ = {
+            "REQUEST_METHOD": method,
+            "SCRIPT_NAME": "",
+            "PATH_INFO": unquote(path, "latin-1"),
+            "QUERY_STRING": query,
+            "SERVER_NAME": self.host,
+            "SERVER_PORT": str(self.port),
+            "SERVER_PROTOCOL": version,
+            "REMOTE_ADDR": peer[0],
+            "CONTENT_TYPE": headers.pop("content-type", ""),
+            "CONTENT_LENGTH": headers.pop("content-length", ""),
+            "wsgi.version": (1, 0),
+            "wsgi.url_scheme": "http",
+            "wsgi.input": BytesIO(body),
+            "wsgi.errors": sys.stderr,
+            "wsgi.multithread": True,
+            "wsgi.multiprocess": False,
+            "wsgi.run_once": False,
+        }
+        for name, value in headers.items():
+            environ["HTTP_" + name.upper().replace("-", "_")] = value
+        return environ
+
+    @staticmethod
+    async def __respond(
+        app: Callable,
+        executor: ThreadPoolExecutor,
+        environ: dict[str, Any],
+        writer: asyncio.StreamWriter,
+        keep_alive: bool,
+    ) -> bool:
+        """
+        Run the WSGI application and write its response. Return whether the connection can be
+        kept alive.
+        """
+        loop = asyncio.get_running_loop()
+        status_headers: list[Any] = []
+
+        def start_response(status, headers, exc_info=None):
+            status_headers[:] = [status, headers]
+            return lambda data: None  # The legacy `write` callable is not supported.
+
+        result = await loop.run_in_executor(executor, app, environ, start_response)
+        try:
+            iterator = iter(result)
+            chunk = await loop.run_in_executor(executor, next, iterator, None)
+            status, headers = status_headers
+            has_length = any(name.lower() == "content-length" for name, _ in headers)
+            chunked = not has_length and environ["SERVER_PROTOCOL"] == "HTTP/1.1"
+            keep_alive = keep_alive and (has_length or chunked)
+
+            head = [f"HTTP/1.1 {status}"] + [f"{name}: {value}" for name, value in headers]
+            if chunked:
+                head.append("Transfer-Encoding: chunked")
+            head.append("Connection: " + ("keep-alive" if keep_alive else "close"))
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+
+            while chunk is not None:
+                if chunk:
+                    if chunked:
+                        writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                    else:
+                        writer.write(chunk)
+                    await writer.drain()
+                chunk = await loop.run_in_executor(executor, next, iterator, None)
+            if chunked:
+                writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            if hasattr(result, "close"):
+                await loop.run_in_executor(executor, result.close)
+        return keep_alive
+
+
+SERVER_BACKENDS: dict[str, type[ServerAdapter]] = {
+    "simple": SimpleServer,
+    "threaded": TinyServer,
+    "threadpool": ThreadPoolServer,
+    "asyncio": AsyncioServer,
+}
@@ -0,0 +1,304 @@
+"""
+Shared-memory pin table, so that the pins of worker processes show up in one dashboard.
+
+The process hosting the web server creates the table (`TinyProb.share_pins`), and the workers
+attach to it by name and write numeric / boolean slots. Writes are lock-free: every slot is
+guarded by a seqlock (the sequence number is odd while a write is in progress), and the host
+retries reads that overlap a write. Every slot must have a single writer (one thread of one
+process); allocating slots takes a file lock, so it is POSIX only.
+
+Layout (little-endian), in 64-byte lines:
+    header: magic (8s) | capacity (uint32) | count (uint32)
+    slot:   seq (uint64) | kind (uint8) | name length (uint8) | value (int64 / float64 at 16) |
+            name (40 bytes utf-8 at 24)
+"""
+import os
+import struct
+import tempfile
+import traceback
+from enum import IntEnum
+from multiprocessing import shared_memory
+from threading import Event, Thread
+from time import sleep
+from typing import Any, Callable
+
+MAGIC = b"TINYPRB1"
+LINE_SIZE = 64
+NAME_SIZE = 40
+SPIN_LIMIT = 100  # read retries before giving up on a slot that is being written (for now)
+
+_HEADER = struct.Struct("<8sII")
+_SEQ = struct.Struct("<Q")
+_META = struct.Struct("<BB")
+_NAME = struct.Struct(f"<{NAME_SIZE}s")
+_INT = struct.Struct("<q")
+_FLOAT = struct.Struct("<d")
+
+_CREATED: set[str] = set()  # Tables created (and tracked) by this process
+
+
+class SlotKind(IntEnum):
+    Int = 1
+    Float = 2
+    Bool = 3
+
+
+class SharedSlot:
+    """
+    One numeric / boolean value in a SharedPinTable, written by a single thread.
+    """
+
+    __slots__ = ("name", "kind", "table", "__buffer", "__offset", "__seq", "__pack")
+
+    def __init__(
+        self, table: "SharedPinTable", buffer: memoryview, offset: int, name: str, kind: SlotKind
+    ) -> None:
+        self.name = name
+        self.kind = kind
+        self.table = table  # Keeps the shared memory mapped
+        self.__buffer = buffer
+        self.__offset = offset
+        seq = _SEQ.unpack_from(buffer, offset)[0]
+        self.__seq = seq + (seq & 1)  # Odd if the previous writer died during a write
+        self.__pack = (_FLOAT if kind is SlotKind.Float else _INT).pack_into
+
+    def set(self, value: int | float | bool) -> None:
+        if self.kind is not SlotKind.Float:
+            value = int(value)
+        buffer, offset, seq = self.__buffer, self.__offset, self.__seq
+        _SEQ.pack_into(buffer, offset, seq + 1)  # odd: write in progress
+        self.__pack(buffer, offset + 16, value)
+        _SEQ.pack_into(buffer, offset, seq + 2)
+        self.__seq = seq + 2
+
+    def get(self) -> int | float | bool:
+        """
+        Read the slot, waiting for a write in progress (by another thread) to end.
+        """
+        while True:
+            read = read_slot(self.__buffer, self.__offset, self.kind)
+            if read is not None:
+                return read[1]
+            sleep(0)
+
+
+class SharedPinTable:
+    """
+    Fixed-capacity table of named numeric / boolean slots in shared memory.
+    """
+
+    DEFAULT_CAPACITY = 1024
+
+    def __init__(self, name: str, capacity: int = DEFAULT_CAPACITY, create: bool = False) -> None:
+        self.name = name
+        size = LINE_SIZE * (capacity + 1)
+        if create:
+            self.__shm = shared_memory.SharedMemory(name, create=True, size=size)
+            _CREATED.add(name)
+            _HEADER.pack_into(self.__shm.buf, 0, MAGIC, capacity, 0)
+        else:
+            self.__shm = _attach(name)
+        magic, self.capacity, _ = _HEADER.unpack_from(self.__shm.buf, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Shared memory '{name}' is not a TinyProb pin table.")
+        self.__owner = create
+        self.__lock_path = os.path.join(tempfile.gettempdir(), f"tiny_prob_{name}.lock")
+
+    def __len__(self) -> int:
+        return _HEADER.unpack_from(self.__shm.buf, 0)[2]
+
+    def slot(self, name: str, value: int | float | bool = 0) -> SharedSlot:
+        """
+        Get the slot of the given name, allocating it (with the type and value of `value`) if
+        it does not exist yet. A restarted worker gets its previous slot back.
+        """
+        encoded = name.encode("utf-8")
+        if len(encoded) > NAME_SIZE:
+            raise ValueError(f"Slot name '{name}' is longer than {NAME_SIZE} bytes.")
+        if isinstance(value, bool):
+            kind = SlotKind.Bool
+        elif isinstance(value, int):
+            kind = SlotKind.Int
+        elif isinstance(value, float):
+            kind = SlotKind.Float
+        else:
+            raise NotImplementedError(f"Type {type(value)} not supported in shared memory.")
+
+        buffer = self.__shm.buf
+        with _FileLock(self.__lock_path):
+            count = len(self)
+            for index in range(count):
+                offset = LINE_SIZE * (index + 1)
+                if read_name(buffer, offset) == name:
+                    return SharedSlot(self, buffer, offset, name, SlotKind(buffer[offset + 8]))
+            if count == self.capacity:
+                raise MemoryError(f"Shared pin table '{self.name}' is full.")
+            offset = LINE_SIZE * (count + 1)
+            _META.pack_into(buffer, offset + 8, kind, len(encoded))
+            _NAME.pack_into(buffer, offset + 24, encoded)
+            slot = SharedSlot(self, buffer, offset, name, kind)
+            slot.set(value)
+            _HEADER.pack_into(buffer, 0, MAGIC, self.capacity, count + 1)
+        return slot
+
+    def scan(self, start: int = 0) -> list[tuple[int, str, SlotKind]]:
+        """
+        List the (index, name, kind) of the slots allocated from `start` on.
+        """
+        buffer = self.__shm.buf
+        slots = []
+        for index in range(start, len(self)):
+            offset = LINE_SIZE * (index + 1)
+            slots.append((index, read_name(buffer, offset), SlotKind(buffer[offset + 8])))
+        return slots
+
+    def seq(self, index: int) -> int:
+        """
+        Sequence number of a slot; it changes with every write.
+        """
+        return _SEQ.unpack_from(self.__shm.buf, LINE_SIZE * (index + 1))[0]
+
+    def read(self, index: int, kind: SlotKind) -> tuple[int, int | float | bool] | None:
+        """
+        Read the (seq, value) of a slot, consistent with respect to concurrent writes, or None if
+        the slot kept being written (see `read_slot`).
+        """
+        return read_slot(self.__shm.buf, LINE_SIZE * (index + 1), kind)
+
+    def close(self) -> None:
+        """
+        Detach from the table; the process that created it also destroys it.
+        """
+        self.__shm.close()
+        if self.__owner:
+            self.__shm.unlink()
+            _CREATED.discard(self.name)
+            try:
+                os.remove(self.__lock_path)
+            except OSError:
+                pass
+
+
+class SharedPinMirror:
+    """
+    Poll a SharedPinTable from the host process, and forward new slots and changed values
+    (`on_add(name, kind, value)` and `on_change(name, value)`) to the pins of the dashboard.
+    Only the sequence numbers are read for unchanged slots. Errors of the callbacks are printed,
+    and the changes they stopped are forwarded by the next poll.
+    """
+
+    DEFAULT_POLL_INTERVAL = 0.05  # seconds
+
+    def __init__(
+        self,
+        table: SharedPinTable,
+        on_add: Callable[[str, SlotKind, Any], None],
+        on_change: Callable[[str, Any], None],
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ) -> None:
+        self.table = table
+        self.__on_add = on_add
+        self.__on_change = on_change
+        self.__poll_interval = poll_interval
+        self.__slots: list[tuple[str, SlotKind]] = []
+        self.__seqs: list[int] = []
+        self.__stopped = Event()
+        self.__thread = Thread(target=self.__run, name="tiny-prob-shared", daemon=True)
+
+    def start(self) -> None:
+        self.__thread.start()
+
+    def poll(self) -> None:
+        """
+        Forward the changes since the last poll. Slots that can not be read consistently (being
+        written during all the retries) keep their previous value until the next poll.
+        """
+        for index, name, kind in self.table.scan(len(self.__slots)):
+            read = self.table.read(index, kind)
+            if read is None:
+                break  # Slots are added in order; retry from this one next time.
+            seq, value = read
+            self.__slots.append((name, kind))
+            self.__seqs.append(seq)
+            self.__on_add(name, kind, value)
+        for index, (name, kind) in enumerate(self.__slots):
+            if self.table.seq(index) == self.__seqs[index]:
+                continue
+            read = self.table.read(index, kind)
+            if read is None:
+                continue
+            self.__seqs[index], value = read
+            self.__on_change(name, value)
+
+    def close(self) -> None:
+        self.__stopped.set()
+        if self.__thread.is_alive():
+            self.__thread.join(timeout=1)
+        self.table.close()
+
+    def __run(self) -> None:
+        while not self.__stopped.wait(self.__poll_interval):
+            try:
+                self.poll()
+            except Exception:
+                traceback.print_exc()
+
+
+def read_name(buffer: memoryview, offset: int) -> str:
+    length = buffer[offset + 9]
+    return bytes(buffer[offset + 24:offset + 24 + length]).decode("utf-8")
+
+
+def read_slot(
+    buffer: memoryview, offset: int, kind: SlotKind
+) -> tuple[int, int | float | bool] | None:
+    """
+    Read the (seq, value) of a slot, or None if every one of the `SPIN_LIMIT` tries overlapped a
+    write (the value could be torn).
+    """
+    unpack = (_FLOAT if kind is SlotKind.Float else _INT).unpack_from
+    for _ in range(SPIN_LIMIT):
+        seq = _SEQ.unpack_from(buffer, offset)[0]
+        value = unpack(buffer, offset + 16)[0]
+        if not seq & 1 and _SEQ.unpack_from(buffer, offset)[0] == seq:
+            return seq, bool(value) if kind is SlotKind.Bool else value
+    return None
+
+
+class _FileLock:
+    """
+    Inter-process lock on a file (POSIX only).
+    """
+
+    def __init__(self, path: str) -> None:
+        self.__path = path
+        self.__fd: int | None = None
+
+    def __enter__(self) -> "_FileLock":
+        import fcntl
+
+        self.__fd = os.open(self.__path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self.__fd, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        import fcntl
+
+        fcntl.flock(self.__fd, fcntl.LOCK_UN)
+        os.close(self.__fd)
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    Attach to an existing segment without letting this process' resource tracker destroy it
+    when the process exits (the host owns it).
+    """
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:  # Python < 3.13
+        from multiprocessing import resource_tracker
+
+        shm = shared_memory.SharedMemory(name)
+        if name not in _CREATED:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
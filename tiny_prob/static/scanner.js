@@ -5,10 +5,12 @@
 //   namespace: string,
 //   value: Any,
 //   type: string
-//   html_template: {"topic": string, "value": string, "editable_field": string},
+//   version: int,
+//   created: int,  // version at which the pin was added on the server
+//   html_template: {"topic": string, "value": string, "editable_html": string},  // only for new pins with their own HTML
 //   readable: bool,
 //   writable: bool,
-//   value_history: List[(Any, datetime)]
+//   history: int,  // only for pins with a recorded history (capacity); see /pin_history
 // }
 
 document.addEventListener("DOMContentLoaded", () => {
@@ -17,6 +19,8 @@ document.addEventListener("DOMContentLoaded", () => {
   const variablesTableBody = document.getElementById("variablesTable").querySelector("tbody");
   const addCanvasButton = document.getElementById("addCanvas");
   const canvasContainer = document.getElementById("canvasContainer");
+  const logList = document.getElementById("logList");
+  const metricsTableBody = document.getElementById("metricsTable").querySelector("tbody");
   const variableRows = new Map();
 
   let refreshInterval;
@@ -26,49 +30,148 @@ document.addEventListener("DOMContentLoaded", () => {
   // ############################################################
   // ############################################################
 
-  // Fetch all pins periodically
+  // HTML templates of the pin types, by type (see /pin_types)
+  let pinTypes = {};
+
+  const fetchPinTypes = async () => {
+    try {
+      pinTypes = await fetchPayload("/pin_types");
+    } catch (error) {
+      console.error("Error fetching pin types:", error);
+    }
+  };
+
+  // Version and epoch of the last /pins_since response, 0 means a full fetch. The epoch changes
+  // when the server restarts.
+  let pinsVersion = 0;
+  let pinsEpoch = "";
+
+  // Fetch the pins changed since the last fetch, periodically
   const fetchAllPins = async () => {
     try {
-      const response = await fetch("/all_pins");
-      const pins = await response.json();
-      // console.log("Fetched pins:", pins);
-      updateVariablesTable(pins);
+      const delta = await fetchPayload(
+        `/pins_since?version=${pinsVersion}&epoch=${encodeURIComponent(pinsEpoch)}`
+      );
+      // console.log("Fetched pins:", delta);
+      updateVariablesTable(delta);
+      pinsVersion = delta.version;
+      pinsEpoch = delta.epoch;
     } catch (error) {
       console.error("Error fetching pins:", error);
     }
   };
 
-  // Update the variables table
-  // This will update existing rows, add new rows and turn font-color to gray for removed variables.
-  const updateVariablesTable = (pins) => {
-    const newPins = new Set(pins.map((pin) => pin.name));
-    var toUpdate = [];
-
-    pins.forEach((pin) => {
-      if (variableRows.has(pin.name)) {
-        // console.log("Updating existing row -> ", pin.name);
-        const row = variableRows.get(pin.name);
-        const readableField = row.querySelector('input[name="readable_field"]');
-        if (readableField.value === "true") {
-          toUpdate.push(pin);
+  // Update the variables table from a /pins_since delta
+  // This will update changed rows, add new rows and turn font-color to gray for removed variables.
+  const updateVariablesTable = (delta) => {
+    delta.pins.forEach((pin) => {
+      const row = variableRows.get(pin.name);
+      if (row === undefined || row.dataset.created !== String(pin.created)) {
+        // New pin (or a pin replaced on the server)
+        if (row !== undefined) {
+          variablesTableBody.removeChild(row);
         }
-      } else {
-        // console.log("Adding new row -> ", pin.name);
         addNewPin(pin);
+        if (pin.readable) updatePinValue(pin.name, pin.value);
+      } else if (pin.readable) {
+        updatePinValue(pin.name, pin.value);
       }
     });
 
-    // Update existing pins
-    updateExistingPin(toUpdate);
+    if (delta.reset) {
+      // Full resync, any row not in the response is gone
+      const newPins = new Set(delta.pins.map((pin) => pin.name));
+      variableRows.forEach((row, name) => {
+        if (!newPins.has(name)) {
+          disablePin(row);
+        }
+      });
+    }
 
     // Turn font-color to gray for removed variables
-    variableRows.forEach((row, name) => {
-      if (!newPins.has(name)) {
-        disablePin(row);
+    delta.removed.forEach((name) => {
+      if (variableRows.has(name)) {
+        disablePin(variableRows.get(name));
       }
     });
   };
 
+  // ############################################################
+  // #################### Logs ##################################
+  // ############################################################
+
+  // Sequence number of the last log received, only newer logs are fetched
+  let lastLogSeq = 0;
+  const LOGS_PAGE_SIZE = 500;
+
+  const fetchLogs = async () => {
+    try {
+      let logs;
+      do {
+        logs = await fetchPayload(`/logs?after=${lastLogSeq}&limit=${LOGS_PAGE_SIZE}`);
+        logs.forEach((log) => {
+          const item = document.createElement("li");
+          item.textContent = `[${new Date(log.timestamp * 1000).toLocaleTimeString()}] ${log.message}`;
+          logList.appendChild(item);
+          lastLogSeq = log.seq;
+        });
+      } while (logs.length === LOGS_PAGE_SIZE);
+    } catch (error) {
+      console.error("Error fetching logs:", error);
+    }
+  };
+
+  // ############################################################
+  // #################### Metrics ###############################
+  // ############################################################
+
+  // TinyProb's own overhead counters, as {"metric{labels}": value}
+  const fetchMetrics = async () => {
+    try {
+      const metrics = await fetchPayload("/metrics?format=json");
+      const rows = Object.entries(metrics).map(([name, value]) => {
+        const row = document.createElement("tr");
+        const nameCell = document.createElement("td");
+        const valueCell = document.createElement("td");
+        nameCell.textContent = name;
+        valueCell.textContent = Number.isInteger(value) ? value : value.toPrecision(4);
+        row.append(nameCell, valueCell);
+        return row;
+      });
+      metricsTableBody.replaceChildren(...rows);
+    } catch (error) {
+      console.error("Error fetching metrics:", error);
+    }
+  };
+
+  const refresh = () => {
+    fetchAllPins();
+    fetchLogs();
+    fetchMetrics();
+  };
+
+  // Subscribe to pushed pin changes. Values are applied as they arrive; pins added or removed on
+  // the server trigger a /pins_since fetch. Polling remains as the fallback.
+  const subscribePinStream = () => {
+    if (typeof EventSource === "undefined") return;
+    const stream = new EventSource("/pin_stream");
+    stream.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      let unknownPin = false;
+      message.pins.forEach((pin) => {
+        if (!variableRows.has(pin.name)) {
+          unknownPin = true;
+        } else if (pin.readable) {
+          updatePinValue(pin.name, pin.value);
+        }
+      });
+      if (message.resync || unknownPin) fetchAllPins();
+    };
+    stream.onerror = (error) => {
+      console.error("Pin stream error:", error);
+    };
+  };
+
   // Disable a pin
   const disablePin = (row) => {
     row.querySelector(".topic").style.color = "gray";
@@ -76,6 +179,7 @@ document.addEventListener("DOMContentLoaded", () => {
   };
 
   const addNewPin = (pin) => {
+    const template = { ...pinTypes[pin.type], ...pin.html_template };
     const addEditableField = (data_field) => {
       const editButton = document.createElement("button");
       editButton.classList.add("edit-button");
@@ -88,7 +192,7 @@ document.addEventListener("DOMContentLoaded", () => {
       editControls.style.display = "none";
       data_field.appendChild(editControls);
 
-      editControls.innerHTML = pin.html_template.editable_html;
+      editControls.innerHTML = fillTemplate(template.editable_html, pin);
       const hiddenField = document.createElement("input");
       hiddenField.type = "hidden";
       hiddenField.name = "pin_name";
@@ -113,8 +217,8 @@ document.addEventListener("DOMContentLoaded", () => {
     const data = document.createElement("td");
     topic.classList.add("topic");
     data.classList.add("data");
-    topic.innerHTML = pin.html_template.topic;
-    data.innerHTML = pin.html_template.value;
+    topic.innerHTML = fillTemplate(template.topic, pin);
+    data.innerHTML = fillTemplate(template.value, pin);
 
     if (pin.writable) {
       addEditableField(data);
@@ -128,36 +232,34 @@ document.addEventListener("DOMContentLoaded", () => {
 
     row.appendChild(topic);
     row.appendChild(data);
+    row.dataset.created = pin.created;
     variablesTableBody.appendChild(row);
     variableRows.set(pin.name, row);
   };
 
-  const updateExistingPin = (toUpdatePins) => {
-    var payload = {
-      read_pins: toUpdatePins.map((pin) => pin.name),
-      write_pins: {}, // TODO: Implement write functionality
-    };
-
-    fetch("/pin_value", {
-      method: "POST",
-      headers: {
-        "Content-Type": "application/json",
-      },
-      body: JSON.stringify(payload),
-    })
-      .then((response) => response.json())
-      .then((data) => {
-        Object.entries(data.read_pins).forEach(([pin_name, pin_value]) => {
-          const row = variableRows.get(pin_name);
-          const dataElement = row.querySelector(".data");
-          const valueElement = dataElement.querySelector(".value");
-          // console.log(`Updating ${pin_name} -> ${pin_value}`);
-          valueElement.textContent = pin_value;
-        });
-      })
-      .catch((error) => {
-        console.error("Error fetching pin value:", error);
-      });
+  const updatePinValue = (pin_name, pin_value) => {
+    const row = variableRows.get(pin_name);
+    const dataElement = row.querySelector(".data");
+    const valueElement = dataElement.querySelector(".value");
+    // console.log(`Updating ${pin_name} -> ${pin_value}`);
+    row.querySelector(".topic").style.color = "";
+    if (valueElement.tagName === "IMG") {
+      // Image pins send {shape, dtype, url}; the frame is only encoded when the image loads.
+      const src = pin_value ? pin_value.url : "";
+      if (valueElement.getAttribute("src") !== src) {
+        valueElement.setAttribute("src", src);
+      }
+      return;
+    }
+    if (valueElement.classList.contains("timer")) {
+      renderTimer(valueElement, pin_value);
+      return;
+    }
+    if (valueElement.classList.contains("array")) {
+      renderArray(valueElement, pin_value);
+      return;
+    }
+    valueElement.textContent = pin_value;
   };
 
   // ############################################################
@@ -243,13 +345,13 @@ document.addEventListener("DOMContentLoaded", () => {
   // ############################################################
 
   // Refresh button handler
-  refreshButton.addEventListener("click", fetchAllPins);
+  refreshButton.addEventListener("click", refresh);
 
   // Refresh rate change handler
   refreshRateSelect.addEventListener("change", () => {
     currentRate = parseInt(refreshRateSelect.value);
     clearInterval(refreshInterval);
-    if (currentRate > 0) refreshInterval = setInterval(fetchAllPins, currentRate);
+    if (currentRate > 0) refreshInterval = setInterval(refresh, currentRate);
   });
 
   // Add canvas button handler
@@ -274,11 +376,139 @@ document.addEventListener("DOMContentLoaded", () => {
   // ############################################################
   // ############################################################
   // ############################################################
-  // Initial fetch and set interval
-  fetchAllPins();
-  refreshInterval = setInterval(fetchAllPins, currentRate);
+  // Initial fetch and set interval, once the pin templates are known
+  fetchPinTypes().then(() => {
+    refresh();
+    subscribePinStream();
+    refreshInterval = setInterval(refresh, currentRate);
+  });
 });
 
+// Fill the "{name}" and "{value}" placeholders of a pin type template
+const fillTemplate = (template, pin) => {
+  if (template === undefined) return "";
+  const value = pin.value === null || typeof pin.value === "object" ? "" : pin.value;
+  return template
+    .replaceAll("{name}", escapeHtml(pin.name))
+    .replaceAll("{value}", escapeHtml(value));
+};
+
+const escapeHtml = (text) =>
+  String(text)
+    .replaceAll("&", "&amp;")
+    .replaceAll("<", "&lt;")
+    .replaceAll(">", "&gt;")
+    .replaceAll('"', "&quot;")
+    .replaceAll("'", "&#39;");
+
+// Render the summary of a timer pin (see TimerPin in tiny_prob/pins/__init__.py): the counts and
+// times, and a bar per non-empty bucket of the latency histogram.
+const renderTimer = (element, summary) => {
+  if (!summary) return;
+  const percentiles = summary.percentiles;
+  const text = document.createElement("div");
+  text.textContent =
+    `n=${summary.count}  mean=${formatSeconds(summary.mean)}  ` +
+    `p50=${formatSeconds(percentiles["50"])}  p99=${formatSeconds(percentiles["99"])}  ` +
+    `max=${formatSeconds(summary.max)}`;
+
+  const histogram = document.createElement("div");
+  histogram.classList.add("histogram");
+  const peak = Math.max(1, ...summary.histogram.map((bucket) => bucket[2]));
+  summary.histogram.forEach(([lower, upper, count]) => {
+    const bar = document.createElement("span");
+    bar.classList.add("histogram-bar");
+    bar.style.height = `${Math.max(2, (100 * count) / peak)}%`;
+    bar.title = `${formatSeconds(lower)} - ${formatSeconds(upper)}: ${count}`;
+    histogram.appendChild(bar);
+  });
+  element.replaceChildren(text, histogram);
+};
+
+// Render an array pin (see ArrayPin in tiny_prob/pins/__init__.py). Pins only send
+// {shape, dtype, size, url}; the statistics and the downsampled plot are fetched from the url
+// (see /pin_array) once per version of the array.
+const renderArray = async (element, info) => {
+  if (!info) {
+    element.replaceChildren();
+    delete element.dataset.url;
+    return;
+  }
+  if (element.dataset.url === info.url) return;
+  element.dataset.url = info.url;
+  let summary;
+  try {
+    summary = await (await fetch(info.url)).json();
+  } catch (error) {
+    console.error("Error fetching array:", error);
+    return;
+  }
+  if (element.dataset.url !== info.url) return; // A newer version is being fetched
+
+  const stats = summary.stats;
+  const text = document.createElement("div");
+  text.textContent =
+    `${info.dtype}[${info.shape.join("x")}]` +
+    (stats.min === null
+      ? ""
+      : `  min=${formatNumber(stats.min)}  max=${formatNumber(stats.max)}  ` +
+        `mean=${formatNumber(stats.mean)}  std=${formatNumber(stats.std)}`);
+
+  const canvas = document.createElement("canvas");
+  canvas.classList.add("array-plot");
+  canvas.width = 300;
+  canvas.height = 60;
+  drawArrayPlot(canvas, summary.plot);
+  element.replaceChildren(text, canvas);
+};
+
+// Draw the mean of every bucket as a line over the band between their min and max.
+const drawArrayPlot = (canvas, plot) => {
+  const values = plot.value;
+  const lows = plot.min || values;
+  const highs = plot.max || values;
+  const finite = [...lows, ...highs].filter((value) => value !== null);
+  if (!finite.length) return;
+  const low = Math.min(...finite);
+  const span = Math.max(...finite) - low || 1;
+  const x = (i) => (values.length > 1 ? (i * (canvas.width - 1)) / (values.length - 1) : 0);
+  const y = (value) => canvas.height - 1 - ((value - low) * (canvas.height - 2)) / span;
+  const context = canvas.getContext("2d");
+  const style = getComputedStyle(canvas);
+
+  context.fillStyle = style.getPropertyValue("--secondary-color").trim() || "#ccc";
+  values.forEach((_, i) => {
+    if (lows[i] === null || highs[i] === null) return;
+    context.fillRect(x(i), y(highs[i]), 1, Math.max(1, y(lows[i]) - y(highs[i])));
+  });
+
+  context.strokeStyle = style.getPropertyValue("--primary-color").trim() || "#333";
+  context.beginPath();
+  let drawing = false;
+  values.forEach((value, i) => {
+    if (value === null) {
+      drawing = false;
+      return;
+    }
+    if (drawing) context.lineTo(x(i), y(value));
+    else context.moveTo(x(i), y(value));
+    drawing = true;
+  });
+  context.stroke();
+};
+
+const formatNumber = (value) =>
+  Number.isInteger(value) ? `${value}` : Math.abs(value) >= 1e4 || Math.abs(value) < 1e-3
+    ? value.toExponential(3)
+    : value.toPrecision(4);
+
+const formatSeconds = (seconds) => {
+  if (seconds >= 1) return `${seconds.toFixed(2)}s`;
+  if (seconds >= 1e-3) return `${(seconds * 1e3).toFixed(2)}ms`;
+  if (seconds >= 1e-6) return `${(seconds * 1e6).toFixed(2)}us`;
+  return `${Math.round(seconds * 1e9)}ns`;
+};
+
 // Function for trigger event
 const triggerEvent = (variable_name, value) => {
   const payload = {
@@ -302,4 +532,85 @@ const triggerEvent = (variable_name, value) => {
     .catch((error) => {
       console.error("Error triggering event:", error);
     });
-};
\ No newline at end of file
+};
+// ############################################################
+// Compact binary wire format (see tiny_prob/wire.py)
+// ############################################################
+
+const WIRE_CONTENT_TYPE = "application/x-tinyprob";
+const textDecoder = new TextDecoder();
+
+// GET a payload, asking for the binary format; falls back to JSON if the server answers with it.
+const fetchPayload = async (url) => {
+  const response = await fetch(url, { headers: { Accept: `${WIRE_CONTENT_TYPE}, application/json` } });
+  if ((response.headers.get("Content-Type") || "").startsWith(WIRE_CONTENT_TYPE)) {
+    return decodeWire(await response.arrayBuffer());
+  }
+  return response.json();
+};
+
+// Decode a binary payload. Numeric lists come back as Int32Array / Float64Array, except lists of
+// int64, which come back as arrays of numbers (like the int64 scalars).
+const decodeWire = (buffer) => {
+  const view = new DataView(buffer);
+  let offset = 0;
+
+  const typedArray = (ArrayType, count) => {
+    const byteLength = count * ArrayType.BYTES_PER_ELEMENT;
+    const array = offset % ArrayType.BYTES_PER_ELEMENT === 0
+      ? new ArrayType(buffer, offset, count)
+      : new ArrayType(buffer.slice(offset, offset + byteLength));
+    offset += byteLength;
+    return array;
+  };
+
+  const read = () => {
+    const tag = String.fromCharCode(view.getUint8(offset));
+    offset += 1;
+    switch (tag) {
+      case "N": return null;
+      case "T": return true;
+      case "F": return false;
+      case "q": {
+        const value = Number(view.getBigInt64(offset, true));
+        offset += 8;
+        return value;
+      }
+      case "d": {
+        const value = view.getFloat64(offset, true);
+        offset += 8;
+        return value;
+      }
+    }
+    const length = view.getUint32(offset, true);
+    offset += 4;
+    switch (tag) {
+      case "s": {
+        const value = textDecoder.decode(new Uint8Array(buffer, offset, length));
+        offset += length;
+        return value;
+      }
+      case "b": {
+        const value = new Uint8Array(buffer.slice(offset, offset + length));
+        offset += length;
+        return value;
+      }
+      case "J": return typedArray(Int32Array, length);
+      case "Q": return Array.from(typedArray(BigInt64Array, length), Number);
+      case "D": return typedArray(Float64Array, length);
+      case "l": return Array.from({ length }, read);
+      case "m": {
+        const value = {};
+        for (let i = 0; i < length; i++) {
+          const key = read();
+          value[key] = read();
+        }
+        return value;
+      }
+      default:
+        throw new Error(`Unknown wire tag '${tag}' at offset ${offset - 5}`);
+    }
+  };
+
+  return read();
+};
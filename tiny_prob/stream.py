@@ -0,0 +1,212 @@
+import json
+from queue import Empty, Full, Queue
+from threading import Condition, Thread
+from time import monotonic
+from typing import Callable, Iterator
+
+from tiny_prob.pins import PinBase, next_version
+
+
+class PinBroadcaster:
+    """
+    Coalesce pin writes and push them to the subscribed clients (see `/pin_stream`).
+    Writes to the same pin between two flushes are merged into one update, and every pin is sent
+    at most `max_rate` times per second. When there are no subscribers, notifying a write is a
+    single check.
+    While there are subscribers, `refresh` (if given) is called every `refresh_interval` seconds,
+    for pins whose value is only computed on demand (e.g. timer pins).
+    """
+
+    DEFAULT_MAX_RATE = 20.0  # updates per second, per pin
+    DEFAULT_KEEPALIVE = 15.0  # seconds
+    DEFAULT_REFRESH_INTERVAL = 0.25  # seconds
+    SUBSCRIBER_QUEUE_SIZE = 256
+
+    def __init__(
+        self,
+        max_rate: float = DEFAULT_MAX_RATE,
+        keepalive: float = DEFAULT_KEEPALIVE,
+        refresh: Callable[[], None] | None = None,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ) -> None:
+        self.__max_rate = _check_rate(max_rate)
+        self.__keepalive = keepalive
+        self.__refresh = refresh
+        self.__refresh_interval = refresh_interval
+        self.__next_refresh = 0.0
+        self.__rates: dict[str, float] = {}  # {pin_name: max_rate}
+        self.__dirty: dict[str, PinBase] = {}
+        self.__last_sent: dict[str, float] = {}
+        self.__resync = False
+        self.__subscribers: list[Queue] = []
+        self.__condition = Condition()
+        self.__thread: Thread | None = None
+        self.__closed = False
+
+    def set_max_rate(self, pin_name: str, max_rate: float | None) -> None:
+        """
+        Override the max update rate (per second) of one pin. None restores the default.
+        """
+        if max_rate is not None:
+            _check_rate(max_rate)
+        with self.__condition:
+            if max_rate is None:
+                self.__rates.pop(pin_name, None)
+            else:
+                self.__rates[pin_name] = max_rate
+
+    def notify(self, pin: PinBase) -> None:
+        """
+        Mark the pin as changed. Meant to be registered as a pin observer.
+        """
+        if not self.__subscribers:
+            return
+        with self.__condition:
+            self.__dirty[pin.address] = pin
+            self.__condition.notify()
+
+    def forget(self, pin_name: str) -> None:
+        """
+        Drop the state kept for a removed pin.
+        """
+        with self.__condition:
+            self.__dirty.pop(pin_name, None)
+            self.__last_sent.pop(pin_name, None)
+            self.__rates.pop(pin_name, None)
+
+    def notify_resync(self) -> None:
+        """
+        Tell the clients that pins were added or removed, so they have to fetch `/pins_since`.
+        """
+        if not self.__subscribers:
+            return
+        with self.__condition:
+            self.__resync = True
+            self.__condition.notify()
+
+    def subscribe(self) -> Queue:
+        with self.__condition:
+            queue = Queue(maxsize=self.SUBSCRIBER_QUEUE_SIZE)
+            self.__subscribers.append(queue)
+            self.__closed = False
+            if self.__thread is None:
+                self.__thread = Thread(target=self.__run, daemon=True)
+                self.__thread.start()
+            return queue
+
+    def unsubscribe(self, queue: Queue) -> None:
+        with self.__condition:
+            if queue in self.__subscribers:
+                self.__subscribers.remove(queue)
+            self.__condition.notify()
+
+    def stream(self, queue: Queue) -> Iterator[str]:
+        """
+        Server-Sent Events stream of the messages of a subscriber queue.
+        """
+        try:
+            yield "retry: 1000\n\n"
+            while True:
+                try:
+                    message = queue.get(timeout=self.__keepalive)
+                except Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if message is None:
+                    return
+                yield f"data: {message}\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+    def close(self) -> None:
+        """
+        End all the streams and stop the broadcasting thread.
+        """
+        with self.__condition:
+            self.__closed = True
+            subscribers, self.__subscribers = self.__subscribers, []
+            self.__condition.notify()
+        for queue in subscribers:
+            self.__put(queue, None)
+
+    def __run(self) -> None:
+        while True:
+            with self.__condition:
+                timeout = self.__wait_time()
+                while not self.__closed and self.__subscribers and timeout != 0:
+                    self.__condition.wait(timeout)
+                    timeout = self.__wait_time()
+                if self.__closed or not self.__subscribers:
+                    self.__dirty.clear()
+                    self.__resync = False
+                    self.__thread = None
+                    return
+                now = monotonic()
+                refresh = self.__refresh is not None and now >= self.__next_refresh
+                if refresh:
+                    self.__next_refresh = now + self.__refresh_interval
+            if refresh:
+                # Outside the lock: the refreshed pins notify their writes.
+                self.__refresh()
+                continue
+            with self.__condition:
+                now = monotonic()
+                ready = [
+                    pin for name, pin in self.__dirty.items() if self.__due(name, now) <= 0
+                ]
+                for pin in ready:
+                    del self.__dirty[pin.address]
+                    self.__last_sent[pin.address] = now
+                resync, self.__resync = self.__resync, False
+                subscribers = list(self.__subscribers)
+
+            message = {"version": next_version(), "resync": resync}
+            message["pins"] = [pin.to_dict(with_template=False) for pin in ready]
+            message = json.dumps(message)
+            for queue in subscribers:
+                self.__put(queue, message)
+
+    def __due(self, pin_name: str, now: float) -> float:
+        """
+        Seconds until the pin is allowed to be sent again.
+        """
+        last_sent = self.__last_sent.get(pin_name)
+        if last_sent is None:
+            return 0
+        return last_sent + 1 / self.__rates.get(pin_name, self.__max_rate) - now
+
+    def __wait_time(self) -> float | None:
+        """
+        0 if something can be sent (or refreshed) right away, None if there is nothing to send,
+        otherwise the seconds until the next pin can be sent or the next refresh.
+        """
+        if self.__resync:
+            return 0
+        now = monotonic()
+        refresh = None if self.__refresh is None else max(self.__next_refresh - now, 0)
+        if not self.__dirty:
+            return refresh
+        due = max(min(self.__due(name, now) for name in self.__dirty), 0)
+        return due if refresh is None else min(due, refresh)
+
+    @staticmethod
+    def __put(queue: Queue, message: str | None) -> None:
+        try:
+            queue.put_nowait(message)
+        except Full:
+            # A slow client; rather than blocking the broadcaster, drop its backlog and let it
+            # resync through `/pins_since`.
+            while True:
+                try:
+                    queue.get_nowait()
+                except Empty:
+                    break
+            if message is not None:
+                message = json.dumps({"version": next_version(), "resync": True, "pins": []})
+            queue.put_nowait(message)
+
+
+def _check_rate(max_rate: float) -> float:
+    if not max_rate > 0:  # Also refuses NaN
+        raise ValueError(f"max_rate must be positive, got {max_rate}.")
+    return max_rate
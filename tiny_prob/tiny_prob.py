@@ -1,27 +1,518 @@
-import json
-import logging
-from time import time
-from typing import Any, Callable
+import secrets
+import weakref
+from collections import deque
+from itertools import count
+from threading import Lock
+from time import perf_counter_ns, time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any, Callable, Mapping, NamedTuple
 
-from tiny_prob.pins import EventPin, EventProb, Pin4Type, PinBase
+from tiny_prob.logs import BatchingLogHandler, LogBuffer
+from tiny_prob.pins import (
+    ArrayPin,
+    BooleanPin,
+    EventPin,
+    EventProb,
+    ImagePin,
+    NumericPin,
+    Pin4Type,
+    PinBase,
+    TimerPin,
+    next_version,
+    pin_types,
+    stamp_version,
+)
+from tiny_prob.pins.arrays import DEFAULT_BINS, DEFAULT_MAX_POINTS
+from tiny_prob.pins.history import PinHistory
+from tiny_prob.pins.policies import WritePolicy
+from tiny_prob.pins.timing import Span, Timer
+from tiny_prob.pins.executors import CallbackExecutor, ThreadPoolCallbackExecutor
+from tiny_prob.metrics import (
+    COUNTERS,
+    PIN_LOCK_CONTENDED,
+    PROMETHEUS_CONTENT_TYPE,
+    MetricFamily,
+    Sample,
+    family,
+    render_prometheus,
+    to_flat_dict,
+)
+from tiny_prob.profiler import ProfileRunning, SamplingProfiler, folded
+from tiny_prob.registry import PinRegistry
+from tiny_prob.stream import PinBroadcaster
 from tiny_prob.webserver import WebServer
 
+if TYPE_CHECKING:
+    from tiny_prob.gateway import GatewayPoller, RemotePin, UpstreamNode
+    from tiny_prob.shared import SharedPinMirror, SharedPinTable
+
+
+class RemovedPins:
+    """
+    Tombstones of removed pins, so that delta responses can report removals.
+    Only the last `capacity` removals are kept; clients older than the oldest kept tombstone
+    have to do a full resync.
+    """
+
+    DEFAULT_CAPACITY = 10000
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY) -> None:
+        self.__capacity = capacity
+        self.__removed: dict[str, int] = {}  # {name: version}, in removal order
+        self.__floor = 0
+        self.__lock = Lock()
+
+    def add(self, name: str) -> None:
+        with self.__lock:
+            self.__removed.pop(name, None)
+            self.__removed[name] = next_version()
+            if len(self.__removed) > self.__capacity:
+                oldest = next(iter(self.__removed))
+                self.__floor = self.__removed.pop(oldest)
+
+    def discard(self, name: str) -> None:
+        with self.__lock:
+            self.__removed.pop(name, None)
+
+    def since(self, version: int) -> list[str] | None:
+        """
+        Names of the pins removed after the given version, or None if the tombstones needed to
+        answer that have been dropped already.
+        """
+        with self.__lock:
+            if version < self.__floor:
+                return None
+            return [name for name, v in self.__removed.items() if v > version]
+
+
+class InstancePinTable:
+    """
+    Per-instance pins of one captured class.
+    Every live instance gets a small integer id and a row of pins, addressed as
+    `namespace/instance/attr`. Rows are released (and their ids reused) once the instance is
+    garbage collected: the finalizers only queue the instance, since they can run during a
+    collection in any thread, including one that holds the lock; the queue is drained by the
+    next access to the table (or `release_collected`).
+    """
+
+    __slots__ = (
+        "namespace",
+        "__attributes",
+        "__ids",
+        "__rows",
+        "__free",
+        "__collected",
+        "__lock",
+        "__on_add",
+        "__on_remove",
+    )
+
+    def __init__(
+        self,
+        namespace: str,
+        on_add: Callable[[PinBase], None],
+        on_remove: Callable[[PinBase], None],
+    ) -> None:
+        self.namespace = namespace
+        # {attr: (default, fast_read, write_policy)}
+        self.__attributes: dict[str, tuple[Any, bool, WritePolicy]] = {}
+        self.__ids: dict[int, int] = {}  # {id(instance): row index}
+        self.__rows: list[dict[str, PinBase] | None] = []
+        self.__free: list[int] = []
+        self.__collected: deque[int] = deque()  # id() of the instances to release
+        self.__lock = Lock()
+        self.__on_add = on_add
+        self.__on_remove = on_remove
+
+    def add_attribute(
+        self,
+        name: str,
+        default: Any,
+        fast_read: bool = False,
+        write_policy: WritePolicy = WritePolicy(),
+    ) -> None:
+        Pin4Type(name, self.namespace, default)  # fail early on unsupported types
+        self.__attributes[name] = (default, fast_read, write_policy)
+
+    def row(self, instance: Any) -> dict[str, PinBase]:
+        """
+        Get the pins of an instance, creating them on first access.
+        """
+        if self.__collected:  # Before the lookup: a new instance may reuse the id of a dead one
+            self.release_collected()
+        index = self.__ids.get(id(instance))
+        if index is None:
+            index = self.__register(instance)
+        return self.__rows[index]
+
+    def instance(self, index: int) -> dict[str, PinBase]:
+        """
+        Get the pins of the instance with the given id, or an empty dict if it is not alive.
+        """
+        if self.__collected:
+            self.release_collected()
+        if 0 <= index < len(self.__rows):
+            return self.__rows[index] or {}
+        return {}
+
+    def __register(self, instance: Any) -> int:
+        key = id(instance)
+        with self.__lock:
+            if key in self.__ids:
+                return self.__ids[key]
+            index = self.__free.pop() if self.__free else len(self.__rows)
+            row = {}
+            for name, (default, fast_read, write_policy) in self.__attributes.items():
+                pin = Pin4Type(name, f"{self.namespace}/{index}", default, fast_read=fast_read)
+                pin.set_write_policy(write_policy)
+                row[name] = pin
+            if index == len(self.__rows):
+                self.__rows.append(row)
+            else:
+                self.__rows[index] = row
+            self.__ids[key] = index
+        weakref.finalize(instance, self.__release, key)
+        for pin in row.values():
+            self.__on_add(pin)
+        return index
+
+    def release_collected(self) -> None:
+        """
+        Release the rows of the instances that were garbage collected.
+        """
+        removed = []
+        with self.__lock:
+            while self.__collected:
+                index = self.__ids.pop(self.__collected.popleft())
+                removed.extend(self.__rows[index].values())
+                self.__rows[index] = None
+                self.__free.append(index)
+        for pin in removed:
+            self.__on_remove(pin)
+
+    def __release(self, key: int) -> None:
+        self.__collected.append(key)
+
+
+class PinSnapshot(NamedTuple):
+    generation: int
+    values: Mapping[str, Any]  # {pin_name: value}, read-only
+
+
+class PinSnapshots:
+    """
+    Atomic multi-pin commits and copy-on-write snapshots of the pin values.
+    A commit writes a group of pins under one lock with a single version bump. A snapshot is an
+    immutable copy of all readable pin values, rebuilt (under the same lock) only when something
+    was written since the last one, so readers get a consistent view without taking the pin locks.
+    """
+
+    def __init__(self, pins: Mapping[str, PinBase]) -> None:
+        self.__pins = pins
+        self.__lock = Lock()
+        self.__write_counter = count(1)
+        self.__writes = 0  # Unique per write, so that a write is never mistaken for an older one
+        self.__snapshot = PinSnapshot(0, MappingProxyType({}))
+        self.__snapshot_writes = -1
+
+    def observe(self, pin: PinBase) -> None:
+        """
+        Mark the snapshot as stale. Meant to be registered as a pin observer.
+        """
+        # No lock on the write path: `next` on a count is atomic, and a delayed store of an older
+        # number still differs from the one the last snapshot saw, so it only costs a rebuild.
+        self.__writes = next(self.__write_counter)
+
+    def commit(self, values: Mapping[str, Any]) -> int:
+        """
+        Write all the values at once and return the generation of the commit.
+        Nothing is written if any of the pins is missing or not writable. The pin locks are taken
+        in address order, so that concurrent `write_value` calls and commits never interleave
+        with the commit.
+        Pins of upstream nodes (see `RemotePin`) are first written on their node, with one atomic
+        `/write_many` per node, then mirrored in the local commit. If a node fails, nothing is
+        written locally, but the nodes written before it keep their values.
+        """
+        pins = [self.__pins[name] for name in values]
+        for pin in pins:
+            if isinstance(pin, EventPin) or not pin._writable:
+                raise ValueError(f"Pin '{pin.name}' can not be written in a batch.")
+        remote: dict[Any, dict[str, Any]] = {}  # {node: {remote_name: value}}
+        for pin, value in zip(pins, values.values()):
+            if pin._remote:
+                remote.setdefault(pin._node, {})[pin._remote_name] = value
+        for node, node_values in remote.items():
+            node.write_many(node_values)
+        locks = [
+            pin._thread_lock
+            for pin in sorted({id(pin): pin for pin in pins}.values(), key=lambda pin: pin.address)
+        ]
+        with self.__lock:
+            for lock in locks:
+                lock.acquire()
+            try:
+                for pin, value in zip(pins, values.values()):
+                    pin.value = pin.coerce(value) if pin._fast_read else value
+                    pin._writes += 1
+                generation = stamp_version(pins)
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+            for pin in pins:
+                if pin._history is not None:
+                    pin._history.append(pin.peek_value())
+            self.__rebuild(generation)
+        for pin in pins:
+            for observer in pin._observers:
+                if observer != self.observe:
+                    observer(pin)
+        return generation
+
+    def snapshot(self) -> PinSnapshot:
+        if self.__snapshot_writes != self.__writes:
+            with self.__lock:
+                if self.__snapshot_writes != self.__writes:
+                    self.__rebuild(next_version())
+        return self.__snapshot
+
+    def __rebuild(self, generation: int) -> None:
+        # Must be called with the lock held.
+        writes = self.__writes
+        values = {
+            name: pin.peek_value() for name, pin in list(self.__pins.items()) if pin._readable
+        }
+        self.__snapshot = PinSnapshot(generation, MappingProxyType(values))
+        self.__snapshot_writes = writes
+
+
+class PinBatch(dict):
+    """
+    Pin writes staged in a `with` block, and committed atomically when it exits without error.
+    """
+
+    def __init__(self, snapshots: PinSnapshots) -> None:
+        super().__init__()
+        self.__snapshots = snapshots
+        self.generation: int | None = None
+
+    def __enter__(self) -> "PinBatch":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None and self:
+            self.generation = self.__snapshots.commit(self)
+
 
 class TinyProb(WebServer):
-    def __init__(self, *args, **kwargs) -> None:
+    def __init__(
+        self,
+        *args,
+        stream_max_rate: float = PinBroadcaster.DEFAULT_MAX_RATE,
+        log_capacity: int = LogBuffer.DEFAULT_CAPACITY,
+        log_max_bytes: int = LogBuffer.DEFAULT_MAX_BYTES,
+        event_workers: int = 0,
+        event_max_pending: int = ThreadPoolCallbackExecutor.DEFAULT_MAX_PENDING,
+        write_policy: str | WritePolicy = "every",
+        gateway_poll_interval: float | None = None,
+        profile_max_seconds: float = SamplingProfiler.DEFAULT_MAX_SECONDS,
+        profile_max_hz: float = SamplingProfiler.DEFAULT_MAX_HZ,
+        profile_max_overhead: float = SamplingProfiler.DEFAULT_MAX_OVERHEAD,
+        **kwargs,
+    ) -> None:
         super().__init__(*args, **kwargs)
         self.route("/all_pins", callback=self.__all_pins, method="GET")
+        self.route("/pins_since", callback=self.__pins_since, method="GET")
+        self.route("/pin_types", callback=self.__pin_types, method="GET")
+        self.route("/pins", callback=self.__query_pins, method="GET")
+        self.route("/namespaces", callback=self.__namespaces, method="GET")
+        self.route("/pin_stream", callback=self.__pin_stream, method="GET")
         self.route("/pin_value", callback=self.__pin_value, method="POST")
+        self.route("/write_many", callback=self.__write_many, method="POST")
+        self.route("/pin_history", callback=self.__pin_history, method="GET")
+        self.route("/pin_image", callback=self.__pin_image, method="GET")
+        self.route("/pin_array", callback=self.__pin_array, method="GET")
         self.route("/logs", callback=self.__read_logs, method="GET")
+        self.route("/profile", callback=self.__profile, method="GET")
+        self.route("/metrics", callback=self.__metrics, method="GET")
         # self.route("/__internal", callback=self.__internal_comm, method="POST")
-        self.__pins: dict[str, PinBase] = {}
-        self.__logs: list[tuple[float, str]] = []  # [(timestamp, message)}, ...]
+        self.__pins = PinRegistry()
+        self.__type_templates = pin_types()
+        self.__snapshots = PinSnapshots(self.__pins)
+        self.__instance_tables: dict[str, InstancePinTable] = {}
+        self.__removed_pins = RemovedPins()
+        self.__epoch = secrets.token_hex(8)  # Identifies this run of the server in /pins_since
+        self.__write_policy = WritePolicy.parse(write_policy)
+        # Timers are refreshed when pins are fetched, and by the broadcaster for the streams.
+        self.__broadcaster = PinBroadcaster(
+            max_rate=stream_max_rate, refresh=self.__refresh_timers
+        )
+        self.__logs = LogBuffer(capacity=log_capacity, max_bytes=log_max_bytes)
+        self.__event_executor = (
+            ThreadPoolCallbackExecutor(workers=event_workers, max_pending=event_max_pending)
+            if event_workers > 0
+            else None
+        )
+        self.__timers: dict[str, TimerPin] = {}
+        self.__timers_lock = Lock()  # Held while a timer is created
+        self.__serialization = {"all_pins": Timer(), "pins_since": Timer()}
+        self.__removed_accesses = [0, 0]  # Reads and writes of the removed pins
+        self.__log_handlers: weakref.WeakSet[BatchingLogHandler] = weakref.WeakSet()
+        self.__profiler = SamplingProfiler(
+            max_seconds=profile_max_seconds,
+            max_hz=profile_max_hz,
+            max_overhead=profile_max_overhead,
+        )
+        self.__shared_mirrors: dict[str, SharedPinMirror] = {}
+        self.__shared_pins: dict[str, list[PinBase]] = {}  # Pins added by every mirror
+        self.__gateway: GatewayPoller | None = None  # Created by the first add_node
+        self.__gateway_poll_interval = gateway_poll_interval
 
     def __all_pins(self) -> str:
         """
         This function returns all the pins in the system along with their meta attributes.
+        The GET request can have an instance parameter (?instance=namespace/instance_id)
+        to only get the pins of one captured instance.
         """
-        return json.dumps([val.to_dict() for val in self.__pins.values()])
+        self.__refresh_timers()
+        self.__release_instances()
+        started_at = perf_counter_ns()
+        instance = self._get_param("instance", None)
+        if instance is not None:
+            pins = self.instance_pins(instance).values()
+        else:
+            pins = self.__pins.values()
+        response = self._encode_response([val.to_dict() for val in pins])
+        self.__serialization["all_pins"].record(perf_counter_ns() - started_at)
+        return response
+
+    def __pin_types(self) -> str:
+        """
+        This function returns the HTML templates of the pin types, by type:
+        {"numeric": {"topic": ..., "value": ..., "editable_html": ...}, ...}
+        The client fills their "{name}" and "{value}" placeholders; pins only carry their type.
+        The templates never change while the server runs, so clients may cache them.
+        """
+        self._set_header("Cache-Control", "public, max-age=3600")
+        return self._encode_response(self.__type_templates)
+
+    def __query_pins(self) -> str:
+        """
+        This function returns a page of the pins of a namespace subtree:
+        ?namespace=App&pattern=App/*speed*&type=numeric&offset=0&limit=100
+        All the parameters are optional; `namespace` also matches the namespaces below it
+        (e.g. "App" matches "App/0"), and `pattern` is a glob on the pin address. The response is
+        {"total": 123, "offset": 0, "pins": [pin, ...]}
+        """
+        self.__refresh_timers()
+        self.__release_instances()
+        offset = int(self._get_param("offset", 0))
+        limit = self._get_param("limit", None)
+        total, pins = self.__pins.query(
+            namespace=self._get_param("namespace", ""),
+            pattern=self._get_param("pattern", None),
+            type=self._get_param("type", None),
+            offset=offset,
+            limit=int(limit) if limit is not None else None,
+        )
+        return self._encode_response(
+            {"total": total, "offset": offset, "pins": [pin.to_dict() for pin in pins]}
+        )
+
+    def __namespaces(self) -> str:
+        """
+        This function returns the namespaces (optionally only the subtree of ?prefix=App) with
+        their number of pins: {"App": 3, "App/0": 2, ...}
+        """
+        self.__release_instances()
+        return self._encode_response(self.__pins.namespaces(self._get_param("prefix", "")))
+
+    def query_pins(
+        self,
+        namespace: str = "",
+        pattern: str | None = None,
+        type: str | None = None,
+        offset: int = 0,
+        limit: int | None = None,
+    ) -> tuple[int, list[PinBase]]:
+        """
+        Get the pins of a namespace subtree, filtered by a glob `pattern` on their address and by
+        type, and paginated. Return the total number of matches and the requested page.
+        """
+        self.__release_instances()
+        return self.__pins.query(
+            namespace=namespace, pattern=pattern, type=type, offset=offset, limit=limit
+        )
+
+    def __pins_since(self) -> str:
+        """
+        Incremental version of `/all_pins`.
+        The GET request will have a version parameter (?version=123), which is the `version` of the
+        last response the client has seen (0 for the first request), and optionally its `epoch`
+        (?version=123&epoch=...). The response is:
+        {
+            "version": 456,  # To be sent with the next request
+            "epoch": "9f86d081884c7d65",  # Id of this run of the server, to send with the version
+            "reset": false,  # If true, "pins" is the full set of pins and the client should resync
+                             # (first request, too old or unknown version, or another epoch, i.e.
+                             # the server restarted)
+            "pins": [pin, ...],  # Pins added or changed since the version
+            "removed": ["pin_name", ...]  # Pins removed since the version
+        }
+        HTML templates are only sent for pins that are new to the client. The returned version
+        is taken before the scan, and every lower version is already stored on its pin (see
+        `next_version`), so a write racing with the scan is sent now or in the next response.
+        """
+        self.__refresh_timers()
+        self.__release_instances()
+        started_at = perf_counter_ns()
+        since = int(self._get_param("version", 0))
+        epoch = self._get_param("epoch", self.__epoch)
+        version = next_version()
+        # A version from another epoch, or from the future (clients that do not send the epoch),
+        # comes from before a restart of the server (e.g. a gateway polling a restarted node): the
+        # client has to resync.
+        if epoch == self.__epoch and 0 < since < version:
+            removed = self.__removed_pins.since(since)
+        else:
+            removed = None
+        reset = removed is None
+        pins = [
+            pin.to_dict(with_template=reset or pin._created_version > since)
+            for pin in list(self.__pins.values())
+            if reset or pin._version > since
+        ]
+        response = self._encode_response(
+            {
+                "version": version,
+                "epoch": self.__epoch,
+                "reset": reset,
+                "pins": pins,
+                "removed": removed or [],
+            }
+        )
+        self.__serialization["pins_since"].record(perf_counter_ns() - started_at)
+        return response
+
+    def __pin_stream(self):
+        """
+        Server-Sent Events stream of pin changes. Every event is a JSON object:
+        {
+            "version": 456,
+            "resync": false,  # If true, pins were added or removed; fetch `/pins_since`
+            "pins": [pin, ...]  # Pins changed since the last event, without HTML templates
+        }
+        """
+        self._set_header("Content-Type", "text/event-stream")
+        self._set_header("Cache-Control", "no-cache")
+        return self.__broadcaster.stream(self.__broadcaster.subscribe())
+
+    @property
+    def broadcaster(self) -> PinBroadcaster:
+        return self.__broadcaster
+
+    def stop_server(self, timeout: int | None = None) -> None:
+        self.__broadcaster.close()
+        super().stop_server(timeout=timeout)
 
     def __pin_value(self) -> str:
         """
@@ -30,39 +521,344 @@ class TinyProb(WebServer):
         the following JSON is expected:
         {
             "write_pins": {"pin_name": "value_to_set", ...},  # Optional
-            "read_pins": ["pin_name", ...]  # Optional
+            "read_pins": ["pin_name", ...],  # Optional
+            "snapshot": false,  # Optional, read from a consistent snapshot of all the pins
+            "slice": {"pin_name": "0:100", ...}  # Optional, elements of array pins to read
         }
+        Array pins are read as their description (shape, dtype, size), unless a slice of their
+        elements is requested (see `ArrayPin.read_slice`). Slices are read before the writes
+        (array pins can not be written from the web), so that an invalid slice gets a 400
+        without leaving partial writes behind.
         """
         write_pins = self._post_param("write_pins", None)
         read_pins = self._post_param("read_pins", None)
+        snapshot = self._post_param("snapshot", False)
+        slices = self._post_param("slice", None) or {}
         assert isinstance(write_pins, dict) or write_pins is None, "write_pins must be a dict"+repr(write_pins)
         assert isinstance(read_pins, list) or read_pins is None, "read_pins must be a list"+repr(read_pins)
+        assert isinstance(slices, dict), "slice must be a dict"+repr(slices)
         res = {}
 
         print("write_pins:: ", repr(write_pins))
         print("read_pins:: ", repr(read_pins))
 
+        sliced = {}
+        for pin_name, expression in slices.items():
+            pin = self.__pins[pin_name]
+            try:
+                if not isinstance(pin, ArrayPin):
+                    raise ValueError(f"Pin '{pin.name}' is not an array.")
+                sliced[pin_name] = pin.read_slice(expression)
+            except (ValueError, IndexError) as error:
+                self._abort(400, str(error))
+
         if write_pins is not None:
             for pin_name, value in write_pins.items():
                 self.__pins[pin_name].write_value(value)
 
-        if read_pins is not None:
+        if read_pins is not None and snapshot:
+            generation, values = self.__snapshots.snapshot()
+            res["read_pins"] = {
+                pin_name: self.__pins[pin_name].to_web(values[pin_name]) for pin_name in read_pins
+            }
+            res["generation"] = generation
+        elif read_pins is not None:
             res["read_pins"] = {
-                pin_name: self.__pins[pin_name].read_value() for pin_name in read_pins
+                pin_name: self.__pins[pin_name].to_web(self.__pins[pin_name].read_value())
+                for pin_name in read_pins
             }
+        if sliced:
+            res.setdefault("read_pins", {}).update(sliced)
+
+        return self._encode_response(res)
+
+    def __write_many(self) -> str:
+        """
+        Write a group of pins atomically (see `write_many`).
+        This function is called via Post request. In the body of the request,
+        the following JSON is expected:
+        {
+            "write_pins": {"pin_name": "value_to_set", ...}
+        }
+        The response is {"generation": 123}, the version of the commit.
+        """
+        write_pins = self._post_param("write_pins", None)
+        assert isinstance(write_pins, dict), "write_pins must be a dict"+repr(write_pins)
+        return self._encode_response({"generation": self.__snapshots.commit(write_pins)})
+
+    def write_many(self, values: Mapping[str, Any] | None = None) -> int | PinBatch:
+        """
+        Write a group of pins atomically, e.g. related parameters (PID gains) that should never be
+        observed half-updated. All the pins get the same version. Readers of `snapshot()` see
+        either none or all of the values.
+        Given the values, commit them and return the generation of the commit; otherwise return a
+        batch that is committed at the end of a `with` block.
+
+        Example:
+        ```python
+        tp.write_many({"kp": 1.2, "ki": 0.1, "kd": 0.01})
+
+        with tp.write_many() as batch:
+            batch["kp"] = 1.2
+            batch["ki"] = 0.1
+        ```
+        """
+        if values is not None:
+            return self.__snapshots.commit(values)
+        return PinBatch(self.__snapshots)
+
+    def snapshot(self) -> PinSnapshot:
+        """
+        Get a consistent, read-only snapshot of the values of all the readable pins.
+        """
+        return self.__snapshots.snapshot()
 
-        return json.dumps(res)
+    def __pin_history(self) -> str:
+        """
+        This function returns the recorded history of a pin (see `enable_history`), downsampled to
+        at most `max_points` points: ?name=pin_name&from=1234567890&to=1234567899&max_points=500
+        Only `name` is required; invalid parameters (and pins without history) get a 400. The
+        response is
+        {"name": "pin_name", "t": [...], "value": [...], "decimated": false}
+        and, when decimated, also has the "min" and "max" of every bucket.
+        """
+        pin = self.__pins[self._get_param("name", None)]
+        try:
+            if pin._history is None:
+                raise ValueError(f"Pin '{pin.name}' has no history.")
+            start = self._get_param("from", None)
+            end = self._get_param("to", None)
+            max_points = int(self._get_param("max_points", PinHistory.DEFAULT_MAX_POINTS))
+            if max_points <= 0:
+                raise ValueError("max_points must be positive.")
+            res = pin._history.query(
+                start=float(start) if start is not None else None,
+                end=float(end) if end is not None else None,
+                max_points=max_points,
+            )
+        except ValueError as error:
+            self._abort(400, str(error))
+        return self._encode_response({"name": pin.address, **res})
+
+    def __pin_image(self) -> bytes:
+        """
+        This function returns the current frame of an image pin, encoded on demand:
+        ?name=pin_name&format=png&max_size=320&quality=80
+        Only `name` is required; `format` is "png" (default) or "jpeg", `max_size` downscales the
+        frame so that its largest side fits, and `quality` applies to JPEG. Frames are encoded at
+        most once per pin version, whatever the number of viewers. Frames of the pins of a node
+        are requested from the node.
+        """
+        pin = self.__pins[self._get_param("name", None)]
+        if pin._remote:
+            return self.__proxy(pin, "/pin_image")
+        if not isinstance(pin, ImagePin):
+            raise ValueError(f"Pin '{pin.name}' is not an image.")
+        max_size = self._get_param("max_size", None)
+        frame = pin.frame(
+            format=self._get_param("format", "png"),
+            max_size=int(max_size) if max_size is not None else None,
+            quality=int(self._get_param("quality", 80)),
+        )
+        self._set_header("Content-Type", frame.content_type)
+        return frame.data
+
+    def __pin_array(self) -> str:
+        """
+        This function returns the statistics and the downsampled plot of an array pin, computed
+        on demand: ?name=pin_name&slice=0:10000&bins=20&max_points=500
+        Only `name` is required; `slice` restricts both to a slice of the array. `max_points` is
+        capped by `ArrayPin.MAX_ELEMENTS` and `bins` by `ArrayPin.MAX_BINS`; invalid parameters
+        get a 400. The response is
+        {"name": "pin_name", "shape": [...], "dtype": "float64", "size": 1000000,
+         "stats": {"count", "nonfinite", "min", "max", "mean", "std",
+                   "histogram": {"edges": [...], "counts": [...]}},
+         "plot": {"index": [...], "value": [...], "decimated": true, "min": [...], "max": [...]}}
+        Arrays of the pins of a node are reduced by the node.
+        """
+        pin = self.__pins[self._get_param("name", None)]
+        if pin._remote:
+            return self._compress_response(self.__proxy(pin, "/pin_array"))
+        if not isinstance(pin, ArrayPin):
+            raise ValueError(f"Pin '{pin.name}' is not an array.")
+        try:
+            bins = int(self._get_param("bins", DEFAULT_BINS))
+            max_points = int(self._get_param("max_points", DEFAULT_MAX_POINTS))
+            if bins <= 0 or max_points <= 0:
+                raise ValueError("bins and max_points must be positive.")
+            summary = pin.summary(
+                self._get_param("slice", None),
+                bins=min(bins, pin.MAX_BINS),
+                max_points=min(max_points, pin.MAX_ELEMENTS),
+            )
+        except (ValueError, IndexError) as error:
+            self._abort(400, str(error))
+        info = pin.to_web(pin.read_value())
+        del info["url"]
+        return self._encode_response({"name": pin.address, **info, **summary})
+
+    def __proxy(self, pin: "RemotePin", path: str) -> bytes:
+        """
+        Answer a request about a pin of a node with the response of the node.
+        """
+        try:
+            status, content_type, data = pin.proxy(
+                path, self._get_params(), headers={"Accept": self._get_header("Accept", "*/*")}
+            )
+        except (ConnectionError, OSError) as error:
+            self._abort(502, f"Node '{pin.namespace}' is unreachable: {error}")
+        if status != 200:
+            self._abort(status, data.decode("utf-8", errors="replace"))
+        self._set_header("Content-Type", content_type)
+        return data
+
+    def __profile(self) -> str:
+        """
+        This function samples the stacks of all the threads and returns them folded, ready for
+        flamegraph.pl or speedscope:
+        ?seconds=5&hz=100&format=folded
+        `seconds` and `hz` are capped by the `profile_max_seconds` / `profile_max_hz` config, and
+        the sampling rate is lowered if sampling takes more than `profile_max_overhead` of the time.
+        The folded output has one "thread;outer;...;inner count" line per stack, and the achieved
+        rate in the X-Profile-* headers; `format=json` returns
+        {"stacks": {stack: count}, "samples": 500, "duration": 5.0, "hz": 100.0, "overhead": 0.01}
+        The request blocks for the duration of the profile; only one profile runs at a time, other
+        requests get a 409. Invalid `seconds` or `hz` (e.g. "nan") get a 400.
+        """
+        try:
+            profile = self.__profiler.profile(
+                seconds=float(self._get_param("seconds", 5)),
+                hz=float(self._get_param("hz", 100)),
+            )
+        except ProfileRunning as error:
+            self._abort(409, str(error))
+        except ValueError as error:
+            self._abort(400, str(error))
+        if self._get_param("format", "folded") == "json":
+            return self._encode_response(profile)
+        self._set_header("Content-Type", "text/plain; charset=utf-8")
+        self._set_header("X-Profile-Samples", str(profile["samples"]))
+        self._set_header("X-Profile-Hz", f"{profile['hz']:.1f}")
+        self._set_header("X-Profile-Overhead", f"{profile['overhead']:.4f}")
+        return folded(profile["stacks"])
+
+    def __metrics(self) -> str:
+        """
+        This function returns the overhead counters of TinyProb itself, in the Prometheus text
+        format, or as {"metric{labels}": value} with ?format=json. See `metrics`.
+        """
+        families = self.metrics()
+        if self._get_param("format", "prometheus") == "json":
+            return self._encode_response(to_flat_dict(families))
+        self._set_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+        return render_prometheus(families)
+
+    def metrics(self) -> list[MetricFamily]:
+        """
+        Collect the overhead counters of TinyProb: pin reads / writes, lock contention (of all
+        the TinyProb instances of the process), pin payload serialization time, log buffer usage
+        and event callback latencies.
+        """
+        reads, writes = self.__removed_accesses
+        for pin in list(self.__pins.values()):
+            reads += pin._reads
+            writes += pin._writes
+        contended = COUNTERS.totals()[PIN_LOCK_CONTENDED]
+        families = [
+            family("tiny_prob_pins", "gauge", "Number of pins.", len(self.__pins)),
+            family(
+                "tiny_prob_pin_reads_total", "counter",
+                "Pin reads through read_value (fast-read getters are not counted).", reads,
+            ),
+            family("tiny_prob_pin_writes_total", "counter", "Pin writes.", writes),
+            family(
+                "tiny_prob_pin_lock_contended_total", "counter",
+                "Pin reads and writes that waited for the pin lock.", contended,
+            ),
+        ]
+        serialization = family(
+            "tiny_prob_serialization_seconds", "summary", "Time to serialize pin payloads."
+        )
+        for endpoint, timer in self.__serialization.items():
+            summary = timer.summary()
+            labels = {"endpoint": f"/{endpoint}"}
+            for percentile, value in summary["percentiles"].items():
+                quantile = {**labels, "quantile": f"{float(percentile) / 100:g}"}
+                serialization.samples.append(Sample(serialization.name, quantile, value))
+            serialization.samples.append(
+                Sample(f"{serialization.name}_sum", labels, summary["total"])
+            )
+            serialization.samples.append(
+                Sample(f"{serialization.name}_count", labels, summary["count"])
+            )
+        families.append(serialization)
+
+        families += [
+            family("tiny_prob_log_entries", "gauge", "Logs kept in memory.", len(self.__logs)),
+            family(
+                "tiny_prob_log_bytes", "gauge", "Size of the logs kept in memory.",
+                self.__logs.size_bytes,
+            ),
+            family(
+                "tiny_prob_logs_evicted_total", "counter", "Logs evicted from the log buffer.",
+                self.__logs.last_seq - len(self.__logs),
+            ),
+            family(
+                "tiny_prob_log_records_dropped_total", "counter",
+                "Log records dropped by full log handler queues.",
+                sum(handler.dropped for handler in list(self.__log_handlers)),
+            ),
+        ]
+
+        events = [pin for pin in list(self.__pins.values()) if isinstance(pin, EventPin)]
+        callbacks = family(
+            "tiny_prob_event_callback_seconds", "summary",
+            "Latency of event callbacks, from the trigger to the end of the callback.",
+        )
+        max_latency = family(
+            "tiny_prob_event_callback_max_seconds", "gauge", "Max latency of event callbacks."
+        )
+        dropped = family("tiny_prob_event_dropped_total", "counter", "Dropped event triggers.")
+        errors = family("tiny_prob_event_errors_total", "counter", "Failed event callbacks.")
+        for pin in events:
+            labels = {"pin": pin.address}
+            metrics = pin.metrics
+            callbacks.samples.append(
+                Sample(f"{callbacks.name}_sum", labels, metrics.total_latency)
+            )
+            callbacks.samples.append(Sample(f"{callbacks.name}_count", labels, metrics.calls))
+            max_latency.samples.append(Sample(max_latency.name, labels, metrics.max_latency))
+            dropped.samples.append(Sample(dropped.name, labels, metrics.dropped))
+            errors.samples.append(Sample(errors.name, labels, metrics.errors))
+        families += [callbacks, max_latency, dropped, errors]
+        return families
+
+    def enable_history(
+        self, name: str, capacity: int = PinHistory.DEFAULT_CAPACITY
+    ) -> PinHistory:
+        """
+        Record the values written to a numeric or boolean pin, keeping the last `capacity`
+        samples (16 bytes each), and serve them on `/pin_history`.
+        """
+        return self.__pins[name].enable_history(capacity)
 
     def __read_logs(self) -> str:
         """
-        This function returns all the logs in the system.
-        The GET request will have a timestamp parameter (?timestamp=1234567890)
-        to get logs after a certain timestamp.
+        This function returns the logs in the system, oldest first.
+        The GET request can have either:
+        - an after parameter (?after=123), the `seq` of the last log the client has seen, or
+        - a timestamp parameter (?timestamp=1234567890) to get logs after a certain timestamp.
+        and optionally a limit parameter (?limit=100) for the max number of logs to return.
         """
-        # FIXME: come up with a better implementation of logs
-        timestamp = int(self._get_param("timestamp", 0))
-        return json.dumps(
-            [{"timestamp": t, "message": m} for t, m in self.__logs if t >= timestamp]
+        after = self._get_param("after", None)
+        limit = self._get_param("limit", None)
+        limit = int(limit) if limit is not None else None
+        if after is not None:
+            logs = self.__logs.after(int(after), limit=limit)
+        else:
+            logs = self.__logs.since(float(self._get_param("timestamp", 0)), limit=limit)
+        return self._encode_response(
+            [{"timestamp": t, "message": m, "seq": seq} for t, m, seq in logs]
         )
 
     def append_log(self, message: str, timestamp: float | None = None) -> None:
@@ -75,43 +871,334 @@ class TinyProb(WebServer):
         """
         if timestamp is None:
             timestamp = time()
-        self.__logs.append((timestamp, message))
+        self.__logs.append(message, timestamp)
 
-    def get_log_handler(self) -> logging.StreamHandler:
+    def get_log_handler(self, **kwargs) -> BatchingLogHandler:
         """
         Get a log handler that can be used to append logs to the system.
+        Logging through this handler only enqueues the record; records are formatted and appended
+        in batches by a background thread. See `BatchingLogHandler` for the arguments
+        (queue_size, batch_size, flush_interval, overflow).
         """
-
-        class Stream:
-            def write(_, message):
-                self.append_log(message)
-        
-        class CustomStreamHandler(logging.StreamHandler):
-            terminator = ""
-
-        return CustomStreamHandler(Stream())
+        handler = BatchingLogHandler(self.__logs, **kwargs)
+        self.__log_handlers.add(handler)
+        return handler
 
     def add_pin(
-        self, name: str, var: Any, namespace: str = ""
+        self,
+        name: str,
+        var: Any,
+        namespace: str = "",
+        fast_read: bool = False,
+        history: int = 0,
+        write_policy: str | WritePolicy | None = None,
     ) -> tuple[Callable, Callable]:
         """
         Get a variable (name: var) and add it as a pin to the system.
         Return a setter and a getter function for the pin.
+
+        If `fast_read` is set, the getter reads the stored value directly (no lock, no coercion);
+        the value is coerced once when it is written instead.
+        If `history` is set, the last `history` values are recorded (see `enable_history`).
+        `write_policy` sets how often the setter commits the value (see `WritePolicy`); it
+        defaults to the `write_policy` of the TinyProb.
         """
-        pin = Pin4Type(name, namespace, var)
-        self.__pins[name] = pin
+        pin = Pin4Type(name, namespace, var, fast_read=fast_read)
+        pin.set_write_policy(self.__policy(write_policy))
+        if history:
+            pin.enable_history(history)
+        self.__add_pin_object(pin)
 
         def setter(_=None, value: Any=None):
-            pin.write_value(value)
+            pin._write(value)
+
+        if fast_read:
+            def getter(_=None):
+                return pin.value
+        else:
+            def getter(_=None):
+                return pin.read_value()
+
+        return getter, setter
+
+    def add_instance_pin(
+        self,
+        name: str,
+        var: Any,
+        namespace: str,
+        fast_read: bool = False,
+        write_policy: str | WritePolicy | None = None,
+    ) -> tuple[Callable, Callable]:
+        """
+        Same as `add_pin`, but every instance of the class gets its own pin, named
+        `namespace/instance/name`. The returned getter and setter expect the instance as the
+        first argument, so they can be used as a property.
+        """
+        table = self.__instance_tables.get(namespace)
+        if table is None:
+            table = InstancePinTable(namespace, self.__add_pin_object, self.remove_pin)
+            self.__instance_tables[namespace] = table
+        table.add_attribute(
+            name, var, fast_read=fast_read, write_policy=self.__policy(write_policy)
+        )
 
-        def getter(_=None):
-            return pin.read_value()
+        def setter(instance: Any, value: Any):
+            table.row(instance)[name]._write(value)
+
+        if fast_read:
+            def getter(instance: Any):
+                return table.row(instance)[name].value
+        else:
+            def getter(instance: Any):
+                return table.row(instance)[name].read_value()
 
         return getter, setter
 
-    def add_event_pin(self, name: str, namespace: str = "") -> EventPin:
-        pin = EventPin(name, namespace=namespace)
-        self.__pins[name] = pin
+    def set_write_policy(self, name: str, policy: str | WritePolicy | None) -> None:
+        """
+        Change the write policy of a pin, e.g. "latest-every-50ms" (see `WritePolicy`).
+        """
+        self.__pins[name].set_write_policy(policy)
+
+    def __policy(self, write_policy: str | WritePolicy | None) -> WritePolicy:
+        if write_policy is None:
+            return self.__write_policy
+        return WritePolicy.parse(write_policy)
+
+    def instance_pins(self, address: str) -> dict[str, PinBase]:
+        """
+        Get the pins of a captured instance, addressed as `namespace/instance_id`.
+        """
+        namespace, _, index = address.rpartition("/")
+        table = self.__instance_tables.get(namespace)
+        if table is None or not index.isdigit():
+            return {}
+        return table.instance(int(index))
+
+    def __release_instances(self) -> None:
+        for table in list(self.__instance_tables.values()):
+            table.release_collected()
+
+    def remove_pin(self, pin: PinBase | str) -> None:
+        """
+        Remove a pin (or a pin name) from the system. Unknown pins are ignored.
+        """
+        name = pin if isinstance(pin, str) else pin.address
+        removed = self.__pins.remove(name)
+        self.__timers.pop(name, None)
+        if removed is not None:
+            self.__count_removed_accesses(removed)
+            self.__snapshots.observe(removed)
+            self.__removed_pins.add(name)
+            self.__broadcaster.forget(name)
+            self.__broadcaster.notify_resync()
+
+    def __add_pin_object(self, pin: PinBase) -> None:
+        replaced = self.__pins.add(pin)
+        if replaced is not None:
+            # The same (namespace, name) was added again, e.g. a class captured twice.
+            if replaced is not pin:
+                self.__count_removed_accesses(replaced)
+            self.__broadcaster.forget(pin.address)
+        self.__removed_pins.discard(pin.address)
+        # Version the pin once it is registered, so that no `/pins_since` cursor can pass it.
+        stamp_version((pin,), created=True)
+        pin._observers.append(self.__broadcaster.notify)
+        pin._observers.append(self.__snapshots.observe)
+        self.__snapshots.observe(pin)
+        self.__broadcaster.notify_resync()
+
+    def __count_removed_accesses(self, pin: PinBase) -> None:
+        # Keep the reads / writes of removed pins in the totals of `metrics`.
+        self.__removed_accesses[0] += pin._reads
+        self.__removed_accesses[1] += pin._writes
+
+    def share_pins(
+        self,
+        name: str = "tiny_prob",
+        capacity: int | None = None,
+        poll_interval: float | None = None,
+    ) -> "SharedPinTable":
+        """
+        Create a shared-memory pin table that other processes (e.g. multiprocessing or gunicorn
+        workers) attach to by name, and show its slots as read-only pins of this TinyProb.
+        The table has `capacity` slots (default `SharedPinTable.DEFAULT_CAPACITY`) and is polled
+        every `poll_interval` seconds (default `SharedPinMirror.DEFAULT_POLL_INTERVAL`).
+
+        Example:
+        ```python
+        # In the process hosting the web server
+        tp.share_pins("my_service")
+
+        # In every worker
+        table = SharedPinTable("my_service")
+        requests = table.slot(f"worker-{worker_id}/requests", 0)
+        requests.set(requests.get() + 1)  # lock-free
+        ```
+        """
+        from tiny_prob.shared import SharedPinMirror, SharedPinTable, SlotKind
+
+        table = SharedPinTable(
+            name, capacity=capacity or SharedPinTable.DEFAULT_CAPACITY, create=True
+        )
+
+        shared_pins = self.__shared_pins.setdefault(name, [])
+
+        def on_add(slot_name: str, kind: SlotKind, value: Any) -> None:
+            pin_class = BooleanPin if kind is SlotKind.Bool else NumericPin
+            pin = pin_class(slot_name, name, value, _writable=False)
+            shared_pins.append(pin)
+            self.__add_pin_object(pin)
+
+        def on_change(slot_name: str, value: Any) -> None:
+            self.__pins[f"{name}/{slot_name}"].write_value(value)
+
+        mirror = SharedPinMirror(
+            table,
+            on_add,
+            on_change,
+            poll_interval=poll_interval or SharedPinMirror.DEFAULT_POLL_INTERVAL,
+        )
+        self.__shared_mirrors[name] = mirror
+        mirror.start()
+        return table
+
+    def unshare_pins(self, name: str = "tiny_prob") -> None:
+        """
+        Stop mirroring a shared pin table, remove its pins and destroy it. Other pins of the same
+        namespace are kept.
+        """
+        mirror = self.__shared_mirrors.pop(name)
+        mirror.close()
+        for pin in self.__shared_pins.pop(name, []):
+            if self.__pins.get(pin.address) is pin:
+                self.remove_pin(pin)
+
+    def add_node(self, name: str, url: str) -> "UpstreamNode":
+        """
+        Aggregate the pins of another TinyProb instance (e.g. "http://10.0.0.5:8080"), shown as
+        `name/pin_name`. The node is polled incrementally; writes to its pins are forwarded to it.
+        See `tiny_prob.gateway` for a standalone gateway process.
+        """
+        from tiny_prob.gateway import GatewayPoller, UpstreamNode
+
+        if self.__gateway is None:
+            self.__gateway = GatewayPoller(
+                self.__apply_node_delta,
+                poll_interval=self.__gateway_poll_interval or GatewayPoller.DEFAULT_POLL_INTERVAL,
+            )
+        if name in self.__gateway.nodes:
+            raise ValueError(f"Node '{name}' already exists.")
+        node = UpstreamNode(name, url)
+        self.__gateway.add(node)
+        return node
+
+    def remove_node(self, name: str) -> None:
+        """
+        Stop aggregating a node and remove its pins.
+        """
+        from tiny_prob.gateway import RemotePin
+
+        node = self.__gateway.remove(name) if self.__gateway is not None else None
+        if node is None:
+            return
+        for pin in list(self.__pins.values()):
+            if isinstance(pin, RemotePin) and pin._node is node:
+                self.remove_pin(pin)
+
+    def poll_nodes(self) -> None:
+        """
+        Fetch the changes of all the nodes now, instead of waiting for the next poll.
+        """
+        if self.__gateway is not None:
+            self.__gateway.poll()
+
+    def __apply_node_delta(self, node: "UpstreamNode", delta: dict[str, Any]) -> None:
+        from tiny_prob.gateway import RemotePin
+
+        seen = set()
+        for data in delta["pins"]:
+            name = f"{node.name}/{data['name']}"
+            seen.add(name)
+            pin = self.__pins.get(name)
+            if isinstance(pin, RemotePin) and pin._node is node:
+                pin.mirror(data["value"])
+                continue
+            pin = RemotePin(
+                data["name"],
+                node.name,
+                data["value"],
+                type=data["type"],
+                _readable=data["readable"],
+                _writable=data["writable"],
+                _node=node,
+                _remote_name=data["name"],
+                _template=data.get("html_template"),
+            )
+            self.__add_pin_object(pin)
+
+        removed = {f"{node.name}/{name}" for name in delta["removed"]}
+        if delta["reset"]:
+            removed.update(
+                name
+                for name, pin in list(self.__pins.items())
+                if isinstance(pin, RemotePin) and pin._node is node and name not in seen
+            )
+        for name in removed:
+            self.remove_pin(name)
+
+    def add_array(self, name: str, value: Any, namespace: str = "") -> ArrayPin:
+        """
+        Add an array pin (see `ArrayPin`), e.g. for 2-D arrays that `add_pin` would show as
+        images. The array is kept by reference; write it again after changing it in place.
+        """
+        pin = ArrayPin(name, namespace)
+        pin.write_value(value)
+        self.__add_pin_object(pin)
+        return pin
+
+    def add_timer(self, name: str, namespace: str = "") -> TimerPin:
+        """
+        Get the timer pin of the given name, adding it if it does not exist yet.
+        """
+        address = f"{namespace}/{name}" if namespace else name
+        timer = self.__timers.get(address)
+        if timer is not None:
+            return timer
+        with self.__timers_lock:  # Two threads timing a new section must share its timer
+            timer = self.__timers.get(address)
+            if timer is None:
+                timer = TimerPin(name, namespace)
+                timer.refresh()
+                self.__add_pin_object(timer)
+                self.__timers[address] = timer
+        return timer
+
+    def span(self, name: str, namespace: str = "") -> Span:
+        """
+        Time a block of code into the timer pin of the given name.
+
+        Example:
+        ```python
+        with tp.span("inference"):
+            model(batch)
+        ```
+        """
+        return self.add_timer(name, namespace).span()
+
+    def __refresh_timers(self) -> None:
+        for timer in list(self.__timers.values()):
+            timer.refresh()
+
+    def add_event_pin(
+        self, name: str, namespace: str = "", executor: CallbackExecutor | None = None
+    ) -> EventPin:
+        """
+        Add an event pin. Its callbacks run on `executor` if given, otherwise on the event executor
+        of the system (see the `event_workers` config), otherwise inline on the server thread.
+        """
+        pin = EventPin(name, namespace=namespace, _executor=executor or self.__event_executor)
+        self.__add_pin_object(pin)
         return pin
     
     def add_debug_prob(self, name: str, namespace: str = "") -> EventProb:
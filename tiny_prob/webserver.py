@@ -1,8 +1,28 @@
+"""
+The web server of TinyProb.
+Bottle and the server backends are only imported when the server is built (on `start`, or
+`app`), so that capturing values without serving them does not pay for them.
+"""
+import json
 from threading import Thread
-from typing import Any
-from bottle import Bottle, static_file, template, ServerAdapter, request
+from typing import TYPE_CHECKING, Any, Callable, NoReturn
 from os.path import dirname, abspath, join
 
+from tiny_prob import wire
+from tiny_prob.assets import (
+    CACHE_FOREVER,
+    CACHE_REVALIDATE,
+    Asset,
+    AssetStore,
+    accepted_encodings,
+    compress_gzip,
+    make_asset,
+    negotiate,
+)
+
+if TYPE_CHECKING:
+    from bottle import Bottle, ServerAdapter
+
 
 DEFAULT_INDEX_TEMPLATE = """
 <!DOCTYPE html>
@@ -11,13 +31,13 @@ DEFAULT_INDEX_TEMPLATE = """
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>TinyProb</title>
-    <link rel="stylesheet" href="static/styles.css">
+    <link rel="stylesheet" href="{{asset_url('styles.css')}}">
 </head>
 
 <body>
     <header>
         <div class="header-left">
-            <img src="static/logo.png" alt="Logo" class="logo">
+            <img src="{{asset_url('logo.png')}}" alt="Logo" class="logo">
             <h1>TinyProb</h1>
         </div>
         <div class="header-right">
@@ -58,6 +78,14 @@ DEFAULT_INDEX_TEMPLATE = """
                     <!-- Logs will be appended here dynamically -->
                 </ul>
             </div>
+            <div id="metrics">
+                <h2>Metrics</h2>
+                <table id="metricsTable">
+                    <tbody>
+                        <!-- TinyProb's own overhead counters, from /metrics -->
+                    </tbody>
+                </table>
+            </div>
         </div>
         <div class="panel" id="canvases">
             <h2>Canvases</h2>
@@ -71,38 +99,21 @@ DEFAULT_INDEX_TEMPLATE = """
     <footer>
         <p>&copy; 2024 TinyProb. <a href="https://github.com/ArefMq/tiny-prob">TinyProb</a></p>
     </footer>
-    <script src="/static/scanner.js"></script>
+    <script src="{{asset_url('scanner.js')}}"></script>
 </body>
 </html>
 """
 
+DEFAULT_HOST = "127.0.0.1"
 DEFAULT_PORT = 8080
 DEFAULT_BOTTLE_LOCAL_URL = f"http://127.0.0.1:{DEFAULT_PORT}/"
+DEFAULT_SERVER_BACKEND = "threaded"
+SERVER_BACKEND_NAMES = ("simple", "threaded", "threadpool", "asyncio")  # see servers.SERVER_BACKENDS
 
 
-class TinyServer(ServerAdapter):
-    server = None
-
-    def run(self, handler):
-        from wsgiref.simple_server import make_server, WSGIRequestHandler
-
-        if self.quiet:
-            class QuietHandler(WSGIRequestHandler):
-                def log_request(*args, **kw):
-                    pass
-
-            self.options["handler_class"] = QuietHandler
-        self.server = make_server(self.host, self.port, handler, **self.options)
-        self.server.serve_forever()
+class WebServer:
+    GZIP_MIN_SIZE = 1024  # bytes; smaller API responses are sent uncompressed
 
-    def stop(self):
-        if self.server is None:
-            return
-        # self.server.server_close() <--- alternative but causes bad fd exception
-        self.server.shutdown()
-
-
-class WebServer(Bottle):
     def __init__(
         self,
         template_args: dict[str, Any] | None = None,
@@ -110,46 +121,158 @@ class WebServer(Bottle):
         open_browser: bool = False,
         ask_before_exit: bool = False,
         quiet: bool = False,
+        host: str = DEFAULT_HOST,
+        port: int = DEFAULT_PORT,
+        server: str = DEFAULT_SERVER_BACKEND,
+        server_options: dict[str, Any] | None = None,
     ) -> None:
-        super().__init__()
+        if server not in SERVER_BACKEND_NAMES:
+            raise ValueError(
+                f"Unknown server backend '{server}', expected one of {list(SERVER_BACKEND_NAMES)}."
+            )
+        self.__app: Bottle | None = None
+        self.__routes: list[tuple[str, Callable, str]] = []
+        self.__assets: AssetStore | None = None
+        self.__index: Asset | None = None
         self.__app_thread: Thread | None = None
         self.__template_args = template_args or {}
         self.__static_root = static_root
         self.__open_browser_on_start = open_browser
         self.__ask_before_exit = ask_before_exit
-        self.__server: TinyServer | None = None
+        self.__server: ServerAdapter | None = None
         self.__quiet = quiet
+        self.__host = host
+        self.__port = port
+        self.__server_backend = server
+        self.__server_options = server_options or {}
 
         # Fix Routes
         self.route("/", callback=self.index)
         self.route("/static/<filename>", callback=self.static)
 
+    def route(self, path: str, callback: Callable, method: str = "GET") -> None:
+        """
+        Add a route. Routes are kept until the Bottle app is built.
+        """
+        self.__routes.append((path, callback, method))
+        if self.__app is not None:
+            self.__app.route(path, callback=callback, method=method)
+
+    @property
+    def app(self) -> "Bottle":
+        """
+        The Bottle app serving the routes, built on first use.
+        """
+        if self.__app is None:
+            from bottle import Bottle
+
+            app = Bottle()
+            for path, callback, method in self.__routes:
+                app.route(path, callback=callback, method=method)
+            self.__prepare_assets()
+            self.__app = app
+        return self.__app
+
+    def __prepare_assets(self) -> None:
+        """
+        Load and compress the static assets, and render the index page, once.
+        """
+        if self.__assets is None:
+            from bottle import template
+
+            root_path = (
+                join(dirname(abspath(__file__)), "static")
+                if self.__static_root is None
+                else self.__static_root
+            )
+            self.__assets = AssetStore(root_path)
+            html = template(
+                DEFAULT_INDEX_TEMPLATE, asset_url=self.__assets.url, **self.__template_args
+            )
+            self.__index = make_asset(html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def run(self, **kwargs) -> None:
+        """
+        Run the server (blocking), see `bottle.run`.
+        """
+        self.app.run(**kwargs)
+
     def static(self, filename):
-        root_path = (
-            join(dirname(abspath(__file__)), "static")
-            if self.__static_root is None
-            else self.__static_root
+        """
+        Serve a static asset from memory, precompressed. Fingerprinted URLs (`?v=<hash>`, see
+        `AssetStore.url`) are cached forever; others are revalidated with their ETag.
+        """
+        from bottle import HTTPResponse, request, static_file
+
+        self.__prepare_assets()
+        asset = self.__assets.get(filename)
+        if asset is None:  # Added after the server started
+            return static_file(filename, root=self.__assets.root)
+        fingerprinted = request.query.get("v") == asset.version
+        status, headers, body = self.__serve(
+            asset, CACHE_FOREVER if fingerprinted else CACHE_REVALIDATE
         )
-        return static_file(filename, root=root_path)
+        return HTTPResponse(body, status=status, **headers)
 
     def index(self):
-        return template(DEFAULT_INDEX_TEMPLATE, **self.__template_args)
+        """
+        The index page, rendered once (see `__prepare_assets`).
+        """
+        from bottle import response
+
+        self.__prepare_assets()
+        status, headers, body = self.__serve(self.__index, CACHE_REVALIDATE)
+        response.status = status
+        for name, value in headers.items():
+            response.set_header(name, value)
+        return body.decode("utf-8") if "Content-Encoding" not in headers else body
+
+    @staticmethod
+    def __serve(asset: Asset, cache_control: str) -> tuple[int, dict[str, str], bytes]:
+        from bottle import request
+
+        headers = {"ETag": asset.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if asset.etag in request.headers.get("If-None-Match", ""):
+            return 304, headers, b""
+        encoding = negotiate(asset, request.headers.get("Accept-Encoding", ""))
+        headers["Content-Type"] = asset.content_type
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return 200, headers, asset.encodings[encoding]
 
     def run_non_blocking(self, *args, **kwargs) -> None:
         """
         Same as run, but threaded.
         """
         self.stop_server()
+        open_browser = kwargs.pop("open_browser", False)
+        if "server" not in kwargs:
+            kwargs["server"] = self.__make_server(
+                host=kwargs.pop("host", self.__host), port=kwargs.pop("port", self.__port)
+            )
+        self.__server = kwargs["server"]
         self.__app_thread = Thread(target=self.run, args=args, kwargs=kwargs)
         self.__app_thread.start()
+        if open_browser:
+            WebServer.OpenBrowser(self.url)
+
+    def __make_server(self, host: str, port: int) -> "ServerAdapter":
+        from tiny_prob.servers import SERVER_BACKENDS
+
+        return SERVER_BACKENDS[self.__server_backend](
+            host=host, port=port, **self.__server_options
+        )
 
     def stop_server(self, timeout: int | None = None) -> None:
         """
         Stop the webserver.
         """
-        self.close()
-        self.__server.stop()
-        if self.__app_thread is not None and self.__app_thread.is_alive():
+        if self.__app is not None:
+            self.__app.close()
+        if self.__server is not None:
+            self.__server.stop()
+            self.__server = None
+        if self.__app_thread is not None:
             self.__app_thread.join(timeout=timeout)
             self.__app_thread = None
 
@@ -159,21 +282,26 @@ class WebServer(Bottle):
 
         webbrowser.open(url, new=0, autoraise=True)
 
+    @property
+    def url(self) -> str:
+        return f"http://{self.__host}:{self.__port}/"
+
     def start(self, blocking: bool = False, open_browser: bool = False) -> None:
-        self.__server = TinyServer(port=DEFAULT_PORT)
+        server = self.__make_server(host=self.__host, port=self.__port)
         args = {
             "debug": True,
             "reloader": False,
-            "server": self.__server,
+            "server": server,
             "quiet": self.__quiet,
         }
         if blocking:
+            self.__server = server
             self.run(**args)
         else:
             self.run_non_blocking(**args)
 
         if open_browser:
-            WebServer.OpenBrowser()
+            WebServer.OpenBrowser(self.url)
     
     def __enter__(self):
         self.start(open_browser=self.__open_browser_on_start)
@@ -186,11 +314,77 @@ class WebServer(Bottle):
 
     @staticmethod
     def _get_param(param: str, default: Any) -> Any:
+        from bottle import request
+
         return request.query.get(param, default)
     
+    @staticmethod
+    def _get_params() -> dict[str, str]:
+        from bottle import request
+
+        return dict(request.query)
+
+    @staticmethod
+    def _get_header(name: str, default: str) -> str:
+        from bottle import request
+
+        return request.headers.get(name, default)
+
     @staticmethod
     def _post_param(param: str, default: Any) -> Any:
+        from bottle import request
+
         return request.json.get(param, default)
 
+    @staticmethod
+    def _abort(status: int, message: str) -> NoReturn:
+        """
+        End the request with an HTTP error, e.g. 400 for invalid parameters.
+        """
+        from bottle import HTTPError
+
+        raise HTTPError(status, message)
+
+    @staticmethod
+    def _set_header(name: str, value: str) -> None:
+        from bottle import response
+
+        response.set_header(name, value)
+
+    @classmethod
+    def _encode_response(cls, payload: Any) -> str | bytes:
+        """
+        Encode a response payload as JSON, or in the compact binary format (see `wire`) if the
+        client sent `Accept: application/x-tinyprob`.
+        """
+        from bottle import request, response
+
+        if wire.CONTENT_TYPE in request.headers.get("Accept", ""):
+            response.content_type = wire.CONTENT_TYPE
+            body = wire.encode(payload)
+        else:
+            body = json.dumps(payload)
+        body = cls._compress_response(body)
+        response.set_header("Vary", "Accept, Accept-Encoding")  # The format is negotiated too
+        return body
+
+    @classmethod
+    def _compress_response(cls, body: str | bytes) -> str | bytes:
+        """
+        Gzip a response body of at least GZIP_MIN_SIZE bytes, if the client accepts it.
+        Every response is marked as depending on Accept-Encoding, gzipped or not, so that caches
+        do not serve one encoding to clients that asked for the other.
+        """
+        from bottle import request, response
+
+        response.set_header("Vary", "Accept-Encoding")
+        if len(body) < cls.GZIP_MIN_SIZE:
+            return body
+        accepted = accepted_encodings(request.headers.get("Accept-Encoding", ""))
+        if "gzip" not in accepted and "*" not in accepted:
+            return body
+        response.set_header("Content-Encoding", "gzip")
+        return compress_gzip(body.encode("utf-8") if isinstance(body, str) else body)
+
 if __name__ == "__main__":
     WebServer().run()
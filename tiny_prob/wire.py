@@ -0,0 +1,147 @@
+"""
+Compact binary encoding of the JSON-like payloads of the web server.
+
+Every value starts with a one-byte tag; all the numbers are little-endian, lengths are uint32.
+    N            None
+    T / F        True / False
+    q <int64>    int (larger ints are sent as a float)
+    d <float64>  float
+    s <len> utf-8 bytes      str
+    b <len> raw bytes        bytes
+    l <count> values...      list / tuple
+    m <count> (str, value)... dict (keys are converted to str, like JSON does)
+    J <count> int32...       list of ints, sent as a raw Int32Array
+    Q <count> int64...       list of ints, sent as a raw BigInt64Array
+    D <count> float64...     list of numbers (with at least one float), as a raw Float64Array
+Numeric lists are packed with `array`, so a large `ListPin` costs a C-level copy instead of one
+JSON token per item. Lists of ints are never packed as floats, which would round the ints above
+2^53, and lists with booleans keep the generic encoding. The matching decoder is in
+`static/scanner.js`.
+"""
+import struct
+import sys
+from array import array
+from typing import Any
+
+CONTENT_TYPE = "application/x-tinyprob"
+
+__UINT32 = struct.Struct("<I")
+__INT64 = struct.Struct("<q")
+__FLOAT64 = struct.Struct("<d")
+
+
+def encode(value: Any) -> bytes:
+    chunks: list[bytes] = []
+    __encode(value, chunks)
+    return b"".join(chunks)
+
+
+def decode(data: bytes) -> Any:
+    value, _ = __decode(memoryview(data), 0)
+    return value
+
+
+def __encode(value: Any, chunks: list[bytes]) -> None:
+    if value is None:
+        chunks.append(b"N")
+    elif value is True:
+        chunks.append(b"T")
+    elif value is False:
+        chunks.append(b"F")
+    elif isinstance(value, int):
+        if -(1 << 63) <= value < (1 << 63):
+            chunks.append(b"q" + __INT64.pack(value))
+        else:
+            chunks.append(b"d" + __FLOAT64.pack(value))
+    elif isinstance(value, float):
+        chunks.append(b"d" + __FLOAT64.pack(value))
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        chunks.append(b"s" + __UINT32.pack(len(data)))
+        chunks.append(data)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        chunks.append(b"b" + __UINT32.pack(len(value)))
+        chunks.append(bytes(value))
+    elif isinstance(value, dict):
+        chunks.append(b"m" + __UINT32.pack(len(value)))
+        for key, item in value.items():
+            __encode(str(key), chunks)
+            __encode(item, chunks)
+    elif isinstance(value, (list, tuple, array)):
+        packed = __pack_numbers(value)
+        if packed is not None:
+            tag, numbers = packed
+            chunks.append(tag + __UINT32.pack(len(numbers)))
+            chunks.append(numbers.tobytes())
+            return
+        chunks.append(b"l" + __UINT32.pack(len(value)))
+        for item in value:
+            __encode(item, chunks)
+    else:
+        raise TypeError(f"Object of type {type(value).__name__} can not be encoded.")
+
+
+def __pack_numbers(values: Any) -> tuple[bytes, array] | None:
+    """
+    Pack a non-empty list of numbers in an int32, int64 or float64 array, or return None.
+    Lists with booleans are left to the generic list encoding, to keep their type, and so are
+    lists of ints that do not fit in an int64.
+    """
+    if not values:
+        return None
+    types = set(map(type, values))
+    if bool in types:
+        return None
+    for tag, typecode in ((b"J", "i"), (b"Q", "q"), (b"D", "d")):
+        if tag == b"D" and types <= {int}:
+            return None
+        try:
+            numbers = array(typecode, values)
+        except (TypeError, OverflowError):
+            continue
+        if sys.byteorder == "big":
+            numbers.byteswap()
+        return tag, numbers
+    return None
+
+
+def __decode(data: memoryview, offset: int) -> tuple[Any, int]:
+    tag = data[offset:offset + 1].tobytes()
+    offset += 1
+    if tag == b"N":
+        return None, offset
+    if tag == b"T":
+        return True, offset
+    if tag == b"F":
+        return False, offset
+    if tag == b"q":
+        return __INT64.unpack_from(data, offset)[0], offset + 8
+    if tag == b"d":
+        return __FLOAT64.unpack_from(data, offset)[0], offset + 8
+
+    (length,) = __UINT32.unpack_from(data, offset)
+    offset += 4
+    if tag == b"s":
+        return str(data[offset:offset + length], "utf-8"), offset + length
+    if tag == b"b":
+        return data[offset:offset + length].tobytes(), offset + length
+    if tag in (b"J", b"Q", b"D"):
+        numbers = array({b"J": "i", b"Q": "q", b"D": "d"}[tag])
+        end = offset + length * numbers.itemsize
+        numbers.frombytes(data[offset:end])
+        if sys.byteorder == "big":
+            numbers.byteswap()
+        return numbers.tolist(), end
+    if tag == b"l":
+        items = []
+        for _ in range(length):
+            item, offset = __decode(data, offset)
+            items.append(item)
+        return items, offset
+    if tag == b"m":
+        items = {}
+        for _ in range(length):
+            key, offset = __decode(data, offset)
+            items[key], offset = __decode(data, offset)
+        return items, offset
+    raise ValueError(f"Unknown tag {tag!r} at offset {offset - 1}.")